@@ -0,0 +1,399 @@
+# -*- coding: utf-8 -*-
+"""
+Camada de armazenamento: SQLite (arquivo local), SQLite em memória
+compartilhada (banco falso em processo, para testes) ou PostgreSQL
+(DATABASE_URL, com pool de conexões)
+
+Todas as conexões têm a interface do sqlite3 (execute, executemany,
+executescript, cursor, commit, rollback, close e "with conn:"). O SQL da
+aplicação continua escrito no dialeto do SQLite; no PostgreSQL cada comando
+é traduzido uma única vez (marcadores, tipos, INSERT OR IGNORE/REPLACE)
+"""
+
+import os
+import re
+import sqlite3
+import threading
+import time
+from functools import lru_cache
+
+from api.metricas import registrar_consulta
+
+# Erro de restrição (UNIQUE, chave estrangeira) em qualquer backend
+IntegrityError = sqlite3.IntegrityError
+
+# Colunas únicas usadas como alvo do ON CONFLICT ao traduzir INSERT OR REPLACE
+CHAVES_UNICAS = {
+    'precos_fornecedores': ('produto_id', 'fornecedor_id'),
+    'fornecedores': ('nome',),
+    'historico_produtos': ('chave',),
+    'historico_fornecedores': ('nome',),
+}
+
+TAMANHO_POOL = 5
+
+# Chave do pg_advisory_xact_lock que serializa a criação das tabelas entre instâncias
+TRAVA_MIGRACOES = 7254001
+
+PADRAO_INSERT_OR = re.compile(
+    r'^(\s*)INSERT\s+OR\s+(IGNORE|REPLACE)\s+INTO\s+(\w+)\s*\(([^)]*)\)', re.IGNORECASE)
+PADRAO_DDL = re.compile(r'\b(CREATE|ALTER)\s+TABLE\b', re.IGNORECASE)
+TIPOS_POSTGRES = [
+    # O SQLite roda com foreign_keys desligado: as chaves estrangeiras são só documentação
+    (re.compile(r',\s*FOREIGN\s+KEY\s*\([^)]*\)\s*REFERENCES\s+\w+\s*\([^)]*\)', re.IGNORECASE), ''),
+    (re.compile(r'\bINTEGER\s+PRIMARY\s+KEY(\s+AUTOINCREMENT)?', re.IGNORECASE), 'SERIAL PRIMARY KEY'),
+    (re.compile(r'\bREAL\b', re.IGNORECASE), 'DOUBLE PRECISION'),
+    # Ordenação e comparação byte a byte, como no SQLite
+    (re.compile(r'\bTEXT\b', re.IGNORECASE), 'TEXT COLLATE "C"'),
+]
+
+
+class ErroIntegridadePostgres(IntegrityError):
+    """
+    Violação de restrição no PostgreSQL, capturável como sqlite3.IntegrityError
+    """
+
+
+@lru_cache(maxsize=512)
+def traduzir_para_postgres(sql, marcadores=True):
+    """
+    Traduz um comando do dialeto SQLite usado pela aplicação para o PostgreSQL
+    """
+    if PADRAO_DDL.search(sql):
+        for padrao, tipo in TIPOS_POSTGRES:
+            sql = padrao.sub(tipo, sql)
+
+    insert_or = PADRAO_INSERT_OR.match(sql)
+    if insert_or:
+        espaco, acao, tabela, colunas = insert_or.groups()
+        sql = f'{espaco}INSERT INTO {tabela} ({colunas})' + sql[insert_or.end():]
+        sql = sql.rstrip().rstrip(';')
+        if acao.upper() == 'IGNORE':
+            sql += ' ON CONFLICT DO NOTHING'
+        else:
+            alvo = CHAVES_UNICAS[tabela]
+            atualizar = [c.strip() for c in colunas.split(',') if c.strip() not in alvo]
+            sql += (f" ON CONFLICT ({', '.join(alvo)}) DO UPDATE SET "
+                    + ', '.join(f'{c} = EXCLUDED.{c}' for c in atualizar))
+
+    if marcadores:
+        sql = sql.replace('%', '%%').replace('?', '%s')
+    return sql
+
+
+class CursorSQLite(sqlite3.Cursor):
+    """
+    Cursor do sqlite3 que mede cada comando (métricas de consultas por rota)
+    """
+
+    def execute(self, sql, parametros=()):
+        inicio = time.perf_counter()
+        try:
+            return super().execute(sql, parametros)
+        finally:
+            registrar_consulta(time.perf_counter() - inicio)
+
+    def executemany(self, sql, sequencia):
+        inicio = time.perf_counter()
+        try:
+            return super().executemany(sql, sequencia)
+        finally:
+            registrar_consulta(time.perf_counter() - inicio)
+
+
+class ConexaoSQLite(sqlite3.Connection):
+    dialeto = 'sqlite'
+
+    def cursor(self, factory=CursorSQLite):
+        return super().cursor(factory)
+
+    # Os atalhos do sqlite3.Connection não passam por cursor(): redirecionados para medir
+    def execute(self, sql, parametros=()):
+        return self.cursor().execute(sql, parametros)
+
+    def executemany(self, sql, sequencia):
+        return self.cursor().executemany(sql, sequencia)
+
+
+class BackendSQLite:
+    """
+    Banco em arquivo local (desenvolvimento e executável)
+    """
+    dialeto = 'sqlite'
+
+    def __init__(self, caminho):
+        self.caminho = caminho
+
+    def __str__(self):
+        return self.caminho
+
+    def inicializado(self):
+        return os.path.exists(self.caminho)
+
+    def conectar(self):
+        return sqlite3.connect(self.caminho, factory=ConexaoSQLite)
+
+    def fechar(self):
+        pass
+
+
+class BackendMemoria(BackendSQLite):
+    """
+    Banco falso em processo: SQLite em memória compartilhado por todas as
+    conexões, como um servidor, e descartado quando o processo termina
+    """
+
+    def __init__(self, nome='megafarma'):
+        super().__init__(f'file:{nome}?mode=memory&cache=shared')
+        # Uma conexão sempre aberta mantém o banco vivo entre as requisições
+        self.ancora = self.conectar()
+        self.criado = False
+
+    def __str__(self):
+        return f'memória ({self.caminho})'
+
+    def inicializado(self):
+        criado, self.criado = self.criado, True
+        return criado
+
+    def conectar(self):
+        return sqlite3.connect(self.caminho, uri=True, factory=ConexaoSQLite,
+                               check_same_thread=False)
+
+    def fechar(self):
+        self.ancora.close()
+
+
+class BackendPostgres:
+    """
+    PostgreSQL com pool de conexões: abertas sob demanda, reaproveitadas e
+    limitadas a tamanho_pool (as requisições esperam quando todas estão em uso)
+    """
+    dialeto = 'postgresql'
+
+    def __init__(self, url, tamanho_pool=TAMANHO_POOL):
+        # psycopg2 só é necessário (e carregado) quando DATABASE_URL aponta para o PostgreSQL
+        import psycopg2
+
+        self.psycopg2 = psycopg2
+        self.url = url
+        self.livres = []
+        self.trava = threading.Lock()
+        self.vagas = threading.BoundedSemaphore(tamanho_pool)
+        self.criado = False
+
+    def __str__(self):
+        return re.sub(r'//([^:/@]+):[^@]*@', r'//\1:***@', self.url)
+
+    def inicializado(self):
+        # Cada instância confere o esquema uma vez (CREATE ... IF NOT EXISTS é barato)
+        criado, self.criado = self.criado, True
+        return criado
+
+    def conectar(self):
+        self.vagas.acquire()
+        try:
+            with self.trava:
+                conexao = self.livres.pop() if self.livres else None
+            if conexao is None or conexao.closed:
+                conexao = self.psycopg2.connect(self.url)
+        except Exception:
+            self.vagas.release()
+            raise
+        return ConexaoPostgres(self, conexao)
+
+    def devolver(self, conexao):
+        try:
+            if not conexao.closed:
+                conexao.rollback()
+                with self.trava:
+                    self.livres.append(conexao)
+        except self.psycopg2.Error:
+            # Conexão perdida com o servidor: descarta, a próxima será reaberta
+            conexao.close()
+        finally:
+            self.vagas.release()
+
+    def fechar(self):
+        with self.trava:
+            livres, self.livres = self.livres, []
+        for conexao in livres:
+            conexao.close()
+
+
+class CursorPostgres:
+    """
+    Cursor psycopg2 com a interface (e os marcadores "?") do sqlite3
+    """
+    dialeto = 'postgresql'
+
+    def __init__(self, cursor):
+        self.cursor = cursor
+
+    def execute(self, sql, parametros=()):
+        from psycopg2 import IntegrityError as IntegrityErrorPostgres
+
+        inicio = time.perf_counter()
+        try:
+            self.cursor.execute(traduzir_para_postgres(sql), tuple(parametros))
+        except IntegrityErrorPostgres as e:
+            raise ErroIntegridadePostgres(str(e)) from e
+        finally:
+            registrar_consulta(time.perf_counter() - inicio)
+        return self
+
+    def executemany(self, sql, sequencia):
+        from psycopg2 import IntegrityError as IntegrityErrorPostgres
+        from psycopg2.extras import execute_batch
+
+        inicio = time.perf_counter()
+        try:
+            execute_batch(self.cursor, traduzir_para_postgres(sql), sequencia, page_size=500)
+        except IntegrityErrorPostgres as e:
+            raise ErroIntegridadePostgres(str(e)) from e
+        finally:
+            registrar_consulta(time.perf_counter() - inicio)
+        return self
+
+    def fetchone(self):
+        return self.cursor.fetchone()
+
+    def fetchmany(self, tamanho=None):
+        return self.cursor.fetchmany(tamanho or self.cursor.arraysize)
+
+    def fetchall(self):
+        return self.cursor.fetchall()
+
+    def __iter__(self):
+        return iter(self.cursor)
+
+    @property
+    def rowcount(self):
+        return self.cursor.rowcount
+
+    @property
+    def description(self):
+        return self.cursor.description
+
+    @property
+    def lastrowid(self):
+        # Use inserir(), que acrescenta RETURNING id no PostgreSQL
+        return None
+
+    def close(self):
+        self.cursor.close()
+
+
+class ConexaoPostgres:
+    """
+    Conexão do pool com a interface do sqlite3; close() devolve ao pool
+    """
+    dialeto = 'postgresql'
+
+    def __init__(self, backend, conexao):
+        self.backend = backend
+        self.conexao = conexao
+
+    def cursor(self):
+        return CursorPostgres(self.conexao.cursor())
+
+    def execute(self, sql, parametros=()):
+        return self.cursor().execute(sql, parametros)
+
+    def executemany(self, sql, sequencia):
+        return self.cursor().executemany(sql, sequencia)
+
+    def executescript(self, script):
+        # Diferente do sqlite3, roda dentro da transação atual (DDL é transacional)
+        with self.conexao.cursor() as cursor:
+            cursor.execute(traduzir_para_postgres(script, marcadores=False))
+
+    def commit(self):
+        self.conexao.commit()
+
+    def rollback(self):
+        self.conexao.rollback()
+
+    def close(self):
+        if self.conexao is not None:
+            conexao, self.conexao = self.conexao, None
+            self.backend.devolver(conexao)
+
+    def __del__(self):
+        # Rotas que levantam exceção antes do close() não podem esgotar o pool
+        self.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, tipo, valor, rastro):
+        if tipo is None:
+            self.conexao.commit()
+        else:
+            self.conexao.rollback()
+        return False
+
+
+def criar_backend(url, caminho_padrao):
+    """
+    Escolhe o backend pela DATABASE_URL:
+    vazia (arquivo SQLite padrão), sqlite:///caminho.db, memoria:// ou postgresql://...
+    """
+    if not url:
+        return BackendSQLite(caminho_padrao)
+    if url.startswith('sqlite:///'):
+        return BackendSQLite(url[len('sqlite:///'):])
+    if url.startswith('memoria://'):
+        return BackendMemoria(url[len('memoria://'):] or 'megafarma')
+    if url.startswith(('postgres://', 'postgresql://')):
+        tamanho = int(os.environ.get('DB_POOL_MAX', TAMANHO_POOL))
+        return BackendPostgres(url, tamanho)
+    raise ValueError(f'DATABASE_URL não suportada: {url.split(":", 1)[0]}')
+
+
+def dialeto(conexao):
+    return getattr(conexao, 'dialeto', 'sqlite')
+
+
+def inserir(cursor, sql, parametros=()):
+    """
+    Executa um INSERT e retorna o id gerado (lastrowid no SQLite, RETURNING no PostgreSQL)
+    """
+    if dialeto(cursor) == 'postgresql':
+        return cursor.execute(sql + ' RETURNING id', parametros).fetchone()[0]
+    cursor.execute(sql, parametros)
+    return cursor.lastrowid
+
+
+def colunas_da_tabela(conexao, tabela):
+    """
+    Nomes das colunas de uma tabela (lista vazia se ela ainda não existe)
+    """
+    if dialeto(conexao) == 'postgresql':
+        cursor = conexao.execute('''
+            SELECT column_name FROM information_schema.columns
+            WHERE table_schema = current_schema() AND table_name = ?
+        ''', (tabela,))
+        return [linha[0] for linha in cursor.fetchall()]
+    return [linha[1] for linha in conexao.execute(f'PRAGMA table_info({tabela})').fetchall()]
+
+
+def reiniciar_sequencias(conexao, tabelas):
+    """
+    Faz os próximos IDs das tabelas (já vazias) voltarem a 1
+    """
+    if dialeto(conexao) == 'postgresql':
+        for tabela in tabelas:
+            conexao.execute(
+                "SELECT setval(pg_get_serial_sequence(?, 'id'), 1, false)", (tabela,))
+    else:
+        marcadores = ','.join('?' * len(tabelas))
+        conexao.execute(f'DELETE FROM sqlite_sequence WHERE name IN ({marcadores})', list(tabelas))
+
+
+def travar_migracoes(conexao):
+    """
+    No PostgreSQL, impede que duas instâncias criem as tabelas ao mesmo tempo
+    """
+    if dialeto(conexao) == 'postgresql':
+        conexao.execute('SELECT pg_advisory_xact_lock(?)', (TRAVA_MIGRACOES,))
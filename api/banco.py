@@ -0,0 +1,165 @@
+# -*- coding: utf-8 -*-
+"""
+Caminhos da aplicação e banco de dados (criação e migrações)
+O backend vem da DATABASE_URL (veja api/armazenamento.py); sem ela, SQLite local
+"""
+
+import logging
+import os
+import sys
+import threading
+
+from api.armazenamento import colunas_da_tabela, criar_backend, dialeto, travar_migracoes
+from api.cotacoes import criar_tabelas_cotacoes
+from api.historico_precos import criar_tabelas_historico
+from api.indice_produtos import criar_tabela_fts
+from api.pasta_monitorada import criar_tabela_pdfs_importados
+
+log = logging.getLogger(__name__)
+
+backend_atual = None
+trava_backend = threading.Lock()
+
+
+def get_base_path():
+    """
+    Retorna o caminho base correto tanto para desenvolvimento quanto para executável
+    """
+    if getattr(sys, 'frozen', False):
+        # Rodando como executável PyInstaller
+        return os.path.dirname(sys.executable)
+    else:
+        # Rodando em desenvolvimento
+        return os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def get_db_path():
+    """
+    Retorna o caminho absoluto para o banco de dados
+    Compatível com executável PyInstaller
+    """
+    return os.path.join(get_base_path(), 'megafarma.db')
+
+
+def obter_backend():
+    """
+    Backend de armazenamento do processo, criado na primeira conexão
+    """
+    global backend_atual
+    if backend_atual is None:
+        with trava_backend:
+            if backend_atual is None:
+                backend_atual = criar_backend(os.environ.get('DATABASE_URL', ''), get_db_path())
+    return backend_atual
+
+
+def conectar():
+    """
+    Abre uma conexão com o banco (no PostgreSQL, empresta uma do pool; close() devolve)
+    """
+    return obter_backend().conectar()
+
+
+def init_db():
+    """
+    Inicializa o banco de dados com as tabelas necessárias
+    Compatível com Vercel e ambientes serverless
+    """
+    try:
+        conn = conectar()
+        cursor = conn.cursor()
+        travar_migracoes(conn)
+
+        # Banco novo com vacuum incremental (a manutenção devolve as páginas livres
+        # sem reescrever o arquivo); num banco existente só vale depois de um VACUUM
+        if dialeto(conn) == 'sqlite':
+            cursor.execute('PRAGMA auto_vacuum = INCREMENTAL')
+
+        # Verificar se a tabela produtos existe e tem a coluna antiga
+        colunas = colunas_da_tabela(conn, 'produtos')
+        tem_preco_referencia = 'preco_referencia' in colunas
+        tem_preco_toureiro = 'preco_toureiro' in colunas
+
+        # Se tem a coluna antiga mas não a nova, fazer migração
+        if tem_preco_referencia and not tem_preco_toureiro:
+            cursor.execute(
+                'ALTER TABLE produtos ADD COLUMN preco_toureiro REAL')
+            cursor.execute(
+                'UPDATE produtos SET preco_toureiro = preco_referencia')
+            log.info("Migração de preco_referencia para preco_toureiro concluída")
+
+        # Tabela de produtos TOUREIRO
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS produtos (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                descricao TEXT NOT NULL,
+                preco_toureiro REAL NOT NULL,
+                codigo TEXT
+            )
+        ''')
+
+        # Bancos antigos não têm a coluna de código do produto
+        if 'codigo' not in colunas_da_tabela(conn, 'produtos'):
+            cursor.execute('ALTER TABLE produtos ADD COLUMN codigo TEXT')
+
+        # Tabela de fornecedores
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS fornecedores (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                nome TEXT NOT NULL UNIQUE
+            )
+        ''')
+
+        # Condições comerciais do fornecedor (otimização do pedido)
+        colunas = colunas_da_tabela(conn, 'fornecedores')
+        if 'pedido_minimo' not in colunas:
+            cursor.execute('ALTER TABLE fornecedores ADD COLUMN pedido_minimo REAL DEFAULT 0')
+        if 'frete' not in colunas:
+            cursor.execute('ALTER TABLE fornecedores ADD COLUMN frete REAL DEFAULT 0')
+
+        # Tabela de preços por fornecedor
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS precos_fornecedores (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                produto_id INTEGER,
+                fornecedor_id INTEGER,
+                preco REAL,
+                FOREIGN KEY (produto_id) REFERENCES produtos (id),
+                FOREIGN KEY (fornecedor_id) REFERENCES fornecedores (id),
+                UNIQUE(produto_id, fornecedor_id)
+            )
+        ''')
+
+        # Índice para listar produtos já ordenados pela descrição (sem ordenação em memória)
+        cursor.execute(
+            'CREATE INDEX IF NOT EXISTS idx_produtos_descricao ON produtos (descricao)')
+        cursor.execute(
+            'CREATE INDEX IF NOT EXISTS idx_produtos_codigo ON produtos (codigo)')
+
+        # Índice de busca textual (FTS5) mantido em sincronia por gatilhos
+        if dialeto(conn) != 'sqlite' or not criar_tabela_fts(conn):
+            log.warning("Banco sem FTS5: a busca usará LIKE")
+
+        # Histórico de preços (somente inclusão), preservado entre importações
+        criar_tabelas_historico(conn)
+
+        # PDFs já importados pela pasta monitorada (SHA-256)
+        criar_tabela_pdfs_importados(conn)
+
+        # Cotações registradas (versões da tabela, com cópia na escrita)
+        criar_tabelas_cotacoes(conn)
+
+        conn.commit()
+        conn.close()
+        log.info("Banco de dados inicializado em: %s", obter_backend())
+
+    except Exception:
+        log.exception("Erro ao inicializar banco de dados")
+        if 'conn' in locals():
+            conn.close()
+
+
+def ensure_db_initialized():
+    """Garante que o banco de dados está inicializado (para ambientes serverless)"""
+    if not obter_backend().inicializado():
+        init_db()
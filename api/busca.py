@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+"""
+Busca de produtos no servidor (FTS5), para catálogos grandes demais
+para serem carregados e filtrados inteiros no navegador
+"""
+
+import sqlite3
+
+from api.armazenamento import dialeto
+from api.cotacoes import sql_da_cotacao
+from api.indice_produtos import normalizar_texto, termos_fts
+
+LIMITE_PADRAO = 50
+LIMITE_MAXIMO = 500
+
+# Letras acentuadas do Latin-1 e a letra sem acento (minúsculas também: conforme a
+# collation, o UPPER do PostgreSQL só converte ASCII)
+ACENTUADAS = ''.join(letra for letra in map(chr, range(0xC0, 0x100))
+                     if len(normalizar_texto(letra)) == 1)
+SEM_ACENTO = ''.join(normalizar_texto(letra) for letra in ACENTUADAS)
+
+
+def sem_acentos(conn, coluna):
+    """
+    Expressão SQL com a coluna em maiúsculas e sem acentos, como normalizar_texto
+    deixa as palavras da busca. No SQLite (cujo UPPER só converte ASCII) é o
+    próprio normalizar_texto, registrado como função da conexão
+    """
+    if dialeto(conn) == 'sqlite':
+        conn.create_function('normalizar_texto', 1, normalizar_texto, deterministic=True)
+        return f'normalizar_texto({coluna})'
+    return f"TRANSLATE(UPPER({coluna}), '{ACENTUADAS}', '{SEM_ACENTO}')"
+
+
+def consultar_fts(cursor, termos, limite):
+    """
+    Executa a busca no índice FTS5 com todas as palavras e, se nada casa,
+    com qualquer uma delas; retorna as linhas ou None se o SQLite não tem FTS5
+    """
+    linhas = []
+    for operador in (' ', ' OR ') if len(termos) > 1 else (' ',):
+        try:
+            cursor.execute('''
+                SELECT p.id, p.descricao, p.codigo, p.preco_toureiro
+                FROM produtos_fts
+                JOIN produtos p ON p.id = produtos_fts.rowid
+                WHERE produtos_fts MATCH ?
+                ORDER BY bm25(produtos_fts)
+                LIMIT ?
+            ''', (operador.join(termos), limite))
+        except sqlite3.OperationalError:
+            return None
+        linhas = cursor.fetchall()
+        if linhas:
+            break
+    return linhas
+
+
+def buscar_produtos(conn, texto, limite=LIMITE_PADRAO, cotacao=None):
+    """
+    Retorna os produtos que casam com o texto, do mais relevante (bm25) para
+    o menos relevante, com o preço TOUREIRO e os preços de cada fornecedor
+    Todas as palavras precisam aparecer (como palavra ou prefixo) na
+    descrição ou no código; no FTS5, se nenhum produto tem todas, valem os
+    que têm alguma. O índice FTS5 é o da tabela atual: numa cotação a busca
+    é por LIKE
+    """
+    termos = termos_fts(texto)
+    if not termos:
+        return []
+
+    limite = max(1, min(int(limite), LIMITE_MAXIMO))
+    cursor = conn.cursor()
+
+    linhas = None
+    if cotacao is None and dialeto(conn) == 'sqlite':
+        linhas = consultar_fts(cursor, termos, limite)
+
+    if linhas is None:
+        # Sem FTS5 (SQLite antigo, PostgreSQL ou cotação): busca simples por LIKE em cada
+        # palavra, com a descrição sem acentos como as palavras
+        palavras = normalizar_texto(texto).split()
+        descricao = sem_acentos(conn, 'descricao')
+        filtros = ' AND '.join(f'({descricao} LIKE ? OR codigo = ?)' for _ in palavras)
+        parametros = []
+        for palavra in palavras:
+            parametros += [f'%{palavra}%', palavra]
+        cursor.execute(sql_da_cotacao(f'''
+            SELECT id, descricao, codigo, preco_toureiro FROM produtos
+            WHERE {filtros}
+            ORDER BY descricao
+            LIMIT ?
+        ''', cotacao), parametros + [limite])
+        linhas = cursor.fetchall()
+
+    produtos = [{
+        'id': p[0],
+        'descricao': p[1],
+        'codigo': p[2],
+        'preco_toureiro': p[3],
+        'precos': {}
+    } for p in linhas]
+
+    if produtos:
+        por_id = {produto['id']: produto for produto in produtos}
+        marcadores = ','.join('?' * len(por_id))
+        cursor.execute(sql_da_cotacao(f'''
+            SELECT produto_id, fornecedor_id, preco FROM precos_fornecedores
+            WHERE produto_id IN ({marcadores})
+        ''', cotacao), list(por_id))
+        for produto_id, fornecedor_id, preco in cursor:
+            por_id[produto_id]['precos'][fornecedor_id] = preco
+
+    return produtos
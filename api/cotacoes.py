@@ -0,0 +1,240 @@
+# -*- coding: utf-8 -*-
+"""
+Cotações: versões (fotografias) da tabela de preços
+
+A tabela principal é uma só e mutável: um novo PDF TOUREIRO ou a exclusão da
+tabela apagam a cotação anterior. Registrar uma cotação guarda o estado da
+tabela naquele momento com cópia na escrita: cada linha de cotacao_precos vale
+para as cotações desde <= c < ate e só é gravada quando o preço muda, então os
+preços iguais são compartilhados entre as versões em vez de copiados. As
+linhas ainda válidas têm ate = ABERTA
+
+Produtos e fornecedores são identificados pelas chaves estáveis do histórico
+de preços (historico_produtos, historico_fornecedores; o TOUREIRO é o
+fornecedor 0), porque os IDs das tabelas principais mudam a cada importação
+
+As consultas de leitura rodam sobre uma cotação sem mudar o SQL: sql_da_cotacao
+antepõe CTEs chamadas produtos, fornecedores e precos_fornecedores, que
+encobrem as tabelas principais (no SQLite e no PostgreSQL). Pelo índice em
+(ate, desde), ler uma cotação percorre só as linhas abertas e as fechadas
+depois dela, não o acúmulo de todas as versões
+"""
+
+import time
+
+from api.armazenamento import inserir
+from api.historico_precos import (FORNECEDOR_TOUREIRO, id_historico_fornecedor,
+                                  ids_historico_produtos, para_iso)
+
+# Fim da validade das linhas que valem para a cotação mais recente
+ABERTA = 2 ** 63 - 1
+
+LIMITE_ALTERACOES = 5000
+
+CTES_COTACAO = '''
+    WITH precos_fornecedores AS (
+        SELECT id, produto AS produto_id, fornecedor AS fornecedor_id, preco
+        FROM cotacao_precos
+        WHERE ate > {cotacao} AND desde <= {cotacao} AND fornecedor <> 0
+    ), produtos AS (
+        SELECT p.id, p.descricao, t.preco AS preco_toureiro,
+               CASE WHEN SUBSTR(p.chave, 1, 2) = 'C:' THEN SUBSTR(p.chave, 3) END AS codigo
+        FROM cotacao_precos t
+        JOIN historico_produtos p ON p.id = t.produto
+        WHERE t.ate > {cotacao} AND t.desde <= {cotacao} AND t.fornecedor = 0
+    ), fornecedores AS (
+        SELECT f.id, f.nome, c.pedido_minimo, c.frete
+        FROM cotacao_fornecedores c
+        JOIN historico_fornecedores f ON f.id = c.fornecedor
+        WHERE c.cotacao = {cotacao}
+    )
+'''
+
+
+def criar_tabelas_cotacoes(conn):
+    """
+    Cria as tabelas e o índice das cotações
+    """
+    conn.executescript('''
+        CREATE TABLE IF NOT EXISTS cotacoes (
+            id INTEGER PRIMARY KEY,
+            nome TEXT NOT NULL,
+            origem TEXT NOT NULL,
+            criada_em BIGINT NOT NULL,
+            produtos INTEGER NOT NULL,
+            alteracoes INTEGER NOT NULL
+        );
+
+        CREATE TABLE IF NOT EXISTS cotacao_fornecedores (
+            cotacao INTEGER NOT NULL,
+            fornecedor INTEGER NOT NULL,
+            pedido_minimo REAL,
+            frete REAL,
+            PRIMARY KEY (cotacao, fornecedor)
+        );
+
+        CREATE TABLE IF NOT EXISTS cotacao_precos (
+            id INTEGER PRIMARY KEY,
+            produto INTEGER NOT NULL,
+            fornecedor INTEGER NOT NULL,
+            preco REAL,
+            desde INTEGER NOT NULL,
+            ate BIGINT NOT NULL
+        );
+
+        CREATE INDEX IF NOT EXISTS idx_cotacao_precos_validade
+            ON cotacao_precos (ate, desde, fornecedor, produto, preco);
+    ''')
+
+
+def sql_da_cotacao(sql, cotacao_id=None):
+    """
+    O comando sobre a cotação pedida (None: sobre a tabela atual, sem mudança)
+    """
+    if cotacao_id is None:
+        return sql
+    return CTES_COTACAO.format(cotacao=int(cotacao_id)) + sql
+
+
+def cotacao_pedida(conn, valor):
+    """
+    ID da cotação pedida (parâmetro cotacao das rotas), None para a tabela atual
+    Levanta ValueError se ela não existe
+    """
+    if valor is None or valor == '':
+        return None
+    try:
+        cotacao_id = int(valor)
+    except (TypeError, ValueError):
+        raise ValueError(f'Cotação inválida: {valor}')
+
+    cursor = conn.cursor()
+    cursor.execute('SELECT 1 FROM cotacoes WHERE id = ?', (cotacao_id,))
+    if not cursor.fetchone():
+        raise ValueError(f'Cotação {cotacao_id} não encontrada')
+    return cotacao_id
+
+
+def registrar_cotacao(conn, origem='manual', nome=None, momento=None):
+    """
+    Registra o estado atual da tabela como uma nova cotação, gravando só os
+    preços que mudaram desde a anterior. Não faz commit
+    origem: manual, toureiro (antes de um novo PDF substituir os produtos) ou
+    exclusao (antes de excluir a tabela)
+    Retorna o ID da cotação; se nada mudou, o da última (sem criar outra);
+    None se a tabela está vazia
+    """
+    momento = int(momento if momento is not None else time.time())
+    cursor = conn.cursor()
+
+    cursor.execute('SELECT id, preco_toureiro FROM produtos')
+    toureiro = dict(cursor.fetchall())
+    if not toureiro:
+        return None
+    produtos = ids_historico_produtos(conn, toureiro)
+
+    cursor.execute('SELECT id, pedido_minimo, frete FROM fornecedores')
+    condicoes = cursor.fetchall()
+    fornecedores = {f[0]: id_historico_fornecedor(conn, f[0]) for f in condicoes}
+    condicoes = sorted((fornecedores[f], pedido_minimo or 0, frete or 0)
+                       for f, pedido_minimo, frete in condicoes)
+
+    atuais = {(produtos[p], FORNECEDOR_TOUREIRO): preco
+              for p, preco in toureiro.items() if p in produtos}
+    cursor.execute('SELECT produto_id, fornecedor_id, preco FROM precos_fornecedores')
+    for produto_id, fornecedor_id, preco in cursor.fetchall():
+        if produto_id in produtos and fornecedor_id in fornecedores:
+            atuais[(produtos[produto_id], fornecedores[fornecedor_id])] = preco
+
+    cursor.execute('SELECT id, produto, fornecedor, preco FROM cotacao_precos WHERE ate = ?',
+                   (ABERTA,))
+    abertas = {(produto, fornecedor): (linha_id, preco)
+               for linha_id, produto, fornecedor, preco in cursor.fetchall()}
+
+    # Fecha o que mudou ou saiu da tabela; abre o que mudou ou entrou
+    fechadas = [linha_id for chave, (linha_id, preco) in abertas.items()
+                if chave not in atuais or atuais[chave] != preco]
+    novas = [(produto, fornecedor, preco) for (produto, fornecedor), preco in atuais.items()
+             if (produto, fornecedor) not in abertas or abertas[(produto, fornecedor)][1] != preco]
+
+    cursor.execute('SELECT id FROM cotacoes ORDER BY id DESC LIMIT 1')
+    ultima = cursor.fetchone()
+    if ultima and not fechadas and not novas:
+        cursor.execute('SELECT fornecedor, pedido_minimo, frete FROM cotacao_fornecedores '
+                       'WHERE cotacao = ? ORDER BY fornecedor', (ultima[0],))
+        if [tuple(f) for f in cursor.fetchall()] == condicoes:
+            return ultima[0]
+
+    nome = nome or f"Cotação de {time.strftime('%d/%m/%Y %H:%M', time.localtime(momento))}"
+    cotacao_id = inserir(cursor, '''
+        INSERT INTO cotacoes (nome, origem, criada_em, produtos, alteracoes)
+        VALUES (?, ?, ?, ?, ?)
+    ''', (nome, origem, momento, len(set(produtos.values())), len(fechadas) + len(novas)))
+
+    cursor.executemany('UPDATE cotacao_precos SET ate = ? WHERE id = ?',
+                       ((cotacao_id, linha_id) for linha_id in fechadas))
+    cursor.executemany('''
+        INSERT INTO cotacao_precos (produto, fornecedor, preco, desde, ate)
+        VALUES (?, ?, ?, ?, ?)
+    ''', ((produto, fornecedor, preco, cotacao_id, ABERTA) for produto, fornecedor, preco in novas))
+    cursor.executemany('''
+        INSERT INTO cotacao_fornecedores (cotacao, fornecedor, pedido_minimo, frete)
+        VALUES (?, ?, ?, ?)
+    ''', ((cotacao_id,) + condicao for condicao in condicoes))
+    return cotacao_id
+
+
+def listar_cotacoes(conn):
+    """
+    Cotações registradas, da mais recente para a mais antiga
+    """
+    cursor = conn.cursor()
+    cursor.execute('SELECT id, nome, origem, criada_em, produtos, alteracoes '
+                   'FROM cotacoes ORDER BY id DESC')
+    return [{
+        'id': cotacao_id,
+        'nome': nome,
+        'origem': origem,
+        'criada_em': para_iso(criada_em),
+        'produtos': produtos,
+        'alteracoes': alteracoes
+    } for cotacao_id, nome, origem, criada_em, produtos, alteracoes in cursor.fetchall()]
+
+
+def comparar_cotacoes(conn, de, para, limite=LIMITE_ALTERACOES):
+    """
+    Preços que mudaram, entraram ou saíram entre duas cotações, das maiores
+    variações para as menores (entradas e saídas por último)
+    Só lê as linhas fechadas ou abertas entre as duas versões
+    """
+    de, para = min(de, para), max(de, para)
+    cursor = conn.cursor()
+    cursor.execute('''
+        SELECT t.produto, t.fornecedor, p.descricao, COALESCE(f.nome, 'TOUREIRO'), t.preco,
+               t.desde <= ?
+        FROM cotacao_precos t
+        JOIN historico_produtos p ON p.id = t.produto
+        LEFT JOIN historico_fornecedores f ON f.id = t.fornecedor
+        WHERE t.ate > ? AND t.desde <= ?
+          AND ((t.ate <= ? AND t.desde <= ?) OR (t.desde > ? AND t.ate > ?))
+    ''', (de, de, para, para, de, de, para))
+
+    alteracoes = {}
+    for produto, fornecedor, descricao, nome, preco, anterior in cursor.fetchall():
+        alteracao = alteracoes.setdefault((produto, fornecedor), {
+            'produto': descricao,
+            'fornecedor': nome,
+            'preco_anterior': None,
+            'preco': None,
+            'variacao_percentual': None
+        })
+        alteracao['preco_anterior' if anterior else 'preco'] = preco
+
+    for alteracao in alteracoes.values():
+        anterior, preco = alteracao['preco_anterior'], alteracao['preco']
+        if anterior and preco is not None:
+            alteracao['variacao_percentual'] = round((preco - anterior) * 100 / anterior, 2)
+
+    return sorted(alteracoes.values(), key=lambda a: (a['variacao_percentual'] is None,
+                                                     -abs(a['variacao_percentual'] or 0),
+                                                     a['produto']))[:limite]
@@ -0,0 +1,204 @@
+# -*- coding: utf-8 -*-
+"""
+Exportação tabular da tabela de preços (CSV, XLSX e Parquet)
+Os arquivos são gerados em streaming, linha a linha, a partir do cursor SQLite,
+para que o uso de memória não cresça com o tamanho do catálogo
+"""
+
+import csv
+import importlib.util
+import io
+import tempfile
+from itertools import groupby
+
+from api.cotacoes import sql_da_cotacao
+
+# Tamanho dos blocos enviados ao cliente
+TAMANHO_BLOCO = 64 * 1024
+
+# Linhas acumuladas por row group no Parquet
+LINHAS_POR_LOTE = 5000
+
+TIPOS_MIME = {
+    'csv': 'text/csv; charset=utf-8',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    'parquet': 'application/vnd.apache.parquet',
+}
+
+
+def formatos_disponiveis():
+    """
+    Retorna os formatos de exportação suportados no ambiente atual
+    Parquet só é oferecido quando o pyarrow está instalado
+    """
+    formatos = ['csv', 'xlsx']
+    if importlib.util.find_spec('pyarrow') is not None:
+        formatos.append('parquet')
+    return formatos
+
+
+def linhas_tabela_completa(conn, cotacao=None):
+    """
+    Gera o cabeçalho e as linhas da tabela completa (atual ou de uma cotação):
+    Produto, TOUREIRO e uma coluna por fornecedor (vazia quando não há preço)
+    """
+    cursor = conn.cursor()
+    cursor.execute(sql_da_cotacao('SELECT id, nome FROM fornecedores ORDER BY nome', cotacao))
+    fornecedores = cursor.fetchall()
+    posicoes = {fornecedor_id: i for i, (fornecedor_id, _) in enumerate(fornecedores)}
+
+    yield ['Produto', 'TOUREIRO'] + [nome for _, nome in fornecedores]
+
+    cursor.execute(sql_da_cotacao('''
+        SELECT p.id, p.descricao, p.preco_toureiro, pf.fornecedor_id, pf.preco
+        FROM produtos p
+        LEFT JOIN precos_fornecedores pf ON pf.produto_id = p.id
+        ORDER BY p.descricao, p.id
+    ''', cotacao))
+
+    # As linhas de um mesmo produto chegam consecutivas por causa do ORDER BY
+    for (_, descricao, preco_toureiro), grupo in groupby(cursor, key=lambda r: r[:3]):
+        precos = [None] * len(fornecedores)
+        for _, _, _, fornecedor_id, preco in grupo:
+            if fornecedor_id in posicoes and preco is not None and preco > 0:
+                precos[posicoes[fornecedor_id]] = preco
+        yield [descricao, preco_toureiro] + precos
+
+
+def linhas_melhores_precos(conn, cotacao=None):
+    """
+    Gera o cabeçalho e as linhas da lista de melhores preços (atual ou de uma cotação)
+    Mesma regra de gerar_relatorio: só entram produtos com preço de fornecedor
+    para comparar, preços zerados são ignorados e empates ficam com o TOUREIRO
+    """
+    cursor = conn.cursor()
+
+    yield ['Produto', 'Fornecedor', 'Menor Preço', 'TOUREIRO', 'Economia']
+
+    cursor.execute(sql_da_cotacao('''
+        SELECT p.id, p.descricao, p.preco_toureiro, f.nome, pf.preco
+        FROM produtos p
+        LEFT JOIN precos_fornecedores pf ON pf.produto_id = p.id AND pf.preco > 0
+        LEFT JOIN fornecedores f ON f.id = pf.fornecedor_id
+        ORDER BY p.descricao, p.id, f.nome
+    ''', cotacao))
+
+    for (_, descricao, preco_toureiro), grupo in groupby(cursor, key=lambda r: r[:3]):
+        menor_preco = preco_toureiro
+        fornecedor_menor = 'TOUREIRO'
+        tem_fornecedor = False
+
+        for _, _, _, nome_fornecedor, preco in grupo:
+            if nome_fornecedor is None:
+                continue
+            tem_fornecedor = True
+            if preco < menor_preco:
+                menor_preco = preco
+                fornecedor_menor = nome_fornecedor
+
+        if tem_fornecedor:
+            yield [descricao, fornecedor_menor, menor_preco, preco_toureiro,
+                   round(preco_toureiro - menor_preco, 4)]
+
+
+def gerar_csv(linhas):
+    """
+    Serializa as linhas em CSV (UTF-8, separador vírgula, decimal ponto)
+    """
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer)
+
+    for linha in linhas:
+        escritor.writerow(linha)
+        if buffer.tell() >= TAMANHO_BLOCO:
+            yield buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate()
+
+    if buffer.tell():
+        yield buffer.getvalue().encode('utf-8')
+
+
+def gerar_xlsx(linhas, titulo):
+    """
+    Serializa as linhas em XLSX usando o modo write_only do openpyxl,
+    que grava as linhas em disco à medida que chegam
+    """
+    from openpyxl import Workbook
+
+    with tempfile.TemporaryFile() as arquivo:
+        pasta = Workbook(write_only=True)
+        planilha = pasta.create_sheet(titulo[:31])
+        for linha in linhas:
+            planilha.append(linha)
+        pasta.save(arquivo)
+
+        arquivo.seek(0)
+        yield from ler_blocos(arquivo)
+
+
+def gerar_parquet(linhas, colunas_texto):
+    """
+    Serializa as linhas em Parquet, um row group a cada LINHAS_POR_LOTE linhas
+    As primeiras `colunas_texto` colunas são texto e as demais são preços
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    linhas = iter(linhas)
+    cabecalho = next(linhas)
+    esquema = pa.schema(
+        [pa.field(nome, pa.string()) for nome in cabecalho[:colunas_texto]] +
+        [pa.field(nome, pa.float64()) for nome in cabecalho[colunas_texto:]]
+    )
+
+    with tempfile.TemporaryFile() as arquivo:
+        with pq.ParquetWriter(arquivo, esquema) as escritor:
+            lote = []
+            for linha in linhas:
+                lote.append(linha)
+                if len(lote) >= LINHAS_POR_LOTE:
+                    escritor.write_table(montar_tabela_arrow(lote, esquema))
+                    lote = []
+            if lote:
+                escritor.write_table(montar_tabela_arrow(lote, esquema))
+
+        arquivo.seek(0)
+        yield from ler_blocos(arquivo)
+
+
+def montar_tabela_arrow(lote, esquema):
+    """
+    Converte um lote de linhas em uma tabela Arrow coluna a coluna
+    """
+    import pyarrow as pa
+
+    colunas = [
+        pa.array([linha[i] for linha in lote], type=campo.type)
+        for i, campo in enumerate(esquema)
+    ]
+    return pa.Table.from_arrays(colunas, schema=esquema)
+
+
+def ler_blocos(arquivo):
+    """
+    Lê um arquivo em blocos de TAMANHO_BLOCO bytes
+    """
+    while True:
+        bloco = arquivo.read(TAMANHO_BLOCO)
+        if not bloco:
+            break
+        yield bloco
+
+
+def gerar_exportacao(formato, linhas, titulo, colunas_texto=1):
+    """
+    Retorna o gerador de bytes do arquivo exportado no formato pedido
+    """
+    if formato == 'csv':
+        return gerar_csv(linhas)
+    if formato == 'xlsx':
+        return gerar_xlsx(linhas, titulo)
+    if formato == 'parquet':
+        return gerar_parquet(linhas, colunas_texto)
+    raise ValueError(f'Formato de exportação não suportado: {formato}')
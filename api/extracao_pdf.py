@@ -0,0 +1,271 @@
+# -*- coding: utf-8 -*-
+"""
+Extração dos produtos do PDF TOUREIRO
+
+Dois modos (MEGAFARMA_EXTRACAO ou o argumento modo):
+- palavras (padrão): monta as palavras direto dos caracteres do layout do
+  pdfminer (posição x de cada caractere) e fatia os campos pelos limites de
+  coluna aprendidos nas primeiras páginas, sem detecção de tabelas e sem os
+  objetos por caractere do pdfplumber (a maior parte do custo por página).
+  Com um perfil de layout salvo (layouts/, ver api/layout_pdf.py) as colunas,
+  a faixa de dados e as páginas a pular vêm do perfil, sem aprendizado
+- tabelas: extract_tables() e, se vierem poucos produtos, o texto da página
+Se nas primeiras páginas nenhuma linha tiver o formato esperado, o modo
+palavras passa para o modo tabelas
+
+Nos dois modos, páginas sem nenhum valor no conteúdo bruto (pagina_tem_precos)
+são puladas antes do layout, e as páginas são lidas só na faixa de dados
+(do perfil ou, no modo palavras, das linhas das primeiras páginas).
+Cada página roda num processo supervisionado (api/paginas_pdf.py): a que
+falha ou passa do tempo/memória é ignorada e informada, e o resto é importado
+"""
+
+import logging
+import os
+import time
+
+from api.layout_pdf import (PADRAO_LINHA, aprender_colunas, banda_das_linhas, carregar_perfis,
+                            encontrar_perfil, linha_casa, linhas_de_palavras, pagina_tem_precos,
+                            palavras_da_pagina)
+from api.metricas import registrar_extracao_pdf
+from api.paginas_pdf import DocumentoPdf, PaginaIgnorada, criar_executor
+from api.registro import Amostragem
+
+log = logging.getLogger(__name__)
+
+MODOS = ('palavras', 'tabelas')
+
+# Páginas usadas para aprender as colunas quando não há perfil de layout
+PAGINAS_APRENDIZADO = 3
+# Abaixo disso, o modo tabelas também lê o texto da página
+MINIMO_TABELAS = 5
+# Folga (em pontos) em volta da faixa de dados ao recortar a página no modo tabelas
+MARGEM_CELULA = 15
+
+
+class Coletor:
+    """
+    Valida e acumula os produtos extraídos (sem duplicatas de descrição)
+    """
+
+    def __init__(self, log_produto):
+        self.produtos = []
+        self.descricoes = set()
+        self.resumo = {'tabelas': 0, 'linhas': 0, 'do_texto': 0, 'duplicados': 0, 'descartados': 0,
+                       'sem_precos': 0, 'ignoradas': 0}
+        self.ignoradas = []
+        self.log_produto = log_produto
+
+    def ignorar(self, numero, motivo):
+        self.resumo['ignoradas'] += 1
+        self.ignoradas.append({'pagina': numero + 1, 'motivo': str(motivo)})
+        log.warning("Página %d ignorada: %s", numero + 1, motivo)
+
+    def adicionar(self, codigo, descricao, preco_str, origem='Produto extraído'):
+        try:
+            # Converter preço (formato: 17,9900)
+            preco = float(preco_str.replace(',', '.'))
+        except ValueError as e:
+            self.resumo['descartados'] += 1
+            log.warning("Erro ao converter preço '%s': %s", preco_str, e)
+            return False
+
+        # Validar dados
+        if not (3 <= len(descricao) <= 200 and 0.01 <= preco <= 9999.99):
+            self.resumo['descartados'] += 1
+            return False
+
+        # Evitar duplicatas
+        if descricao in self.descricoes:
+            self.resumo['duplicados'] += 1
+            return False
+
+        self.descricoes.add(descricao)
+        self.produtos.append({'codigo': codigo, 'descricao': descricao, 'preco': preco})
+        self.log_produto.debug("%s: %s - R$ %.2f", origem, descricao, preco)
+        return True
+
+    def adicionar_linha(self, texto, origem='Produto extraído'):
+        match = PADRAO_LINHA.match(texto.strip())
+        if not match:
+            return False
+        return self.adicionar(match.group('codigo'), match.group('descricao').strip(),
+                              match.group('preco'), origem)
+
+
+def ler_tabelas(page, banda=None, faltam=0):
+    """
+    Tarefa de página do modo tabelas: (tabelas, primeiras células, linhas do texto)
+    A linha inteira fica na primeira célula de uma tabela de uma coluna; o texto
+    da página só é lido se as células não tiverem `faltam` linhas no formato.
+    Com banda (topo, base), só a faixa de dados é analisada. None se não há valores
+    """
+    if pagina_tem_precos(page) is False:
+        return None
+    if banda:
+        # As bordas das células ficam acima e abaixo do texto da primeira e da última linha
+        page = page.crop((0, max(0, banda[0] - MARGEM_CELULA), page.width,
+                          min(page.height, banda[1] + MARGEM_CELULA)))
+
+    tables = page.extract_tables()
+    celulas = [str(row[0]) for table in tables for row in table or []
+               if row and row[0] and str(row[0]).strip()]
+    texto = []
+    if sum(1 for celula in celulas if PADRAO_LINHA.match(celula.strip())) < faltam:
+        texto = (page.extract_text() or '').split('\n')
+    return len(tables), celulas, texto
+
+
+def ler_palavras(page, banda=None):
+    """
+    Tarefa de página do modo palavras: linhas de palavras da faixa; None se não há valores
+    """
+    if pagina_tem_precos(page) is False:
+        return None
+    return linhas_de_palavras(palavras_da_pagina(page, banda))
+
+
+def executar_pagina(executor, numero, coletor, funcao, *argumentos):
+    """
+    Resultado da tarefa na página; None se a página foi ignorada ou não tem valores
+    """
+    try:
+        resultado = executor.executar(numero, funcao, *argumentos)
+    except PaginaIgnorada as e:
+        coletor.ignorar(numero, e)
+        return None
+    if resultado is None:
+        coletor.resumo['sem_precos'] += 1
+    return resultado
+
+
+def extrair_por_tabelas(executor, numero, coletor, banda=None):
+    resultado = executar_pagina(executor, numero, coletor, ler_tabelas, banda,
+                                max(0, MINIMO_TABELAS - len(coletor.produtos)))
+    if resultado is None:
+        return
+    tabelas, celulas, texto = resultado
+    coletor.resumo['tabelas'] += tabelas
+
+    for celula in celulas:
+        coletor.resumo['linhas'] += 1
+        coletor.adicionar_linha(celula)
+
+    # Se não encontrou produtos nas tabelas, tentar extrair do texto
+    if len(coletor.produtos) < MINIMO_TABELAS:
+        for line in texto:
+            if coletor.adicionar_linha(line, 'Produto do texto'):
+                coletor.resumo['do_texto'] += 1
+
+
+def extrair_por_palavras(linhas, layout, coletor):
+    for linha in linhas:
+        coletor.resumo['linhas'] += 1
+        campos = layout.campos(linha)
+        if campos:
+            coletor.adicionar(*campos)
+
+
+def extrair_dados_pdf(caminho_pdf, modo=None, perfil=None, janela=None, relatorio=None):
+    """
+    Extrai dados de produtos e preços do PDF
+    Formato esperado: CODIGO DESCRICAO UNIDADE PRECO QUANTIDADE
+    perfil: PerfilLayout a usar; sem ele, um perfil salvo com a mesma assinatura do PDF
+    janela: reabre o PDF a cada janela páginas (padrão MEGAFARMA_PDF_JANELA; 0 desliga)
+    relatorio: dict que recebe o resumo e as páginas ignoradas ({'pagina', 'motivo'})
+    Páginas que falham ou passam do tempo/memória são ignoradas (api/paginas_pdf.py)
+    """
+    modo = modo or os.environ.get('MEGAFARMA_EXTRACAO') or 'palavras'
+    if janela is None:
+        janela = int(os.environ.get('MEGAFARMA_PDF_JANELA') or 0)
+    paginas = 0
+    inicio = time.perf_counter()
+    # Uma mensagem por produto/página só em DEBUG (e amostrada com MEGAFARMA_LOG_AMOSTRA)
+    por_produto = Amostragem(log)
+    coletor = Coletor(por_produto)
+    layout = None
+
+    try:
+        with DocumentoPdf(caminho_pdf, janela) as documento, \
+                criar_executor(documento) as executor:
+            pdf = documento.pdf
+            total = documento.total
+            log.info("Processando PDF com %d páginas (modo %s)", total, modo)
+
+            paginas_dados = range(total)
+            primeira = None
+            banda = None
+            if total:
+                # Layout conhecido: colunas, faixa e páginas vêm do perfil, sem aprendizado
+                # (no modo tabelas, só a faixa e as páginas)
+                if perfil is None:
+                    perfis = carregar_perfis()
+                    if perfis:
+                        primeira = executar_pagina(executor, 0, coletor, palavras_da_pagina)
+                        perfil = encontrar_perfil(pdf, perfis, primeira or [])
+                if perfil is not None:
+                    layout = perfil.layout
+                    banda = perfil.banda
+                    paginas_dados = perfil.paginas_de_dados(total)
+                    log.info("Perfil de layout %s: %s, páginas %d a %d", perfil.nome,
+                             layout.descrever(), paginas_dados.start + 1, paginas_dados.stop)
+
+            # Linhas das primeiras páginas, guardadas até o layout ser conhecido
+            pendentes = []
+
+            for page_num in paginas_dados:
+                paginas += 1
+
+                if modo == 'tabelas':
+                    extrair_por_tabelas(executor, page_num, coletor, banda)
+                    por_produto.debug("Página %d: %d produtos até aqui", page_num + 1,
+                                      len(coletor.produtos))
+                    continue
+
+                if page_num == 0 and primeira:
+                    linhas = linhas_de_palavras(
+                        [p for p in primeira if not banda or banda[0] <= p['top'] <= banda[1]])
+                else:
+                    linhas = executar_pagina(executor, page_num, coletor, ler_palavras, banda)
+                if layout is None:
+                    pendentes.append(linhas or [])
+                    if page_num + 1 < min(PAGINAS_APRENDIZADO, total):
+                        continue
+                    aprendidas = [l for p in pendentes for l in p]
+                    layout = aprender_colunas(aprendidas)
+                    if layout is None:
+                        # Layout desconhecido: volta às tabelas, desde a primeira página
+                        log.info("Nenhuma linha no formato TOUREIRO nas primeiras páginas: "
+                                 "usando o modo tabelas")
+                        modo = 'tabelas'
+                        ignoradas = {i['pagina'] - 1 for i in coletor.ignoradas}
+                        for anterior in range(page_num + 1):
+                            if anterior not in ignoradas:
+                                extrair_por_tabelas(executor, anterior, coletor)
+                        continue
+                    # As páginas seguintes só são lidas na faixa das linhas de dados
+                    banda = banda_das_linhas([l for l in aprendidas if linha_casa(l)])
+                    log.info("Colunas aprendidas: %s; faixa de dados y=%.1f a %.1f",
+                             layout.descrever(), *banda)
+                    for anteriores in pendentes:
+                        extrair_por_palavras(anteriores, layout, coletor)
+                    pendentes = []
+                elif linhas:
+                    extrair_por_palavras(linhas, layout, coletor)
+                por_produto.debug("Página %d: %d produtos até aqui", page_num + 1,
+                                  len(coletor.produtos))
+
+    except Exception:
+        log.exception("Erro ao processar PDF %s", caminho_pdf)
+
+    produtos = coletor.produtos
+    segundos = time.perf_counter() - inicio
+    if relatorio is not None:
+        relatorio.update(coletor.resumo, paginas=paginas, paginas_ignoradas=coletor.ignoradas)
+    registrar_extracao_pdf(paginas, segundos)
+    log.info("Total de produtos extraídos: %d", len(produtos), extra={'dados': dict(
+        coletor.resumo, arquivo=os.path.basename(caminho_pdf), modo=modo, paginas=paginas,
+        perfil=perfil.nome if perfil is not None else None,
+        produtos=len(produtos), segundos=round(segundos, 3),
+        paginas_por_segundo=round(paginas / segundos, 1) if segundos else 0)})
+    return produtos
@@ -0,0 +1,349 @@
+# -*- coding: utf-8 -*-
+"""
+Histórico de preços (somente inclusão) por produto e fornecedor
+
+Os produtos e fornecedores do histórico são identificados por chaves estáveis
+(código ou descrição normalizada, nome do fornecedor), porque os IDs das
+tabelas principais mudam a cada novo PDF TOUREIRO ou exclusão da tabela.
+Cada linha guarda só inteiros (preço em centavos, data em segundos Unix) e
+só é gravada quando o preço muda, para o histórico continuar compacto e
+rápido com dezenas de milhões de linhas
+"""
+
+import time
+from datetime import datetime, timezone
+
+from api.indice_produtos import normalizar_texto
+
+# Série de referência (preço TOUREIRO), sem linha em historico_fornecedores
+FORNECEDOR_TOUREIRO = 0
+
+ORIGENS = {'manual': 1, 'toureiro': 2, 'importacao': 3}
+NOMES_ORIGENS = {codigo: nome for nome, codigo in ORIGENS.items()}
+
+# Agrupamentos aceitos nas consultas de tendência (formato do strftime)
+INTERVALOS = {'dia': '%Y-%m-%d', 'semana': '%Y-%W', 'mes': '%Y-%m'}
+
+LIMITE_PONTOS = 5000
+TAMANHO_LOTE_IDS = 500
+
+
+def criar_tabelas_historico(conn):
+    """
+    Cria as tabelas e índices do histórico de preços
+    """
+    conn.executescript('''
+        CREATE TABLE IF NOT EXISTS historico_produtos (
+            id INTEGER PRIMARY KEY,
+            chave TEXT NOT NULL UNIQUE,
+            descricao TEXT NOT NULL
+        );
+
+        CREATE TABLE IF NOT EXISTS historico_fornecedores (
+            id INTEGER PRIMARY KEY,
+            nome TEXT NOT NULL UNIQUE
+        );
+
+        CREATE TABLE IF NOT EXISTS historico_precos (
+            id INTEGER PRIMARY KEY,
+            produto INTEGER NOT NULL,
+            fornecedor INTEGER NOT NULL,
+            preco INTEGER NOT NULL,
+            registrado_em BIGINT NOT NULL,
+            origem INTEGER NOT NULL
+        );
+
+        CREATE INDEX IF NOT EXISTS idx_historico_produto
+            ON historico_precos (produto, fornecedor, registrado_em);
+        CREATE INDEX IF NOT EXISTS idx_historico_fornecedor
+            ON historico_precos (fornecedor, registrado_em);
+    ''')
+
+
+def chave_produto(codigo, descricao):
+    """
+    Chave estável do produto: o código quando existe, senão a descrição normalizada
+    """
+    if codigo:
+        return f'C:{codigo}'
+    return f'D:{normalizar_texto(descricao)}'
+
+
+def para_centavos(preco):
+    return int(round(float(preco) * 100))
+
+
+def para_timestamp(texto, fim_do_dia=False):
+    """
+    Converte uma data ISO (AAAA-MM-DD ou AAAA-MM-DDTHH:MM) em segundos Unix (UTC)
+    Levanta ValueError para datas inválidas
+    """
+    try:
+        data = datetime.fromisoformat(texto)
+    except ValueError:
+        raise ValueError(f'Data inválida: {texto} (use AAAA-MM-DD)')
+    if fim_do_dia and len(texto) == 10:
+        data = data.replace(hour=23, minute=59, second=59)
+    if data.tzinfo is None:
+        data = data.replace(tzinfo=timezone.utc)
+    return int(data.timestamp())
+
+
+def para_iso(timestamp):
+    return datetime.fromtimestamp(timestamp, timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+def ids_historico_produtos(conn, produto_ids):
+    """
+    Mapeia IDs da tabela produtos para IDs do histórico, criando os que faltam
+    """
+    produto_ids = list(produto_ids)
+    cursor = conn.cursor()
+    mapa = {}
+
+    for inicio in range(0, len(produto_ids), TAMANHO_LOTE_IDS):
+        lote = produto_ids[inicio:inicio + TAMANHO_LOTE_IDS]
+        cursor.execute(f'''
+            SELECT id, codigo, descricao FROM produtos
+            WHERE id IN ({','.join('?' * len(lote))})
+        ''', lote)
+        produtos = [(produto_id, chave_produto(codigo, descricao), descricao)
+                    for produto_id, codigo, descricao in cursor.fetchall()]
+
+        cursor.executemany(
+            'INSERT OR IGNORE INTO historico_produtos (chave, descricao) VALUES (?, ?)',
+            ((chave, descricao) for _, chave, descricao in produtos))
+        if not produtos:
+            continue
+        chaves = list({chave for _, chave, _ in produtos})
+        cursor.execute(f'''
+            SELECT chave, id FROM historico_produtos
+            WHERE chave IN ({','.join('?' * len(chaves))})
+        ''', chaves)
+        ids = dict(cursor.fetchall())
+        for produto_id, chave, _ in produtos:
+            mapa[produto_id] = ids[chave]
+
+    return mapa
+
+
+def id_historico_fornecedor(conn, fornecedor_id):
+    """
+    ID do fornecedor no histórico (None se o fornecedor não existe)
+    fornecedor_id None representa a referência TOUREIRO
+    """
+    if fornecedor_id is None:
+        return FORNECEDOR_TOUREIRO
+
+    cursor = conn.cursor()
+    cursor.execute('SELECT nome FROM fornecedores WHERE id = ?', (fornecedor_id,))
+    fornecedor = cursor.fetchone()
+    if not fornecedor:
+        return None
+
+    cursor.execute('INSERT OR IGNORE INTO historico_fornecedores (nome) VALUES (?)', fornecedor)
+    cursor.execute('SELECT id FROM historico_fornecedores WHERE nome = ?', fornecedor)
+    return cursor.fetchone()[0]
+
+
+def ultimos_precos(conn, fornecedor, produtos):
+    """
+    Último preço (centavos) de cada produto do histórico no fornecedor: {produto: preco}
+    Uma consulta por lote de produtos, em vez de uma por produto
+    """
+    produtos = list(produtos)
+    cursor = conn.cursor()
+    ultimos = {}
+
+    for inicio in range(0, len(produtos), TAMANHO_LOTE_IDS):
+        lote = produtos[inicio:inicio + TAMANHO_LOTE_IDS]
+        cursor.execute(f'''
+            SELECT produto, preco FROM (
+                SELECT produto, preco,
+                       ROW_NUMBER() OVER (PARTITION BY produto
+                                          ORDER BY registrado_em DESC, id DESC) AS ordem
+                FROM historico_precos
+                WHERE fornecedor = ? AND produto IN ({','.join('?' * len(lote))})
+            ) AS ultimos
+            WHERE ordem = 1
+        ''', [fornecedor] + lote)
+        ultimos.update(cursor.fetchall())
+
+    return ultimos
+
+
+def registrar_precos(conn, fornecedor_id, precos, origem, momento=None):
+    """
+    Acrescenta ao histórico os preços {produto_id: preco} de um fornecedor
+    (None para o preço TOUREIRO), ignorando os que não mudaram desde o último
+    registro. Não faz commit: roda dentro da transação de quem grava os preços
+    Retorna a quantidade de linhas acrescentadas
+    """
+    fornecedor = id_historico_fornecedor(conn, fornecedor_id)
+    if fornecedor is None or not precos:
+        return 0
+
+    momento = int(momento if momento is not None else time.time())
+    codigo_origem = ORIGENS[origem]
+    produtos = ids_historico_produtos(conn, precos)
+    ultimos = ultimos_precos(conn, fornecedor, produtos.values())
+    novas = []
+
+    for produto_id, preco in precos.items():
+        produto = produtos.get(produto_id)
+        if produto is None or preco is None:
+            continue
+
+        centavos = para_centavos(preco)
+        if ultimos.get(produto) != centavos:
+            novas.append((produto, fornecedor, centavos, momento, codigo_origem))
+
+    cursor = conn.cursor()
+
+    cursor.executemany('''
+        INSERT INTO historico_precos (produto, fornecedor, preco, registrado_em, origem)
+        VALUES (?, ?, ?, ?, ?)
+    ''', novas)
+    return len(novas)
+
+
+def produto_do_historico(conn, produto_id):
+    """
+    Localiza o produto atual no histórico pela chave estável
+    Retorna (id no histórico, descrição) ou None
+    """
+    cursor = conn.cursor()
+    cursor.execute('SELECT codigo, descricao FROM produtos WHERE id = ?', (produto_id,))
+    produto = cursor.fetchone()
+    if not produto:
+        return None
+
+    cursor.execute('SELECT id, descricao FROM historico_produtos WHERE chave = ?',
+                   (chave_produto(*produto),))
+    return cursor.fetchone()
+
+
+def filtro_periodo(inicio, fim):
+    condicoes, parametros = [], []
+    if inicio is not None:
+        condicoes.append('h.registrado_em >= ?')
+        parametros.append(inicio)
+    if fim is not None:
+        condicoes.append('h.registrado_em <= ?')
+        parametros.append(fim)
+    return ''.join(f' AND {c}' for c in condicoes), parametros
+
+
+def historico_produto(conn, produto_historico, inicio=None, fim=None, limite=LIMITE_PONTOS):
+    """
+    Série de preços de um produto por fornecedor (mais antigos primeiro)
+    Retorna [{'fornecedor': nome, 'pontos': [{'data', 'preco', 'origem'}]}]
+    """
+    periodo, parametros = filtro_periodo(inicio, fim)
+    cursor = conn.cursor()
+    cursor.execute(f'''
+        SELECT h.fornecedor, COALESCE(f.nome, 'TOUREIRO'), h.registrado_em, h.preco, h.origem
+        FROM historico_precos h
+        LEFT JOIN historico_fornecedores f ON f.id = h.fornecedor
+        WHERE h.produto = ?{periodo}
+        ORDER BY h.fornecedor, h.registrado_em, h.id
+        LIMIT ?
+    ''', [produto_historico] + parametros + [limite])
+
+    series = {}
+    for fornecedor, nome, registrado_em, preco, origem in cursor:
+        serie = series.setdefault(fornecedor, {'fornecedor': nome, 'pontos': []})
+        serie['pontos'].append({
+            'data': para_iso(registrado_em),
+            'preco': preco / 100,
+            'origem': NOMES_ORIGENS.get(origem)
+        })
+    return list(series.values())
+
+
+def tendencia_produto(conn, produto_historico, intervalo='dia', inicio=None, fim=None):
+    """
+    Preços de um produto agregados por período (mínimo, máximo, médio e último)
+    para gráficos de tendência. Períodos sem alteração de preço não aparecem
+    """
+    if intervalo not in INTERVALOS:
+        raise ValueError(f"Intervalo inválido: use {', '.join(INTERVALOS)}")
+
+    periodo, parametros = filtro_periodo(inicio, fim)
+    cursor = conn.cursor()
+    cursor.execute(f'''
+        SELECT COALESCE(f.nome, 'TOUREIRO'), h.registrado_em, h.preco
+        FROM historico_precos h
+        LEFT JOIN historico_fornecedores f ON f.id = h.fornecedor
+        WHERE h.produto = ?{periodo}
+        ORDER BY h.fornecedor, h.registrado_em, h.id
+    ''', [produto_historico] + parametros)
+
+    formato = INTERVALOS[intervalo]
+    series = {}
+    for nome, registrado_em, preco in cursor:
+        periodo = datetime.fromtimestamp(registrado_em, timezone.utc).strftime(formato)
+        pontos = series.setdefault(nome, [])
+        if not pontos or pontos[-1]['periodo'] != periodo:
+            pontos.append({'periodo': periodo, 'precos': []})
+        pontos[-1]['precos'].append(preco)
+
+    for pontos in series.values():
+        for ponto in pontos:
+            precos = ponto.pop('precos')
+            ponto.update({
+                'minimo': min(precos) / 100,
+                'maximo': max(precos) / 100,
+                'medio': round(sum(precos) / len(precos) / 100, 4),
+                'ultimo': precos[-1] / 100,
+                'alteracoes': len(precos)
+            })
+    return [{'fornecedor': nome, 'pontos': pontos} for nome, pontos in series.items()]
+
+
+def variacoes_preco(conn, inicio, fim=None, fornecedor_id=None, percentual_minimo=10.0,
+                    limite=LIMITE_PONTOS):
+    """
+    Alterações de preço no período com variação de pelo menos percentual_minimo
+    em relação ao preço anterior da mesma série, das maiores para as menores
+    """
+    parametros = [inicio]
+    filtros = 'h.registrado_em >= ?'
+    if fim is not None:
+        filtros += ' AND h.registrado_em <= ?'
+        parametros.append(fim)
+    if fornecedor_id is not None:
+        fornecedor = id_historico_fornecedor(conn, fornecedor_id)
+        if fornecedor is None:
+            return []
+        filtros = 'h.fornecedor = ? AND ' + filtros
+        parametros.insert(0, fornecedor)
+
+    cursor = conn.cursor()
+    # O preço anterior vem do índice por produto, mesmo quando está fora do período
+    cursor.execute(f'''
+        SELECT * FROM (
+            SELECT p.descricao, COALESCE(f.nome, 'TOUREIRO') AS fornecedor, h.registrado_em, h.preco,
+                   (SELECT a.preco FROM historico_precos a
+                    WHERE a.produto = h.produto AND a.fornecedor = h.fornecedor
+                      AND (a.registrado_em, a.id) < (h.registrado_em, h.id)
+                    ORDER BY a.registrado_em DESC, a.id DESC
+                    LIMIT 1) AS anterior
+            FROM historico_precos h
+            JOIN historico_produtos p ON p.id = h.produto
+            LEFT JOIN historico_fornecedores f ON f.id = h.fornecedor
+            WHERE {filtros}
+        ) AS alteracoes
+        WHERE anterior > 0 AND ABS(preco - anterior) * 100.0 >= ? * anterior
+        ORDER BY ABS(preco - anterior) * 1.0 / anterior DESC
+        LIMIT ?
+    ''', parametros + [percentual_minimo, limite])
+
+    return [{
+        'produto': descricao,
+        'fornecedor': nome,
+        'data': para_iso(registrado_em),
+        'preco_anterior': anterior / 100,
+        'preco': preco / 100,
+        'variacao_percentual': round((preco - anterior) * 100 / anterior, 2)
+    } for descricao, nome, registrado_em, preco, anterior in cursor.fetchall()]
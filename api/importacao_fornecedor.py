@@ -0,0 +1,308 @@
+# -*- coding: utf-8 -*-
+"""
+Importação em lote da lista de preços de um fornecedor (CSV, XLSX ou PDF)
+As linhas do arquivo são casadas com a tabela de produtos por código ou
+descrição e todos os preços casados são gravados em uma única transação
+"""
+
+import csv
+import io
+import os
+import re
+
+from api.historico_precos import registrar_precos
+from api.indice_produtos import IndiceProdutos, normalizar_texto
+
+# Nomes de coluna reconhecidos no cabeçalho (já normalizados)
+ALIASES_COLUNAS = {
+    'codigo': ('CODIGO', 'COD', 'CODIGO PRODUTO', 'COD PRODUTO', 'REFERENCIA', 'REF',
+               'SKU', 'EAN', 'CODIGO DE BARRAS'),
+    'descricao': ('DESCRICAO', 'DESCRICAO PRODUTO', 'PRODUTO', 'NOME', 'ITEM',
+                  'MEDICAMENTO'),
+    'preco': ('PRECO', 'PRECO UNITARIO', 'PRECO UNIT', 'VALOR', 'VALOR UNITARIO',
+              'VLR', 'VLR UNIT', 'PRECO FINAL', 'PRECO LIQUIDO'),
+}
+
+# Formato TOUREIRO: CODIGO DESCRICAO UNIDADE PRECO QUANTIDADE
+PADRAO_TOUREIRO = re.compile(
+    r'^(\d+)\s+(.+?)\s+(\w+)\s+(\d+[,.]\d{4})\s+(\d+[,.]\d{4})\s*$')
+
+# Formato genérico: [CODIGO] DESCRICAO [R$] PRECO [demais colunas]
+PADRAO_GENERICO = re.compile(
+    r'^(?:(\d{3,14})\s+)?(.+?)\s+(?:R\$\s*)?(\d{1,3}(?:\.\d{3})*,\d{2,4}|\d+[.,]\d{2,4})(?:\s+.*)?$')
+
+# Limite de linhas sem correspondência (ou casadas por similaridade) devolvidas no relatório
+LIMITE_NAO_CASADOS = 200
+
+# Casamento aproximado: similaridade mínima do melhor candidato e distância
+# mínima para o segundo colocado (abaixo disso o casamento é ambíguo)
+SIMILARIDADE_MINIMA = 0.6
+MARGEM_MINIMA = 0.05
+
+EXTENSOES_SUPORTADAS = ('.csv', '.xlsx', '.pdf')
+
+
+def normalizar_codigo(codigo):
+    """
+    Normaliza códigos de produto (remove zeros à esquerda e o ".0" de planilhas)
+    """
+    if codigo is None:
+        return None
+    if isinstance(codigo, float) and codigo.is_integer():
+        codigo = int(codigo)
+    codigo = str(codigo).strip()
+    if re.fullmatch(r'\d+\.0+', codigo):
+        codigo = codigo.split('.')[0]
+    codigo = codigo.lstrip('0')
+    return codigo or None
+
+
+def converter_preco(valor):
+    """
+    Converte preços nos formatos "R$ 1.234,56", "17,9900" ou "17.99" para float
+    Retorna None quando o valor não é um preço válido
+    """
+    if valor is None:
+        return None
+    if isinstance(valor, (int, float)):
+        return float(valor) if valor > 0 else None
+
+    texto = str(valor).replace('R$', '').replace(' ', '').strip()
+    if not texto:
+        return None
+
+    if ',' in texto:
+        # Formato brasileiro: ponto como milhar e vírgula como decimal
+        texto = texto.replace('.', '').replace(',', '.')
+
+    try:
+        preco = float(texto)
+    except ValueError:
+        return None
+
+    return preco if 0.01 <= preco <= 99999.99 else None
+
+
+def mapear_cabecalho(linha):
+    """
+    Identifica as colunas de código, descrição e preço em uma linha de cabeçalho
+    Retorna None se a linha não tiver pelo menos descrição ou código e preço
+    """
+    mapa = {}
+    for indice, celula in enumerate(linha):
+        nome = normalizar_texto(celula or '')
+        for campo, aliases in ALIASES_COLUNAS.items():
+            if campo not in mapa and nome in aliases:
+                mapa[campo] = indice
+
+    if 'preco' in mapa and ('codigo' in mapa or 'descricao' in mapa):
+        return mapa
+    return None
+
+
+def linhas_tabulares(linhas):
+    """
+    Converte linhas de uma planilha (listas de células) em registros
+    O cabeçalho é procurado nas primeiras linhas do arquivo
+    """
+    mapa = None
+    erro_cabecalho = ('Cabeçalho não encontrado: o arquivo precisa ter colunas de '
+                      'preço e de código ou descrição')
+
+    for numero, linha in enumerate(linhas, start=1):
+        if mapa is None:
+            mapa = mapear_cabecalho(linha)
+            if mapa is None and numero >= 20:
+                raise ValueError(erro_cabecalho)
+            continue
+
+        def celula(campo):
+            indice = mapa.get(campo)
+            if indice is None or indice >= len(linha):
+                return None
+            return linha[indice]
+
+        descricao = celula('descricao')
+        yield {
+            'linha': numero,
+            'codigo': normalizar_codigo(celula('codigo')),
+            'descricao': str(descricao).strip() if descricao is not None else None,
+            'preco': converter_preco(celula('preco')),
+        }
+
+    if mapa is None:
+        raise ValueError(erro_cabecalho)
+
+
+def ler_csv(caminho):
+    """
+    Lê registros de um CSV (separador detectado automaticamente)
+    """
+    with open(caminho, 'rb') as arquivo:
+        conteudo = arquivo.read()
+
+    try:
+        texto = conteudo.decode('utf-8-sig')
+    except UnicodeDecodeError:
+        texto = conteudo.decode('latin-1')
+
+    try:
+        dialeto = csv.Sniffer().sniff(texto[:8192], delimiters=';,\t|')
+    except csv.Error:
+        dialeto = csv.excel
+
+    yield from linhas_tabulares(csv.reader(io.StringIO(texto), dialeto))
+
+
+def ler_xlsx(caminho):
+    """
+    Lê registros da primeira planilha de um arquivo XLSX
+    """
+    from openpyxl import load_workbook
+
+    pasta = load_workbook(caminho, read_only=True, data_only=True)
+    try:
+        planilha = pasta.worksheets[0]
+        yield from linhas_tabulares(planilha.iter_rows(values_only=True))
+    finally:
+        pasta.close()
+
+
+def ler_pdf(caminho):
+    """
+    Lê registros de um PDF de texto, linha a linha
+    Aceita o layout TOUREIRO e o layout genérico [código] descrição preço
+    """
+    import pdfplumber
+
+    numero = 0
+    with pdfplumber.open(caminho) as pdf:
+        for page in pdf.pages:
+            texto = page.extract_text() or ''
+            for linha in texto.split('\n'):
+                numero += 1
+                linha = linha.strip()
+                if not linha:
+                    continue
+
+                match = PADRAO_TOUREIRO.match(linha)
+                if match:
+                    codigo, descricao, preco = match.group(1), match.group(2), match.group(4)
+                else:
+                    match = PADRAO_GENERICO.match(linha)
+                    if not match:
+                        continue
+                    codigo, descricao, preco = match.group(1), match.group(2), match.group(3)
+
+                yield {
+                    'linha': numero,
+                    'codigo': normalizar_codigo(codigo),
+                    'descricao': descricao.strip(),
+                    'preco': converter_preco(preco),
+                }
+
+
+def ler_lista_fornecedor(caminho):
+    """
+    Lê a lista de preços do fornecedor de acordo com a extensão do arquivo
+    """
+    extensao = os.path.splitext(caminho)[1].lower()
+    if extensao == '.csv':
+        return ler_csv(caminho)
+    if extensao == '.xlsx':
+        return ler_xlsx(caminho)
+    if extensao == '.pdf':
+        return ler_pdf(caminho)
+    raise ValueError(f'Formato de arquivo não suportado: {extensao}')
+
+
+def casar_linhas(conn, registros, aproximado=True):
+    """
+    Casa os registros lidos com a tabela de produtos
+    Primeiro pelo código, depois pela descrição normalizada e, se `aproximado`,
+    pelo índice de similaridade de descrições (construído só se for preciso)
+    Retorna (precos, relatorio), onde precos é {produto_id: preco}
+    """
+    cursor = conn.cursor()
+    cursor.execute('SELECT id, codigo, descricao FROM produtos')
+
+    por_codigo = {}
+    por_descricao = {}
+    descricoes = {}
+    for produto_id, codigo, descricao in cursor:
+        codigo = normalizar_codigo(codigo)
+        if codigo:
+            por_codigo.setdefault(codigo, produto_id)
+        por_descricao.setdefault(normalizar_texto(descricao), produto_id)
+        descricoes[produto_id] = descricao
+
+    indice = None
+    precos = {}
+    relatorio = {
+        'total_linhas': 0,
+        'casados_por_codigo': 0,
+        'casados_por_descricao': 0,
+        'casados_por_similaridade': 0,
+        'sem_preco': 0,
+        'duplicados': 0,
+        'nao_casados': 0,
+        'exemplos_nao_casados': [],
+        'exemplos_similaridade': [],
+    }
+
+    for registro in registros:
+        relatorio['total_linhas'] += 1
+
+        if registro['preco'] is None:
+            relatorio['sem_preco'] += 1
+            continue
+
+        produto_id = None
+        if registro['codigo']:
+            produto_id = por_codigo.get(registro['codigo'])
+            if produto_id is not None:
+                relatorio['casados_por_codigo'] += 1
+
+        if produto_id is None and registro['descricao']:
+            produto_id = por_descricao.get(normalizar_texto(registro['descricao']))
+            if produto_id is not None:
+                relatorio['casados_por_descricao'] += 1
+
+        if produto_id is None and registro['descricao'] and aproximado and descricoes:
+            if indice is None:
+                indice = IndiceProdutos(descricoes.items())
+            melhor = indice.melhor(registro['descricao'], SIMILARIDADE_MINIMA, MARGEM_MINIMA)
+            if melhor is not None:
+                produto_id = melhor[0]
+                relatorio['casados_por_similaridade'] += 1
+                if len(relatorio['exemplos_similaridade']) < LIMITE_NAO_CASADOS:
+                    relatorio['exemplos_similaridade'].append(dict(
+                        registro, produto=descricoes[produto_id], similaridade=round(melhor[1], 3)))
+
+        if produto_id is None:
+            relatorio['nao_casados'] += 1
+            if len(relatorio['exemplos_nao_casados']) < LIMITE_NAO_CASADOS:
+                relatorio['exemplos_nao_casados'].append(registro)
+            continue
+
+        # Se o mesmo produto aparecer mais de uma vez, vale a última linha
+        if produto_id in precos:
+            relatorio['duplicados'] += 1
+        precos[produto_id] = registro['preco']
+
+    relatorio['casados'] = (relatorio['casados_por_codigo'] + relatorio['casados_por_descricao'] +
+                            relatorio['casados_por_similaridade'])
+    relatorio['produtos_atualizados'] = len(precos)
+    return precos, relatorio
+
+
+def gravar_precos(conn, fornecedor_id, precos):
+    """
+    Grava todos os preços casados do fornecedor (e o histórico) em uma única transação
+    """
+    with conn:
+        conn.executemany('''
+            INSERT OR REPLACE INTO precos_fornecedores (produto_id, fornecedor_id, preco)
+            VALUES (?, ?, ?)
+        ''', ((produto_id, fornecedor_id, preco) for produto_id, preco in precos.items()))
+        registrar_precos(conn, fornecedor_id, precos, 'importacao')
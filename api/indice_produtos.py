@@ -0,0 +1,373 @@
+# -*- coding: utf-8 -*-
+"""
+Índice em memória para casamento aproximado de descrições de produtos
+As listas dos fornecedores descrevem o mesmo item de formas diferentes da
+TOUREIRO (abreviações, ordem das palavras, acentos), então a busca usa um
+índice invertido de trigramas sobre as descrições normalizadas
+"""
+
+import heapq
+import math
+import re
+import sqlite3
+import unicodedata
+from array import array
+from collections import Counter
+
+# Abreviações comuns em listas de medicamentos, expandidas nos dois lados
+ABREVIACOES = {
+    'CP': 'COMPRIMIDO', 'CPR': 'COMPRIMIDO', 'COMP': 'COMPRIMIDO', 'COMPR': 'COMPRIMIDO',
+    'COMPRIMIDOS': 'COMPRIMIDO', 'CPRS': 'COMPRIMIDO', 'CPS': 'COMPRIMIDO',
+    'CAP': 'CAPSULA', 'CAPS': 'CAPSULA', 'CAPSULAS': 'CAPSULA',
+    'DRG': 'DRAGEA', 'DRAGEAS': 'DRAGEA',
+    'SOL': 'SOLUCAO', 'SUSP': 'SUSPENSAO', 'XPE': 'XAROPE', 'XAR': 'XAROPE',
+    'GTS': 'GOTAS', 'GT': 'GOTAS', 'POM': 'POMADA', 'CR': 'CREME', 'LOC': 'LOCAO',
+    'AMP': 'AMPOLA', 'AMPS': 'AMPOLA', 'INJ': 'INJETAVEL', 'FR': 'FRASCO', 'FRS': 'FRASCO',
+    'CX': 'CAIXA', 'CXS': 'CAIXA', 'PCT': 'PACOTE', 'PC': 'PACOTE', 'UN': 'UNIDADE',
+    'UND': 'UNIDADE', 'UNID': 'UNIDADE', 'ENV': 'ENVELOPE', 'BL': 'BLISTER',
+    'TB': 'TUBO', 'BG': 'BISNAGA', 'REV': 'REVESTIDO', 'EFERV': 'EFERVESCENTE',
+    'INF': 'INFANTIL', 'PED': 'PEDIATRICO', 'GEN': 'GENERICO',
+}
+
+# Unidades coladas ao número: "500 MG" e "500MG" viram o mesmo token
+UNIDADES = ('MG', 'ML', 'G', 'MCG', 'UI', 'KG', 'L', 'CM', 'M')
+PADRAO_UNIDADE = re.compile(r'\b(\d+)\s+(' + '|'.join(UNIDADES) + r')\b')
+
+# Já o que não é unidade é separado do número: "10CP" vira "10 CP"
+PADRAO_NUMERO_COLADO = re.compile(r'\b(\d+)([A-Z]+)\b')
+
+# "C/" (com) não identifica o produto e viraria um "C" solto, igual ao de "VITAMINA C"
+PADRAO_COM = re.compile(r'\b[Cc]/')
+
+# Similaridade mínima para considerar uma palavra do catálogo como variante
+# (erro de digitação) de uma palavra da consulta
+LIMIAR_PALAVRA = 0.5
+
+# Quantos candidatos passam para a pontuação completa (LIMITE_REORDENACAO * 5),
+# escolhidos pela pré-pontuação quando há mais
+LIMITE_REORDENACAO = 40
+
+# Máximo de palavras da consulta guardadas no cache de variantes
+LIMITE_CACHE_PALAVRAS = 50000
+
+
+def normalizar_texto(texto):
+    """
+    Normaliza texto para comparação: sem acentos, maiúsculo, só letras,
+    números e espaços simples
+    """
+    texto = unicodedata.normalize('NFKD', str(texto))
+    texto = ''.join(c for c in texto if not unicodedata.combining(c))
+    texto = re.sub(r'[^A-Z0-9]+', ' ', texto.upper())
+    return texto.strip()
+
+
+def normalizar_descricao(texto):
+    """
+    Normaliza a descrição para casamento: sem acentos e pontuação,
+    abreviações expandidas e unidades coladas ao número
+    """
+    texto = normalizar_texto(PADRAO_COM.sub(' ', str(texto)))
+    texto = PADRAO_NUMERO_COLADO.sub(
+        lambda m: m.group(0) if m.group(2) in UNIDADES else f'{m.group(1)} {m.group(2)}', texto)
+    texto = PADRAO_UNIDADE.sub(r'\1\2', texto)
+    return ' '.join(ABREVIACOES.get(token, token) for token in texto.split())
+
+
+def trigramas(texto_normalizado):
+    """
+    Conjunto de trigramas das palavras, com espaço marcando início e fim
+    de cada palavra (a ordem das palavras não altera o conjunto)
+    """
+    gramas = set()
+    for token in texto_normalizado.split():
+        token = f' {token} '
+        gramas.update(token[i:i + 3] for i in range(len(token) - 2))
+    return gramas
+
+
+def similaridade(gramas_a, gramas_b):
+    """
+    Coeficiente de Jaccard entre dois conjuntos de trigramas
+    """
+    if not gramas_a or not gramas_b:
+        return 0.0
+    comuns = len(gramas_a & gramas_b)
+    return comuns / (len(gramas_a) + len(gramas_b) - comuns)
+
+
+def intersecao(conjuntos):
+    """
+    Interseção de conjuntos já ordenados do menor para o maior
+    """
+    resultado = conjuntos[0]
+    for conjunto in conjuntos[1:]:
+        if not resultado:
+            break
+        resultado = resultado & conjunto
+    return resultado
+
+
+class IndiceProdutos:
+    """
+    Índice invertido palavra -> produtos sobre produtos.descricao
+
+    Cada palavra da consulta é resolvida para as palavras do catálogo que ela
+    representa (exata, prefixo ou variante com erro de digitação, via
+    trigramas do vocabulário). Os conjuntos de produtos são intersectados do
+    mais raro para o mais comum (tolerando uma palavra sem correspondência
+    quando sobram poucos) e só os candidatos restantes recebem a pontuação
+    completa.
+    As interseções de frozensets percorrem sempre o conjunto menor, então o
+    custo não depende das palavras muito comuns (COMPRIMIDO, CAIXA...)
+    """
+
+    def __init__(self, produtos):
+        """
+        produtos: iterável de (id, descricao)
+        """
+        self.ids = array('q')
+        self.palavras = []
+        listas = {}
+
+        for posicao, (produto_id, descricao) in enumerate(produtos):
+            palavras = tuple(set(normalizar_descricao(descricao).split()))
+            self.ids.append(produto_id)
+            self.palavras.append(palavras)
+            for palavra in palavras:
+                listas.setdefault(palavra, []).append(posicao)
+
+        self.produtos_por_palavra = {palavra: frozenset(lista) for palavra, lista in listas.items()}
+
+        # Trigramas de cada palavra do vocabulário: os trigramas de um produto
+        # são a união dos de suas palavras, sem refatiar o texto a cada consulta
+        self.gramas_por_palavra = {palavra: frozenset(trigramas(palavra))
+                                   for palavra in self.produtos_por_palavra}
+
+        # Índice inverso trigrama -> palavras, para achar variantes de palavras desconhecidas
+        self.palavras_por_grama = {}
+        for palavra, gramas in self.gramas_por_palavra.items():
+            for grama in gramas:
+                self.palavras_por_grama.setdefault(grama, []).append(palavra)
+
+        self.cache_palavras = {}
+
+    @classmethod
+    def do_banco(cls, conn):
+        """
+        Constrói o índice a partir da tabela de produtos
+        """
+        return cls(conn.execute('SELECT id, descricao FROM produtos'))
+
+    def __len__(self):
+        return len(self.ids)
+
+    def variantes(self, palavra):
+        """
+        Palavras do vocabulário que a palavra da consulta pode representar:
+        prefixos ("DIPIR" -> "DIPIRONA") e variantes com erro de digitação
+        """
+        gramas_palavra = trigramas(palavra)
+        contagem = Counter()
+        for grama in gramas_palavra:
+            contagem.update(self.palavras_por_grama.get(grama, ()))
+
+        encontradas = []
+        for candidata in contagem:
+            if len(palavra) >= 3 and candidata.startswith(palavra):
+                encontradas.append(candidata)
+            elif similaridade(gramas_palavra, self.gramas_por_palavra[candidata]) >= LIMIAR_PALAVRA:
+                encontradas.append(candidata)
+        return encontradas
+
+    def produtos_da_palavra(self, palavra):
+        """
+        Conjunto de posições dos produtos que contêm a palavra ou uma variante
+        """
+        conjunto = self.produtos_por_palavra.get(palavra)
+        if conjunto is not None:
+            return conjunto
+
+        conjunto = self.cache_palavras.get(palavra)
+        if conjunto is None:
+            variantes = self.variantes(palavra)
+            conjunto = frozenset().union(*(self.produtos_por_palavra[v] for v in variantes))
+            if len(self.cache_palavras) >= LIMITE_CACHE_PALAVRAS:
+                self.cache_palavras.clear()
+            self.cache_palavras[palavra] = conjunto
+        return conjunto
+
+    def buscar(self, texto, k=5):
+        """
+        Retorna até k candidatos [(produto_id, similaridade)] em ordem decrescente
+        """
+        normalizado = normalizar_descricao(texto)
+        conjuntos = [self.produtos_da_palavra(p) for p in set(normalizado.split())]
+        conjuntos = sorted((c for c in conjuntos if c), key=len)
+        if not conjuntos:
+            return []
+
+        candidatos = intersecao(conjuntos)
+
+        # Poucos produtos com todas as palavras: tolera uma palavra sem
+        # correspondência (erro grosseiro, palavra a mais ou trocada)
+        if len(candidatos) < k and len(conjuntos) > 1:
+            for i in range(len(conjuntos)):
+                candidatos = candidatos | intersecao(conjuntos[:i] + conjuntos[i + 1:])
+
+        if len(candidatos) > LIMITE_REORDENACAO * 5:
+            candidatos = self.pre_ordenar(candidatos, conjuntos, LIMITE_REORDENACAO * 5)
+
+        gramas_consulta = trigramas(normalizado)
+        gramas_por_palavra = self.gramas_por_palavra
+        resultados = []
+        for posicao in candidatos:
+            gramas_produto = frozenset().union(*[gramas_por_palavra[p] for p in self.palavras[posicao]])
+            resultados.append((similaridade(gramas_consulta, gramas_produto), posicao))
+
+        resultados.sort(reverse=True)
+        return [(self.ids[posicao], pontuacao) for pontuacao, posicao in resultados[:k]]
+
+    def pre_ordenar(self, candidatos, conjuntos, limite):
+        """
+        Os `limite` candidatos mais promissores, sem montar os trigramas de cada um:
+        soma do peso (raridade) das palavras da consulta que o produto tem; no
+        empate, o de menos palavras (o Jaccard favorece o mais curto) e o de menor
+        posição, para o resultado não variar entre execuções
+        """
+        total = len(self.ids)
+        pesos = [(conjunto, math.log(total / len(conjunto)) + 1) for conjunto in conjuntos]
+        palavras = self.palavras
+
+        def chave(posicao):
+            peso = sum(p for conjunto, p in pesos if posicao in conjunto)
+            return peso, -len(palavras[posicao]), -posicao
+
+        return heapq.nlargest(limite, candidatos, key=chave)
+
+    def melhor(self, texto, minimo=0.0, margem=0.0):
+        """
+        Retorna (produto_id, similaridade) do melhor candidato ou None se ele
+        não atingir a similaridade mínima ou se o segundo colocado estiver
+        a menos de `margem` dele (casamento ambíguo)
+        """
+        candidatos = self.buscar(texto, k=2)
+        if not candidatos or candidatos[0][1] < minimo:
+            return None
+        if len(candidatos) > 1 and candidatos[0][1] - candidatos[1][1] < margem:
+            return None
+        return candidatos[0]
+
+
+def termos_fts(texto):
+    """
+    Converte o texto digitado em termos de consulta FTS5
+    Cada palavra vale também como prefixo ("COMP" casa "COMPRIMIDO"); como a
+    normalização só deixa letras e números, as aspas não precisam de escape
+    """
+    return [f'"{token}"*' for token in normalizar_texto(PADRAO_COM.sub(' ', str(texto))).split()]
+
+
+def criar_tabela_fts(conn):
+    """
+    Cria a tabela FTS5 de produtos (descrição e código) sincronizada com a
+    tabela produtos por gatilhos. O tokenizador remove acentos, então
+    "ACIDO" encontra "ÁCIDO" e vice-versa. Se a tabela acabou de ser criada
+    sobre um catálogo já existente, o índice é reconstruído
+    Retorna False quando o SQLite não tem FTS5
+    """
+    if not IndiceFTS.disponivel(conn):
+        return False
+
+    existia = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'produtos_fts'").fetchone()
+
+    conn.executescript('''
+        CREATE VIRTUAL TABLE IF NOT EXISTS produtos_fts USING fts5(
+            descricao,
+            codigo,
+            content='produtos',
+            content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2',
+            prefix='2 3'
+        );
+
+        CREATE TRIGGER IF NOT EXISTS produtos_fts_insert AFTER INSERT ON produtos BEGIN
+            INSERT INTO produtos_fts (rowid, descricao, codigo)
+            VALUES (new.id, new.descricao, new.codigo);
+        END;
+
+        CREATE TRIGGER IF NOT EXISTS produtos_fts_delete AFTER DELETE ON produtos BEGIN
+            INSERT INTO produtos_fts (produtos_fts, rowid, descricao, codigo)
+            VALUES ('delete', old.id, old.descricao, old.codigo);
+        END;
+
+        CREATE TRIGGER IF NOT EXISTS produtos_fts_update AFTER UPDATE OF descricao, codigo ON produtos BEGIN
+            INSERT INTO produtos_fts (produtos_fts, rowid, descricao, codigo)
+            VALUES ('delete', old.id, old.descricao, old.codigo);
+            INSERT INTO produtos_fts (rowid, descricao, codigo)
+            VALUES (new.id, new.descricao, new.codigo);
+        END;
+    ''')
+
+    if not existia:
+        conn.execute("INSERT INTO produtos_fts (produtos_fts) VALUES ('rebuild')")
+    return True
+
+
+class IndiceFTS:
+    """
+    Geração de candidatos pela tabela FTS5 do SQLite (opcional)
+    Não ocupa memória do processo, mas em catálogos com vocabulário pequeno
+    as listas de cada palavra são longas e a consulta fica bem mais lenta
+    que a do índice em memória
+    """
+
+    def __init__(self, conn):
+        self.conn = conn
+        criar_tabela_fts(conn)
+
+    @staticmethod
+    def disponivel(conn):
+        """
+        Verifica se o SQLite em uso foi compilado com FTS5
+        """
+        try:
+            conn.execute('CREATE VIRTUAL TABLE temp.teste_fts5 USING fts5(x)')
+            conn.execute('DROP TABLE temp.teste_fts5')
+            return True
+        except sqlite3.OperationalError:
+            return False
+
+    def reconstruir(self):
+        """
+        Reconstrói o índice FTS a partir da tabela de produtos
+        """
+        with self.conn:
+            self.conn.execute("INSERT INTO produtos_fts(produtos_fts) VALUES ('rebuild')")
+
+    def buscar(self, texto, k=5):
+        """
+        Retorna até k candidatos [(produto_id, pontuacao)] ordenados pelo bm25
+        Tenta primeiro exigir todas as palavras e só relaxa para OR se faltar resultado
+        """
+        termos = termos_fts(texto)
+        if not termos:
+            return []
+
+        linhas = self.consultar(' '.join(termos), k)
+        if len(linhas) < k:
+            vistos = {produto_id for produto_id, _ in linhas}
+            linhas += [linha for linha in self.consultar(' OR '.join(termos), k)
+                       if linha[0] not in vistos][:k - len(linhas)]
+
+        # bm25 é negativo e menor é melhor; devolve a pontuação positiva
+        return [(produto_id, -pontuacao) for produto_id, pontuacao in linhas]
+
+    def consultar(self, expressao, k):
+        return self.conn.execute('''
+            SELECT rowid, bm25(produtos_fts) FROM produtos_fts
+            WHERE produtos_fts MATCH ?
+            ORDER BY bm25(produtos_fts)
+            LIMIT ?
+        ''', (expressao, k)).fetchall()
@@ -0,0 +1,355 @@
+# -*- coding: utf-8 -*-
+"""
+Layout das tabelas de preço em PDF: palavras com coordenadas, colunas e perfis
+
+Um perfil de layout guarda o que foi aprendido sobre um PDF de fornecedor
+(posição das colunas, padrão da linha, faixa vertical com os dados e páginas
+sem dados no começo e no fim) em layouts/<nome>.json. Perfis são criados com
+"python debug_pdf.py arquivo.pdf --salvar NOME" e reconhecidos na importação
+pela assinatura do PDF (tamanho da página, gerador e palavras do cabeçalho)
+"""
+
+import hashlib
+import json
+import logging
+import os
+import re
+import statistics
+
+log = logging.getLogger(__name__)
+
+# Padrão para o formato específico do PDF:
+# CODIGO DESCRICAO UNIDADE PRECO QUANTIDADE
+# Exemplo: "55885 ACUCAR DE COCO 150G UNILIFE CX 48 UN UN 17,9900 4,0000"
+PADRAO_LINHA = re.compile(r'^(?P<codigo>\d+)\s+(?P<descricao>.+?)\s+(?P<unidade>\w+)\s+'
+                          r'(?P<preco>\d+[,.]\d{4})\s+(?P<quantidade>\d+[,.]\d{4})\s*$')
+PADRAO_CODIGO = re.compile(r'^\d+$')
+PADRAO_VALOR = re.compile(r'^\d+[,.]\d{4}$')
+# Mesmo valor nos bytes do conteúdo da página, depois de juntar os trechos de um TJ
+PADRAO_VALOR_BRUTO = re.compile(rb'\d[,.]\d{4}')
+KERNING_TJ = re.compile(rb'\)\s*-?[\d.]+\s*\(')
+TEXTO_LITERAL = re.compile(rb'\(((?:[^()\\]|\\.)*)\)', re.S)
+TEXTO_HEX = re.compile(rb'<[0-9A-Fa-f\s]+>\s*(?:T[jJ\'"]|-?[\d.]+\s*[<(\]])')
+
+# Tolerâncias em pontos
+TOLERANCIA_LINHA = 3
+TOLERANCIA_COLUNA = 2
+# Espaço horizontal máximo entre dois caracteres da mesma palavra (como no pdfplumber)
+TOLERANCIA_PALAVRA = 3
+# Sobreposição aceita entre dois caracteres da mesma palavra (kerning negativo)
+SOBREPOSICAO_PALAVRA = 0.5
+# Folga acima e abaixo da faixa de dados aprendida
+MARGEM_BANDA = 4
+
+VERSAO_PERFIL = 1
+
+
+def pagina_tem_precos(page):
+    """
+    Filtro barato antes do layout: procura um valor (17,9900) nos bytes do conteúdo da página
+
+    True se achou, False se a página só tem texto literal sem valores, None se não dá
+    para saber sem o layout (texto em hexadecimal/CID ou formulários XObject)
+    """
+    from pdfminer.pdftypes import resolve1
+
+    pagina = page.page_obj
+    objetos = resolve1((pagina.resources or {}).get('XObject')) or {}
+    for objeto in objetos.values():
+        subtipo = getattr(resolve1(objeto), 'attrs', {}).get('Subtype')
+        if getattr(subtipo, 'name', None) != 'Image':
+            return None
+
+    try:
+        conteudo = b'\n'.join(resolve1(fluxo).get_data() for fluxo in pagina.contents)
+    except Exception:
+        return None
+    # Só o texto dos literais (...): os operadores têm coordenadas como 817.8898
+    literais = b'\n'.join(TEXTO_LITERAL.findall(KERNING_TJ.sub(b'', conteudo)))
+    if PADRAO_VALOR_BRUTO.search(literais):
+        return True
+    return None if TEXTO_HEX.search(conteudo) else False
+
+
+def palavras_da_pagina(page, banda=None):
+    """
+    Palavras da página ({'text', 'x0', 'x1', 'top', 'bottom'}) a partir dos LTChar do pdfminer
+    Com banda (topo, base), só os caracteres dentro da faixa
+    """
+    from pdfminer.layout import LTChar
+
+    altura = page.height
+    topo_banda, base_banda = banda or (float('-inf'), float('inf'))
+    caracteres = sorted(
+        (round(altura - objeto.y1, 1), objeto.x0, objeto.x1, altura - objeto.y0, objeto.get_text())
+        for objeto in page.layout
+        if isinstance(objeto, LTChar) and topo_banda <= altura - objeto.y1 <= base_banda)
+
+    # Primeiro as linhas, depois a ordem horizontal: uma coluna uns décimos de ponto
+    # abaixo das outras (em negrito, por exemplo) não pode ir para o fim da linha
+    linhas = []
+    for caractere in caracteres:
+        if not linhas or caractere[0] - linhas[-1][0][0] > TOLERANCIA_LINHA:
+            linhas.append([])
+        linhas[-1].append(caractere)
+
+    palavras = []
+    for linha in linhas:
+        atual = None
+        for topo, x0, x1, base, texto in sorted(linha, key=lambda c: c[1]):
+            if texto.isspace():
+                atual = None
+                continue
+            if atual is None or not -SOBREPOSICAO_PALAVRA <= x0 - atual['x1'] <= TOLERANCIA_PALAVRA:
+                atual = {'text': texto, 'x0': x0, 'x1': x1, 'top': topo, 'bottom': base}
+                palavras.append(atual)
+            else:
+                atual['text'] += texto
+                atual['x1'] = x1
+    return palavras
+
+
+def linhas_de_palavras(palavras, tolerancia=TOLERANCIA_LINHA):
+    """
+    Agrupa as palavras em linhas pela coordenada vertical (top), da esquerda para a direita
+    """
+    linhas = []
+    atual = []
+    topo = None
+    for palavra in sorted(palavras, key=lambda p: (round(p['top']), p['x0'])):
+        if topo is not None and abs(palavra['top'] - topo) > tolerancia:
+            linhas.append(sorted(atual, key=lambda p: p['x0']))
+            atual = []
+        if not atual:
+            topo = palavra['top']
+        atual.append(palavra)
+    if atual:
+        linhas.append(sorted(atual, key=lambda p: p['x0']))
+    return linhas
+
+
+def linha_casa(linha, padrao=PADRAO_LINHA):
+    return len(linha) >= 5 and padrao.match(' '.join(p['text'] for p in linha)) is not None
+
+
+class LayoutColunas:
+    """
+    Limites das colunas
+
+    fim_codigo: x onde termina a coluna do código
+    inicio_preco / inicio_quantidade: x onde começam as colunas numéricas, quando
+    estão alinhadas (tabela de várias colunas); None se cada linha é um texto
+    corrido, e então os campos saem do padrão da linha
+    """
+
+    def __init__(self, fim_codigo, inicio_preco=None, inicio_quantidade=None, padrao=PADRAO_LINHA):
+        self.fim_codigo = fim_codigo
+        self.inicio_preco = inicio_preco
+        self.inicio_quantidade = inicio_quantidade
+        self.padrao = padrao
+
+    @property
+    def alinhado(self):
+        return self.inicio_preco is not None
+
+    def descrever(self):
+        if self.alinhado:
+            return (f'código até x={self.fim_codigo:.1f}, preço em x={self.inicio_preco:.1f} '
+                    f'e quantidade em x={self.inicio_quantidade:.1f}')
+        return f'código até x={self.fim_codigo:.1f}, demais campos pelo padrão da linha'
+
+    def campos(self, linha):
+        """
+        Fatia uma linha de palavras em (codigo, descricao, preco) ou None
+        """
+        if not linha or linha[0]['x1'] > self.fim_codigo:
+            return None
+
+        if not self.alinhado:
+            match = self.padrao.match(' '.join(p['text'] for p in linha))
+            if not match:
+                return None
+            return match.group('codigo'), match.group('descricao').strip(), match.group('preco')
+
+        codigo = [p['text'] for p in linha if p['x1'] <= self.fim_codigo]
+        meio = [p['text'] for p in linha
+                if p['x1'] > self.fim_codigo and p['x0'] < self.inicio_preco]
+        preco = [p['text'] for p in linha if self.inicio_preco <= p['x0'] < self.inicio_quantidade]
+        quantidade = [p['text'] for p in linha if p['x0'] >= self.inicio_quantidade]
+
+        # A última palavra do meio é a unidade (UN, CX...)
+        if (len(codigo) != 1 or len(preco) != 1 or len(quantidade) != 1 or len(meio) < 2
+                or not PADRAO_CODIGO.match(codigo[0]) or not PADRAO_VALOR.match(preco[0])
+                or not PADRAO_VALOR.match(quantidade[0])):
+            return None
+        return codigo[0], ' '.join(meio[:-1]), preco[0]
+
+
+def aprender_colunas(linhas, padrao=PADRAO_LINHA):
+    """
+    Deduz o layout das linhas (listas de palavras) que casam com o padrão
+    Retorna None se nenhuma linha casar
+    """
+    casadas = [linha for linha in linhas if linha_casa(linha, padrao)]
+    if not casadas:
+        return None
+
+    fim_codigo = max(linha[0]['x1'] for linha in casadas) + TOLERANCIA_COLUNA
+    precos = [linha[-2] for linha in casadas]
+    quantidades = [linha[-1] for linha in casadas]
+    # Números alinhados à direita: o x1 de preço e quantidade se repete em todas as linhas
+    if (statistics.pstdev(p['x1'] for p in precos) <= TOLERANCIA_COLUNA
+            and statistics.pstdev(q['x1'] for q in quantidades) <= TOLERANCIA_COLUNA):
+        inicio_preco = min(p['x0'] for p in precos) - TOLERANCIA_COLUNA
+        inicio_quantidade = min(q['x0'] for q in quantidades) - TOLERANCIA_COLUNA
+        if inicio_quantidade > max(p['x1'] for p in precos):
+            return LayoutColunas(fim_codigo, inicio_preco, inicio_quantidade, padrao)
+    return LayoutColunas(fim_codigo, padrao=padrao)
+
+
+def banda_das_linhas(linhas):
+    """
+    Faixa vertical (topo, base) ocupada pelas linhas de dados, com folga
+    """
+    palavras = [p for linha in linhas for p in linha]
+    return (round(max(0.0, min(p['top'] for p in palavras) - MARGEM_BANDA), 1),
+            round(max(p['bottom'] for p in palavras) + MARGEM_BANDA, 1))
+
+
+def palavras_do_cabecalho(palavras, topo_dados):
+    """
+    Palavras acima da faixa de dados, sem números (datas e páginas mudam a cada tabela)
+    """
+    return sorted({p['text'].upper() for p in palavras
+                   if p['bottom'] <= topo_dados and p['text'].isalpha()})[:30]
+
+
+def calcular_assinatura(pdf, palavras_primeira_pagina, topo_dados):
+    primeira = pdf.pages[0]
+    metadados = pdf.metadata or {}
+    partes = [round(float(primeira.width)), round(float(primeira.height)),
+              str(metadados.get('Producer', '')).split(' - ')[0], str(metadados.get('Creator', '')),
+              palavras_do_cabecalho(palavras_primeira_pagina, topo_dados)]
+    return hashlib.sha1(json.dumps(partes, ensure_ascii=False).encode('utf-8')).hexdigest()[:16]
+
+
+def arredondar(valor):
+    return round(valor, 2) if valor is not None else None
+
+
+class PerfilLayout:
+    """
+    Perfil reaproveitável do layout de um PDF de fornecedor
+    """
+
+    def __init__(self, nome, assinatura, layout, banda=None, ignorar_inicio=0, ignorar_fim=0):
+        self.nome = nome
+        self.assinatura = assinatura
+        self.layout = layout
+        # (topo, base) da faixa com as linhas de dados, em pontos a partir do topo da página
+        self.banda = tuple(banda) if banda else None
+        self.ignorar_inicio = ignorar_inicio
+        self.ignorar_fim = ignorar_fim
+
+    def paginas_de_dados(self, total):
+        return range(min(self.ignorar_inicio, total), max(self.ignorar_inicio, total - self.ignorar_fim))
+
+    def para_dict(self):
+        return {
+            'versao': VERSAO_PERFIL,
+            'nome': self.nome,
+            'assinatura': self.assinatura,
+            'colunas': {
+                'fim_codigo': arredondar(self.layout.fim_codigo),
+                'inicio_preco': arredondar(self.layout.inicio_preco),
+                'inicio_quantidade': arredondar(self.layout.inicio_quantidade),
+            },
+            'padrao_linha': self.layout.padrao.pattern,
+            'banda': list(self.banda) if self.banda else None,
+            'ignorar_inicio': self.ignorar_inicio,
+            'ignorar_fim': self.ignorar_fim,
+        }
+
+    @classmethod
+    def de_dict(cls, dados):
+        colunas = dados['colunas']
+        layout = LayoutColunas(colunas['fim_codigo'], colunas.get('inicio_preco'),
+                               colunas.get('inicio_quantidade'),
+                               re.compile(dados.get('padrao_linha') or PADRAO_LINHA.pattern))
+        return cls(dados['nome'], dados['assinatura'], layout, dados.get('banda'),
+                   dados.get('ignorar_inicio', 0), dados.get('ignorar_fim', 0))
+
+    def salvar(self, pasta):
+        os.makedirs(pasta, exist_ok=True)
+        caminho = os.path.join(pasta, f'{self.nome}.json')
+        with open(caminho, 'w', encoding='utf-8') as arquivo:
+            json.dump(self.para_dict(), arquivo, ensure_ascii=False, indent=2)
+        return caminho
+
+    def corresponde(self, pdf, palavras_primeira_pagina):
+        topo = self.banda[0] if self.banda else 0
+        return calcular_assinatura(pdf, palavras_primeira_pagina, topo) == self.assinatura
+
+
+def pasta_layouts():
+    """
+    Pasta dos perfis: MEGAFARMA_LAYOUTS ou layouts/ na pasta do projeto (ou do executável)
+    """
+    if os.environ.get('MEGAFARMA_LAYOUTS'):
+        return os.environ['MEGAFARMA_LAYOUTS']
+    from api.banco import get_base_path
+    return os.path.join(get_base_path(), 'layouts')
+
+
+def carregar_perfis(pasta=None):
+    pasta = pasta or pasta_layouts()
+    if not os.path.isdir(pasta):
+        return []
+
+    perfis = []
+    for nome in sorted(os.listdir(pasta)):
+        if not nome.endswith('.json'):
+            continue
+        try:
+            with open(os.path.join(pasta, nome), encoding='utf-8') as arquivo:
+                perfis.append(PerfilLayout.de_dict(json.load(arquivo)))
+        except (OSError, ValueError, KeyError, re.error) as e:
+            log.warning("Perfil de layout inválido %s: %s", nome, e)
+    return perfis
+
+
+def encontrar_perfil(pdf, perfis, palavras_primeira_pagina):
+    for perfil in perfis:
+        if perfil.corresponde(pdf, palavras_primeira_pagina):
+            return perfil
+    return None
+
+
+def aprender_perfil(pdf, nome, padrao=PADRAO_LINHA):
+    """
+    Analisa todas as páginas e devolve (perfil, estatísticas) ou (None, estatísticas)
+    """
+    com_dados = []
+    casadas = []
+    palavras_primeira = None
+    for numero, page in enumerate(pdf.pages):
+        palavras = palavras_da_pagina(page)
+        page.close()
+        if numero == 0:
+            palavras_primeira = palavras
+        linhas = [linha for linha in linhas_de_palavras(palavras) if linha_casa(linha, padrao)]
+        casadas.extend(linhas)
+        com_dados.append(len(linhas))
+
+    estatisticas = {'paginas': len(pdf.pages), 'linhas_de_dados': len(casadas),
+                    'paginas_sem_dados': sum(1 for n in com_dados if not n)}
+    layout = aprender_colunas(casadas, padrao)
+    if layout is None:
+        return None, estatisticas
+
+    banda = banda_das_linhas(casadas)
+    ignorar_inicio = next(i for i, n in enumerate(com_dados) if n)
+    ignorar_fim = next(i for i, n in enumerate(reversed(com_dados)) if n)
+    perfil = PerfilLayout(nome, calcular_assinatura(pdf, palavras_primeira, banda[0]), layout,
+                          banda, ignorar_inicio, ignorar_fim)
+    return perfil, estatisticas
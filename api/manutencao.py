@@ -0,0 +1,344 @@
+# -*- coding: utf-8 -*-
+"""
+Manutenção do banco SQLite: cópia de segurança online, estatísticas e vacuum
+
+A exclusão da tabela e as importações que apagam e recarregam os produtos
+deixam páginas livres espalhadas pelo arquivo, e copiar o megafarma.db com o
+servidor gravando pode gerar uma cópia corrompida. Cada manutenção:
+
+1. copia o banco pela API de backup do SQLite em passos de PAGINAS_POR_PASSO
+   páginas, com uma pausa entre eles para as gravações seguirem (de uma vez
+   só se elas não deixam a cópia em passos terminar); a cópia é
+   conferida (PRAGMA quick_check) antes de ganhar o nome definitivo, e só as
+   MEGAFARMA_MANTER_BACKUPS (padrão 7) mais recentes ficam na pasta
+2. atualiza as estatísticas do planejador (ANALYZE e PRAGMA optimize)
+3. devolve ao sistema as páginas livres (PRAGMA incremental_vacuum); um banco
+   antigo, criado sem auto_vacuum incremental, é convertido com um VACUUM
+   completo quando as páginas livres passam de LIMITE_FRAGMENTACAO por cento
+
+Roda pelo /manutencao, pela linha de comando ou a cada MEGAFARMA_MANUTENCAO_HORAS
+no servidor (python -m api.servidor)
+
+Uso: python -m api.manutencao [--sem-backup] [--relatorio] [--pasta PASTA] [--manter N]
+A pasta padrão das cópias é MEGAFARMA_PASTA_BACKUPS ou backups/
+"""
+
+import argparse
+import glob
+import logging
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+log = logging.getLogger(__name__)
+
+PAGINAS_POR_PASSO = 1024
+PAUSA_PASSO = 0.005
+# Passos da cópia sem avanço (o banco mudou no meio ou estava travado) antes de copiar de uma vez
+PASSOS_SEM_AVANCO = 10
+MANTER_BACKUPS = 7
+LIMITE_FRAGMENTACAO = 20.0
+INTERVALO_HORAS = 24.0
+# Espera depois da partida do servidor antes da primeira manutenção atrasada
+ESPERA_INICIAL = 300
+
+MODOS_AUTO_VACUUM = {0: 'nenhum', 1: 'completo', 2: 'incremental'}
+
+trava_manutencao = threading.Lock()
+
+
+class ErroManutencao(RuntimeError):
+    """
+    Manutenção impossível agora, com o status HTTP da resposta
+    """
+
+    def __init__(self, mensagem, status=400):
+        super().__init__(mensagem)
+        self.status = status
+
+
+def pasta_padrao():
+    from api.banco import get_base_path
+
+    return os.environ.get('MEGAFARMA_PASTA_BACKUPS') or os.path.join(get_base_path(), 'backups')
+
+
+def backend_sqlite():
+    from api.banco import obter_backend
+
+    backend = obter_backend()
+    if backend.dialeto != 'sqlite':
+        raise ErroManutencao('A manutenção é só do SQLite: o PostgreSQL tem backup e vacuum próprios')
+    return backend
+
+
+def pragma(conn, nome):
+    return conn.execute(f'PRAGMA {nome}').fetchone()[0]
+
+
+def relatorio_banco(conn, caminho=None, detalhes=False):
+    """
+    Tamanho do banco, páginas livres (fragmentação) e modo de auto_vacuum
+    Com detalhes, o espaço de cada tabela e índice (tabela virtual dbstat, se existir)
+    """
+    pagina = pragma(conn, 'page_size')
+    paginas = pragma(conn, 'page_count')
+    livres = pragma(conn, 'freelist_count')
+    relatorio = {
+        'bytes': pagina * paginas,
+        'pagina_bytes': pagina,
+        'paginas': paginas,
+        'paginas_livres': livres,
+        'livres_bytes': pagina * livres,
+        'fragmentacao_percentual': round(livres * 100 / paginas, 2) if paginas else 0.0,
+        'auto_vacuum': MODOS_AUTO_VACUUM.get(pragma(conn, 'auto_vacuum')),
+    }
+    if caminho and os.path.exists(caminho):
+        relatorio['arquivos_bytes'] = sum(os.path.getsize(caminho + sufixo)
+                                          for sufixo in ('', '-wal', '-journal')
+                                          if os.path.exists(caminho + sufixo))
+
+    if detalhes:
+        try:
+            objetos = conn.execute('''
+                SELECT name, COUNT(*), SUM(pgsize), SUM(unused) FROM dbstat
+                GROUP BY name ORDER BY SUM(pgsize) DESC
+            ''').fetchall()
+        except sqlite3.OperationalError:
+            # SQLite compilado sem SQLITE_ENABLE_DBSTAT_VTAB
+            objetos = None
+        if objetos is not None:
+            relatorio['objetos'] = [{
+                'nome': nome,
+                'paginas': quantidade,
+                'bytes': tamanho,
+                'sem_uso_bytes': sem_uso,
+            } for nome, quantidade, tamanho, sem_uso in objetos]
+    return relatorio
+
+
+def relatorio_atual(detalhes=False):
+    """
+    relatorio_banco do banco da aplicação
+    """
+    backend = backend_sqlite()
+    conn = backend.conectar()
+    try:
+        return relatorio_banco(conn, arquivo_do_backend(backend), detalhes)
+    finally:
+        conn.close()
+
+
+def arquivo_do_backend(backend):
+    # O banco em memória (memoria://) não tem arquivo
+    return None if backend.caminho.startswith('file:') else backend.caminho
+
+
+def listar_backups(pasta):
+    return sorted(glob.glob(os.path.join(pasta, 'megafarma_*.db')))
+
+
+class CopiaRecomecada(Exception):
+    pass
+
+
+def copiar_em_passos(origem, destino):
+    """
+    Cópia pela API de backup em passos de PAGINAS_POR_PASSO páginas; entre eles
+    as outras conexões gravam normalmente. Uma gravação no meio faz o SQLite
+    recomeçar a cópia, e um banco travado não deixa o passo andar: depois de
+    PASSOS_SEM_AVANCO passos assim, CopiaRecomecada
+    Retorna quantos passos não avançaram
+    """
+    anterior = [None]
+    sem_avanco = [0]
+
+    def progresso(situacao, restantes, total):
+        if anterior[0] is not None and restantes >= anterior[0]:
+            sem_avanco[0] += 1
+            if sem_avanco[0] > PASSOS_SEM_AVANCO:
+                raise CopiaRecomecada()
+        anterior[0] = restantes
+        time.sleep(PAUSA_PASSO)
+
+    origem.backup(destino, pages=PAGINAS_POR_PASSO, progress=progresso)
+    return sem_avanco[0]
+
+
+def fazer_backup(conn, pasta, manter=MANTER_BACKUPS):
+    """
+    Copia o banco da conexão para pasta/megafarma_AAAAMMDD_HHMMSS.db pela API de
+    backup, em passos (copiar_em_passos). Se as gravações não deixam a cópia
+    terminar, ela é feita de uma vez: as gravações esperam só essa leitura
+    (busy timeout), e não a manutenção inteira. Apaga as cópias além de `manter`
+    """
+    os.makedirs(pasta, exist_ok=True)
+    destino = os.path.join(pasta, f'megafarma_{datetime.now():%Y%m%d_%H%M%S}.db')
+    parcial = destino + '.parcial'
+    inicio = time.perf_counter()
+
+    copia = sqlite3.connect(parcial)
+    try:
+        try:
+            sem_avanco = copiar_em_passos(conn, copia)
+            modo = 'passos'
+        except CopiaRecomecada:
+            conn.backup(copia)
+            sem_avanco, modo = PASSOS_SEM_AVANCO + 1, 'inteira'
+        verificacao = pragma(copia, 'quick_check')
+    finally:
+        copia.close()
+
+    if verificacao != 'ok':
+        os.remove(parcial)
+        raise ErroManutencao(f'Cópia de segurança com erro: {verificacao}', 500)
+    os.replace(parcial, destino)
+
+    for antigo in listar_backups(pasta)[:-manter] if manter > 0 else []:
+        os.remove(antigo)
+
+    return {
+        'arquivo': destino,
+        'bytes': os.path.getsize(destino),
+        'modo': modo,
+        'passos_sem_avanco': sem_avanco,
+        'segundos': round(time.perf_counter() - inicio, 3),
+    }
+
+
+def liberar_paginas(conn, relatorio):
+    """
+    Vacuum incremental; converte para ele (VACUUM completo) o banco fragmentado sem auto_vacuum
+    Retorna o modo usado (None quando nada foi feito)
+    """
+    if relatorio['auto_vacuum'] == 'incremental':
+        if relatorio['paginas_livres']:
+            # Pelo execute() do sqlite3 o pragma devolve uma página só, mesmo lendo
+            # todas as linhas; o executescript() roda o comando até o fim
+            conn.executescript('PRAGMA incremental_vacuum;')
+            restantes = pragma(conn, 'freelist_count')
+            if restantes:
+                log.warning("Vacuum incremental deixou %d página(s) livre(s)", restantes)
+            return 'incremental'
+        return None
+
+    if relatorio['fragmentacao_percentual'] >= LIMITE_FRAGMENTACAO:
+        conn.execute('PRAGMA auto_vacuum = INCREMENTAL')
+        conn.execute('VACUUM')
+        return 'completo'
+    return None
+
+
+def executar_manutencao(backup=True, pasta=None, manter=None):
+    """
+    Cópia de segurança (opcional), ANALYZE, PRAGMA optimize e vacuum
+    Uma manutenção por vez: ErroManutencao(409) se já há uma em andamento
+    """
+    backend = backend_sqlite()
+    if not trava_manutencao.acquire(blocking=False):
+        raise ErroManutencao('Já há uma manutenção em andamento', 409)
+
+    pasta = pasta or pasta_padrao()
+    if manter is None:
+        manter = int(os.environ.get('MEGAFARMA_MANTER_BACKUPS') or MANTER_BACKUPS)
+    arquivo = arquivo_do_backend(backend)
+    etapas = {}
+    try:
+        conn = backend.conectar()
+        try:
+            antes = relatorio_banco(conn, arquivo)
+            if backup:
+                etapas['backup'] = fazer_backup(conn, pasta, manter)
+
+            inicio = time.perf_counter()
+            conn.execute('ANALYZE')
+            conn.execute('PRAGMA optimize')
+            conn.commit()
+            etapas['estatisticas_segundos'] = round(time.perf_counter() - inicio, 3)
+
+            inicio = time.perf_counter()
+            etapas['vacuum'] = liberar_paginas(conn, antes)
+            etapas['vacuum_segundos'] = round(time.perf_counter() - inicio, 3)
+
+            depois = relatorio_banco(conn, arquivo)
+            etapas['paginas_liberadas'] = antes['paginas_livres'] - depois['paginas_livres']
+        finally:
+            conn.close()
+    finally:
+        trava_manutencao.release()
+
+    log.info("Manutenção do banco concluída", extra={'dados': {
+        'bytes_antes': antes['bytes'], 'bytes_depois': depois['bytes'],
+        'fragmentacao_antes': antes['fragmentacao_percentual'],
+        'paginas_liberadas': etapas['paginas_liberadas'],
+        'backup': etapas.get('backup', {}).get('arquivo'), 'vacuum': etapas['vacuum']}})
+    return {'antes': antes, 'depois': depois, 'etapas': etapas}
+
+
+class AgendadorManutencao:
+    """
+    Roda a manutenção (com cópia de segurança) a cada `horas` numa thread
+    O horário vem da cópia mais recente da pasta: depois de reiniciar, o servidor
+    não repete uma manutenção recente nem espera um intervalo inteiro por uma atrasada
+    """
+
+    def __init__(self, horas=None, pasta=None):
+        self.horas = horas or float(os.environ.get('MEGAFARMA_MANUTENCAO_HORAS')
+                                    or INTERVALO_HORAS)
+        self.pasta = pasta or pasta_padrao()
+        self.parado = threading.Event()
+        self.thread = None
+
+    def espera(self):
+        copias = listar_backups(self.pasta)
+        if not copias:
+            return ESPERA_INICIAL
+        proxima = os.path.getmtime(copias[-1]) + self.horas * 3600
+        return max(ESPERA_INICIAL, proxima - time.time())
+
+    def rodar(self):
+        while not self.parado.wait(self.espera()):
+            try:
+                executar_manutencao(pasta=self.pasta)
+            except Exception:
+                log.exception("Erro na manutenção agendada do banco")
+                # Sem cópia nova, a espera seguinte seria só a inicial
+                self.parado.wait(self.horas * 3600)
+
+    def iniciar(self):
+        self.thread = threading.Thread(target=self.rodar, name='manutencao-banco', daemon=True)
+        self.thread.start()
+        log.info("Manutenção do banco a cada %g h (cópias em %s)", self.horas, self.pasta)
+        return self
+
+    def parar(self):
+        self.parado.set()
+
+
+def main(argv=None):
+    import json
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--sem-backup', action='store_true', help='não faz a cópia de segurança')
+    parser.add_argument('--relatorio', action='store_true',
+                        help='só mostra o tamanho e a fragmentação (por tabela e índice)')
+    parser.add_argument('--pasta', help='pasta das cópias (padrão: MEGAFARMA_PASTA_BACKUPS ou backups/)')
+    parser.add_argument('--manter', type=int, help='cópias mantidas na pasta')
+    opcoes = parser.parse_args(argv)
+
+    from api.registro import configurar_registro
+    configurar_registro()
+    from api.banco import init_db
+    init_db()
+
+    if opcoes.relatorio:
+        resultado = relatorio_atual(detalhes=True)
+    else:
+        resultado = executar_manutencao(not opcoes.sem_backup, opcoes.pasta, opcoes.manter)
+    print(json.dumps(resultado, indent=2, ensure_ascii=False))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,275 @@
+# -*- coding: utf-8 -*-
+"""
+Matriz de preços em memória (NumPy) para as análises de melhor preço
+
+Uma linha por produto (ordem da descrição) e uma coluna para o TOUREIRO
+seguida de uma por fornecedor (ordem do nome); preço ausente ou zerado é
+NaN. A matriz é montada uma vez a partir do banco e reaproveitada enquanto
+os dados não mudam: no SQLite, pelo PRAGMA data_version de uma conexão só
+para isso (muda a cada commit de qualquer outra conexão, inclusive de outros
+processos); no PostgreSQL, por uma assinatura das tabelas (contagens, maior
+id e soma dos preços). As matrizes de cotações registradas não mudam e ficam
+num cache pequeno por cotação
+
+As análises (melhor fornecedor, segundo colocado, amplitude e economia
+sobre o TOUREIRO) são operações vetorizadas sobre a matriz inteira
+"""
+
+import logging
+import sqlite3
+import threading
+import time
+
+from api.armazenamento import dialeto
+from api.banco import conectar, obter_backend
+from api.cotacoes import sql_da_cotacao
+
+log = logging.getLogger(__name__)
+
+ORDENACOES = ('economia', 'amplitude', 'descricao')
+LIMITE_ITENS = 100
+# Matrizes de cotações registradas mantidas em memória
+MATRIZES_COTACOES = 4
+
+ASSINATURA_TABELAS = '''
+    SELECT (SELECT COUNT(*) FROM produtos),
+           (SELECT COALESCE(MAX(id), 0) FROM produtos),
+           (SELECT COALESCE(SUM(preco_toureiro), 0) FROM produtos),
+           (SELECT COUNT(*) FROM fornecedores),
+           (SELECT COALESCE(MAX(id), 0) FROM fornecedores),
+           (SELECT COUNT(*) FROM precos_fornecedores),
+           (SELECT COALESCE(SUM(preco), 0) FROM precos_fornecedores)
+'''
+
+trava_matriz = threading.Lock()
+matriz_atual = None
+# {cotação: MatrizPrecos}, na ordem de uso
+matrizes_cotacoes = {}
+# (backend, conexão que lê o PRAGMA data_version)
+sentinela = None
+
+
+class MatrizPrecos:
+    """
+    Preços (produtos x [TOUREIRO] + fornecedores) com os ids e nomes de cada eixo
+    """
+
+    def __init__(self, produto_ids, descricoes, fornecedores, precos, versao):
+        self.produto_ids = produto_ids
+        self.descricoes = descricoes
+        # [(id, nome)] na ordem das colunas 1..m
+        self.fornecedores = fornecedores
+        self.colunas = ['TOUREIRO'] + [nome for _, nome in fornecedores]
+        self.precos = precos
+        self.versao = versao
+        # Resultado de analisar(), calculado na primeira consulta a esta versão
+        self.analise = None
+
+    def __len__(self):
+        return len(self.produto_ids)
+
+
+def posicoes(chaves, valores):
+    """
+    Posição de cada valor em `chaves` (-1 quando não está lá), sem laço em Python
+    """
+    import numpy as np
+
+    if not len(chaves):
+        return np.full(len(valores), -1, dtype=np.int64)
+    ordem = np.argsort(chaves, kind='stable')
+    ordenadas = chaves[ordem]
+    indices = np.minimum(np.searchsorted(ordenadas, valores), len(ordenadas) - 1)
+    return np.where(ordenadas[indices] == valores, ordem[indices], -1)
+
+
+def montar_matriz(conn, versao=None, cotacao=None):
+    """
+    Lê produtos, fornecedores e preços do banco (tabela atual ou cotação) e monta a MatrizPrecos
+    """
+    # NumPy só é carregado quando uma análise é pedida
+    import numpy as np
+
+    cursor = conn.cursor()
+    cursor.execute(sql_da_cotacao(
+        'SELECT id, descricao, preco_toureiro FROM produtos ORDER BY descricao, id', cotacao))
+    produtos = cursor.fetchall()
+    cursor.execute(sql_da_cotacao('SELECT id, nome FROM fornecedores ORDER BY nome', cotacao))
+    fornecedores = [tuple(f) for f in cursor.fetchall()]
+    cursor.execute(sql_da_cotacao('SELECT produto_id, fornecedor_id, preco FROM precos_fornecedores '
+                                  'WHERE preco > 0', cotacao))
+    ligacoes = np.array(cursor.fetchall(), dtype=np.float64).reshape(-1, 3)
+
+    produto_ids = np.array([p[0] for p in produtos], dtype=np.int64)
+    precos = np.full((len(produtos), len(fornecedores) + 1), np.nan)
+    # Preço TOUREIRO ausente (só nas cotações) vira NaN como o zerado
+    precos[:, 0] = np.array([p[2] for p in produtos], dtype=np.float64)
+    precos[~(precos[:, 0] > 0), 0] = np.nan
+
+    linhas = posicoes(produto_ids, ligacoes[:, 0].astype(np.int64))
+    colunas = posicoes(np.array([f[0] for f in fornecedores], dtype=np.int64),
+                       ligacoes[:, 1].astype(np.int64)) + 1
+    validas = (linhas >= 0) & (colunas > 0)
+    precos[linhas[validas], colunas[validas]] = ligacoes[validas, 2]
+
+    return MatrizPrecos(produto_ids, [p[1] for p in produtos], fornecedores, precos, versao)
+
+
+def versao_dos_dados(conn):
+    """
+    Valor que muda sempre que produtos, fornecedores ou preços mudam
+    """
+    global sentinela
+
+    if dialeto(conn) == 'postgresql':
+        return tuple(conn.execute(ASSINATURA_TABELAS).fetchone())
+
+    # O data_version de uma conexão só muda com commits de outras conexões:
+    # a sentinela nunca grava, então enxerga todos
+    backend = obter_backend()
+    if sentinela is None or sentinela[0] is not backend:
+        # Usada só sob trava_matriz, de qualquer thread
+        sentinela = (backend, sqlite3.connect(backend.caminho, check_same_thread=False,
+                                              uri=backend.caminho.startswith('file:')))
+    return sentinela[1].execute('PRAGMA data_version').fetchone()[0]
+
+
+def obter_matriz(conn=None, cotacao=None):
+    """
+    Matriz de preços atual, montada de novo só quando os dados mudaram,
+    ou a de uma cotação registrada
+    """
+    global matriz_atual
+
+    fechar = conn is None
+    conn = conn or conectar()
+    try:
+        with trava_matriz:
+            if cotacao is not None:
+                matriz = matrizes_cotacoes.pop(cotacao, None) or montar_matriz(conn, cotacao=cotacao)
+                matrizes_cotacoes[cotacao] = matriz
+                while len(matrizes_cotacoes) > MATRIZES_COTACOES:
+                    del matrizes_cotacoes[next(iter(matrizes_cotacoes))]
+                return matriz
+
+            versao = versao_dos_dados(conn)
+            if matriz_atual is None or matriz_atual.versao != versao:
+                inicio = time.perf_counter()
+                matriz_atual = montar_matriz(conn, versao)
+                log.info("Matriz de preços montada: %d produtos x %d colunas",
+                         len(matriz_atual), len(matriz_atual.colunas), extra={'dados': {
+                             'ms': round((time.perf_counter() - inicio) * 1000, 1)}})
+            return matriz_atual
+    finally:
+        if fechar:
+            conn.close()
+
+
+def analise_atual(cotacao=None):
+    """
+    (matriz, analisar(matriz)) dos dados atuais ou de uma cotação; a análise é
+    calculada uma vez por versão
+    """
+    matriz = obter_matriz(cotacao=cotacao)
+    with trava_matriz:
+        if matriz.analise is None:
+            matriz.analise = analisar(matriz)
+    return matriz, matriz.analise
+
+
+def analisar(matriz):
+    """
+    Por produto: melhor coluna e preço, segundo colocado, amplitude (maior - menor
+    preço) e economia sobre o TOUREIRO. Empates ficam com a primeira coluna
+    (o TOUREIRO, depois os fornecedores pelo nome), como em gerar_relatorio
+    Só são comparáveis os produtos com ao menos um preço de fornecedor
+    """
+    import numpy as np
+
+    precos = matriz.precos
+    linhas = np.arange(len(matriz))
+    ausentes = np.isnan(precos)
+    candidatos = np.where(ausentes, np.inf, precos)
+
+    melhor = candidatos.argmin(axis=1)
+    menor = candidatos[linhas, melhor]
+    candidatos[linhas, melhor] = np.inf
+    segundo = candidatos.argmin(axis=1)
+    segundo_preco = candidatos[linhas, segundo]
+    maior = np.where(ausentes, -np.inf, precos).max(axis=1, initial=-np.inf)
+
+    comparaveis = ~ausentes[:, 1:].all(axis=1)
+    tem_segundo = np.isfinite(segundo_preco)
+    menor = np.where(comparaveis, menor, np.nan)
+    economia = np.where(comparaveis, precos[:, 0] - menor, np.nan)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        percentual = economia / precos[:, 0] * 100
+
+    return {
+        'comparaveis': comparaveis,
+        'melhor': melhor,
+        'menor': menor,
+        'segundo': np.where(tem_segundo, segundo, -1),
+        'segundo_preco': np.where(tem_segundo, segundo_preco, np.nan),
+        'amplitude': np.where(comparaveis, maior - menor, np.nan),
+        'economia': economia,
+        'percentual': percentual,
+    }
+
+
+def numero(valor, casas=4):
+    # NaN (sem preço) vira null no JSON
+    return None if valor != valor else round(float(valor), casas)
+
+
+def resumo_analise(matriz, analise, limite=LIMITE_ITENS, ordenar='economia'):
+    """
+    Totais por fornecedor e os `limite` produtos comparáveis na ordem pedida
+    (economia ou amplitude decrescente, ou descrição)
+    """
+    import numpy as np
+
+    comparaveis = analise['comparaveis']
+    colunas = len(matriz.colunas)
+    melhor = analise['melhor'][comparaveis]
+    economia = np.nan_to_num(analise['economia'][comparaveis])
+    vitorias = np.bincount(melhor, minlength=colunas)
+    economia_por_coluna = np.bincount(melhor, weights=economia, minlength=colunas)
+    com_preco = (~np.isnan(matriz.precos)).sum(axis=0)
+
+    indices = np.flatnonzero(comparaveis)
+    if ordenar != 'descricao':
+        chave = np.nan_to_num(analise[ordenar][indices], nan=-np.inf)
+        indices = indices[np.argsort(-chave, kind='stable')]
+    if limite:
+        indices = indices[:limite]
+
+    itens = []
+    for i in indices.tolist():
+        segundo = int(analise['segundo'][i])
+        itens.append({
+            'produto_id': int(matriz.produto_ids[i]),
+            'descricao': matriz.descricoes[i],
+            'preco_toureiro': numero(matriz.precos[i, 0]),
+            'fornecedor': matriz.colunas[analise['melhor'][i]],
+            'menor_preco': numero(analise['menor'][i]),
+            'segundo_fornecedor': matriz.colunas[segundo] if segundo >= 0 else None,
+            'segundo_preco': numero(analise['segundo_preco'][i]),
+            'amplitude': numero(analise['amplitude'][i]),
+            'economia': numero(analise['economia'][i]),
+            'economia_percentual': numero(analise['percentual'][i], 2),
+        })
+
+    return {
+        'produtos': len(matriz),
+        'comparaveis': int(comparaveis.sum()),
+        'economia_total': numero(economia.sum(), 2),
+        'colunas': [{
+            'id': None if coluna == 0 else matriz.fornecedores[coluna - 1][0],
+            'nome': nome,
+            'com_preco': int(com_preco[coluna]),
+            'melhor_em': int(vitorias[coluna]),
+            'economia': numero(economia_por_coluna[coluna], 2),
+        } for coluna, nome in enumerate(matriz.colunas)],
+        'itens': itens,
+    }
@@ -0,0 +1,285 @@
+# -*- coding: utf-8 -*-
+"""
+Métricas da aplicação no formato de texto do Prometheus (GET /metrics)
+
+- latência de cada rota (histograma por rota, método e status)
+- consultas ao banco por rota: quantidade e tempo gasto no execute
+- páginas de PDF processadas e tempo de extração (páginas/s = razão das taxas)
+- tempo de montagem de cada relatório PDF
+
+Os valores ficam na memória do processo: com vários workers do gunicorn,
+cada um expõe os seus (o Prometheus soma as instâncias)
+
+Perfil por requisição: com MEGAFARMA_PERFIL=1, o cabeçalho
+"X-Perfil: cprofile" (ou "pyinstrument", se instalado) grava o perfil da
+requisição em perfis/ e devolve o nome do arquivo em X-Perfil-Arquivo
+"""
+
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+log = logging.getLogger(__name__)
+
+LIMITES_PADRAO = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+LIMITES_CONSULTAS = (1, 2, 5, 10, 20, 50, 100, 500, 1000)
+
+TIPO_CONTEUDO = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Consultas da requisição em andamento nesta thread
+requisicao_atual = threading.local()
+
+# Só um perfilador pode estar ativo por vez no processo
+trava_perfil = threading.Lock()
+
+
+def escapar(valor):
+    return str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def formatar_rotulos(nomes, valores, extra=''):
+    pares = [f'{nome}="{escapar(valor)}"' for nome, valor in zip(nomes, valores)]
+    if extra:
+        pares.append(extra)
+    return '{' + ','.join(pares) + '}' if pares else ''
+
+
+def formatar_numero(valor):
+    if valor == float('inf'):
+        return '+Inf'
+    return repr(float(valor)) if isinstance(valor, float) else str(valor)
+
+
+class Contador:
+    """
+    Contador crescente, com rótulos
+    """
+    tipo = 'counter'
+
+    def __init__(self, nome, ajuda, rotulos=()):
+        self.nome = nome
+        self.ajuda = ajuda
+        self.rotulos = tuple(rotulos)
+        self.valores = {}
+        self.trava = threading.Lock()
+
+    def incrementar(self, valor=1, *rotulos):
+        with self.trava:
+            self.valores[rotulos] = self.valores.get(rotulos, 0) + valor
+
+    def linhas(self):
+        with self.trava:
+            itens = sorted(self.valores.items())
+        for rotulos, valor in itens:
+            yield f'{self.nome}{formatar_rotulos(self.rotulos, rotulos)} {formatar_numero(valor)}'
+
+
+class Medidor(Contador):
+    """
+    Valor que sobe e desce (último valor informado)
+    """
+    tipo = 'gauge'
+
+    def definir(self, valor, *rotulos):
+        with self.trava:
+            self.valores[rotulos] = valor
+
+
+class Histograma:
+    """
+    Histograma com limites fixos (baldes cumulativos, soma e contagem)
+    """
+    tipo = 'histogram'
+
+    def __init__(self, nome, ajuda, rotulos=(), limites=LIMITES_PADRAO):
+        self.nome = nome
+        self.ajuda = ajuda
+        self.rotulos = tuple(rotulos)
+        self.limites = tuple(limites)
+        self.series = {}
+        self.trava = threading.Lock()
+
+    def observar(self, valor, *rotulos):
+        with self.trava:
+            serie = self.series.get(rotulos)
+            if serie is None:
+                # [contagem por balde (+Inf no fim), soma]
+                serie = self.series[rotulos] = [[0] * (len(self.limites) + 1), 0.0]
+            serie[0][bisect_left(self.limites, valor)] += 1
+            serie[1] += valor
+
+    def linhas(self):
+        with self.trava:
+            itens = sorted((rotulos, (list(baldes), soma))
+                           for rotulos, (baldes, soma) in self.series.items())
+        for rotulos, (baldes, soma) in itens:
+            acumulado = 0
+            for limite, quantidade in zip(self.limites + (float('inf'),), baldes):
+                acumulado += quantidade
+                le = f'le="{formatar_numero(limite) if limite != float("inf") else "+Inf"}"'
+                yield f'{self.nome}_bucket{formatar_rotulos(self.rotulos, rotulos, le)} {acumulado}'
+            yield f'{self.nome}_sum{formatar_rotulos(self.rotulos, rotulos)} {formatar_numero(soma)}'
+            yield f'{self.nome}_count{formatar_rotulos(self.rotulos, rotulos)} {acumulado}'
+
+
+latencia_rotas = Histograma(
+    'megafarma_http_requisicao_segundos', 'Latência das requisições por rota',
+    ('rota', 'metodo', 'status'))
+consultas_por_requisicao = Histograma(
+    'megafarma_db_consultas_por_requisicao', 'Consultas ao banco em cada requisição',
+    ('rota',), LIMITES_CONSULTAS)
+consultas_total = Contador(
+    'megafarma_db_consultas_total', 'Consultas ao banco executadas', ('rota',))
+consultas_segundos = Contador(
+    'megafarma_db_consultas_segundos_total', 'Tempo gasto no execute das consultas', ('rota',))
+paginas_pdf = Contador(
+    'megafarma_pdf_paginas_total', 'Páginas de PDF TOUREIRO processadas')
+extracao_pdf_segundos = Contador(
+    'megafarma_pdf_extracao_segundos_total', 'Tempo gasto extraindo PDFs TOUREIRO')
+ultima_extracao = Medidor(
+    'megafarma_pdf_paginas_por_segundo', 'Páginas por segundo da última extração')
+render_relatorios = Histograma(
+    'megafarma_relatorio_render_segundos', 'Tempo de montagem (doc.build) dos relatórios PDF',
+    ('relatorio',))
+
+METRICAS = [latencia_rotas, consultas_por_requisicao, consultas_total, consultas_segundos,
+            paginas_pdf, extracao_pdf_segundos, ultima_extracao, render_relatorios]
+
+
+def exportar():
+    """
+    Todas as métricas no formato de texto do Prometheus
+    """
+    linhas = []
+    for metrica in METRICAS:
+        linhas.append(f'# HELP {metrica.nome} {metrica.ajuda}')
+        linhas.append(f'# TYPE {metrica.nome} {metrica.tipo}')
+        linhas.extend(metrica.linhas())
+    return '\n'.join(linhas) + '\n'
+
+
+def registrar_consulta(segundos):
+    """
+    Chamado pelos cursores do banco a cada execute/executemany
+    """
+    contagem = getattr(requisicao_atual, 'consultas', None)
+    if contagem is not None:
+        contagem[0] += 1
+        contagem[1] += segundos
+    else:
+        # Fora de requisição (init_db, benchmarks, importação em segundo plano)
+        consultas_total.incrementar(1, 'fora_de_requisicao')
+        consultas_segundos.incrementar(segundos, 'fora_de_requisicao')
+
+
+def registrar_extracao_pdf(paginas, segundos):
+    paginas_pdf.incrementar(paginas)
+    extracao_pdf_segundos.incrementar(segundos)
+    ultima_extracao.definir(paginas / segundos if segundos else 0.0)
+
+
+@contextmanager
+def medir_relatorio(nome):
+    """
+    Mede a montagem de um relatório: with medir_relatorio('gerar_relatorio'): doc.build(story)
+    """
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        render_relatorios.observar(time.perf_counter() - inicio, nome)
+
+
+def iniciar_perfil(tipo, pasta, rota):
+    """
+    Começa a perfilar a requisição; devolve (perfilador, caminho do arquivo)
+    """
+    nome = (f"{time.strftime('%Y%m%d_%H%M%S')}_{int(time.time() * 1000) % 1000:03d}_"
+            f"{rota.strip('/').replace('/', '_') or 'index'}")
+    os.makedirs(pasta, exist_ok=True)
+    if tipo == 'pyinstrument':
+        try:
+            from pyinstrument import Profiler
+        except ImportError:
+            log.warning("pyinstrument não instalado: usando cProfile")
+        else:
+            perfilador = Profiler()
+            perfilador.start()
+            return perfilador, os.path.join(pasta, nome + '.html')
+
+    import cProfile
+
+    perfilador = cProfile.Profile()
+    perfilador.enable()
+    return perfilador, os.path.join(pasta, nome + '.prof')
+
+
+def gravar_perfil(perfilador, caminho):
+    if caminho.endswith('.html'):
+        perfilador.stop()
+        with open(caminho, 'w', encoding='utf-8') as arquivo:
+            arquivo.write(perfilador.output_html())
+    else:
+        perfilador.disable()
+        perfilador.dump_stats(caminho)
+
+
+def instalar(app, pasta_perfis):
+    """
+    Registra a medição das requisições e a rota /metrics no app
+    """
+    from flask import Response, g, request
+
+    perfil_habilitado = os.environ.get('MEGAFARMA_PERFIL', '') in ('1', 'true')
+
+    @app.before_request
+    def iniciar_medicao():
+        g.inicio_metricas = time.perf_counter()
+        requisicao_atual.consultas = [0, 0.0]
+        tipo_perfil = request.headers.get('X-Perfil', '').lower()
+        if (perfil_habilitado and tipo_perfil in ('cprofile', 'pyinstrument')
+                and trava_perfil.acquire(blocking=False)):
+            try:
+                g.perfil = iniciar_perfil(tipo_perfil, pasta_perfis, request.path)
+            except Exception:
+                trava_perfil.release()
+                raise
+
+    @app.after_request
+    def anotar_resposta(resposta):
+        g.status_metricas = resposta.status_code
+        if 'perfil' in g:
+            resposta.headers['X-Perfil-Arquivo'] = os.path.basename(g.perfil[1])
+        return resposta
+
+    @app.teardown_request
+    def concluir_medicao(erro=None):
+        # Em respostas em streaming, roda depois do último pedaço enviado
+        inicio = g.pop('inicio_metricas', None)
+        if inicio is None:
+            return
+        rota = request.url_rule.rule if request.url_rule else 'desconhecida'
+        status = g.pop('status_metricas', 500)
+        latencia_rotas.observar(time.perf_counter() - inicio, rota, request.method, str(status))
+
+        quantidade, segundos = getattr(requisicao_atual, 'consultas', None) or (0, 0.0)
+        requisicao_atual.consultas = None
+        consultas_por_requisicao.observar(quantidade, rota)
+        consultas_total.incrementar(quantidade, rota)
+        consultas_segundos.incrementar(segundos, rota)
+
+        perfil = g.pop('perfil', None)
+        if perfil:
+            try:
+                gravar_perfil(*perfil)
+            finally:
+                trava_perfil.release()
+            log.info("Perfil de %s gravado em %s", request.path, perfil[1])
+
+    def metrics():
+        return Response(exportar(), mimetype=TIPO_CONTEUDO)
+
+    app.add_url_rule('/metrics', 'metrics', metrics, methods=['GET'])
@@ -0,0 +1,331 @@
+# -*- coding: utf-8 -*-
+"""
+Otimização do pedido: distribui os itens entre os fornecedores pelo menor custo total
+
+O menor preço item a item ignora o pedido mínimo e o frete de cada
+fornecedor. Aqui cada item (com a quantidade pedida) vai para um fornecedor
+que tem preço para ele; todo fornecedor usado cobra o seu frete e precisa
+somar, em itens, ao menos o seu pedido mínimo. O problema (localização de
+instalações com mínimo) é NP-difícil; a heurística abaixo resolve milhares
+de itens em poucos segundos:
+
+1. começa com o menor preço de cada item
+2. conserta cada fornecedor abaixo do mínimo: o completa com os itens que
+   custam menos a mais para trazer, ou o fecha e manda os itens para o
+   melhor fornecedor restante, o que sair mais barato; sem nenhum dos dois,
+   abre outros fornecedores para recebê-los e os conserta também
+3. busca local até não melhorar: fechar cada fornecedor usado, abrir cada
+   fornecedor sem itens, mover itens isolados e trocar, num fornecedor preso
+   ao mínimo, um item caro nele por outro que mantém o mínimo
+
+Um fornecedor sem condições (pedido mínimo e frete zero, como o TOUREIRO)
+pode sempre receber itens
+"""
+
+import numpy as np
+
+FOLGA = 1e-9
+RODADAS = 20
+# Itens mais caros de cada fornecedor tentados na troca, por rodada
+TROCAS_POR_FORNECEDOR = 20
+
+
+class Plano:
+    """
+    Atribuição dos itens aos fornecedores, com subtotal e número de itens de cada um
+    custos[i, j] = quantidade x preço do item i no fornecedor j (inf sem preço)
+    """
+
+    def __init__(self, custos, minimos, fretes, atribuicao):
+        self.custos = custos
+        self.minimos = minimos
+        self.fretes = fretes
+        self.atribuicao = atribuicao.copy()
+        colunas = custos.shape[1]
+        self.subtotais = np.bincount(atribuicao, weights=custos[np.arange(len(atribuicao)),
+                                                                 atribuicao], minlength=colunas)
+        self.itens = np.bincount(atribuicao, minlength=colunas)
+
+    def copia(self):
+        novo = Plano.__new__(Plano)
+        novo.custos, novo.minimos, novo.fretes = self.custos, self.minimos, self.fretes
+        novo.atribuicao = self.atribuicao.copy()
+        novo.subtotais = self.subtotais.copy()
+        novo.itens = self.itens.copy()
+        return novo
+
+    def total(self):
+        return float(self.subtotais.sum() + self.fretes[self.itens > 0].sum())
+
+    def mover(self, item, destino):
+        origem = self.atribuicao[item]
+        self.subtotais[origem] -= self.custos[item, origem]
+        self.itens[origem] -= 1
+        self.subtotais[destino] += self.custos[item, destino]
+        self.itens[destino] += 1
+        self.atribuicao[item] = destino
+
+    def mover_varios(self, itens, destinos):
+        origens = self.atribuicao[itens]
+        colunas = len(self.subtotais)
+        self.subtotais -= np.bincount(origens, weights=self.custos[itens, origens], minlength=colunas)
+        self.itens -= np.bincount(origens, minlength=colunas)
+        self.subtotais += np.bincount(destinos, weights=self.custos[itens, destinos],
+                                      minlength=colunas)
+        self.itens += np.bincount(destinos, minlength=colunas)
+        self.atribuicao[itens] = destinos
+
+    def abaixo_do_minimo(self):
+        return np.flatnonzero((self.itens > 0) & (self.subtotais < self.minimos - FOLGA))
+
+    def pode_sair(self, item):
+        # O fornecedor do item continua no mínimo sem ele, ou fica sem itens
+        origem = self.atribuicao[item]
+        return (self.itens[origem] == 1
+                or self.subtotais[origem] - self.custos[item, origem] >= self.minimos[origem] - FOLGA)
+
+    def podem_sair(self, itens):
+        # pode_sair de vários itens, cada um como se fosse o único a sair
+        origens = self.atribuicao[itens]
+        return ((self.itens[origens] == 1)
+                | (self.subtotais[origens] - self.custos[itens, origens]
+                   >= self.minimos[origens] - FOLGA))
+
+
+def fechar(plano, coluna, fechados=None):
+    """
+    Manda os itens da coluna para o melhor fornecedor já usado (ou sem pedido mínimo)
+    Com fechados, para o melhor fora deles, mesmo sem itens (reparar completa depois)
+    None se algum item não tem para onde ir
+    """
+    if fechados is None:
+        permitidos = (plano.itens > 0) | (plano.minimos <= FOLGA)
+    else:
+        permitidos = np.ones(len(plano.itens), dtype=bool)
+        permitidos[list(fechados)] = False
+    permitidos[coluna] = False
+    itens = np.flatnonzero(plano.atribuicao == coluna)
+    custos = np.where(permitidos, plano.custos[itens], np.inf)
+    destinos = custos.argmin(axis=1)
+    if not np.isfinite(custos[np.arange(len(itens)), destinos]).all():
+        return None
+    novo = plano.copia()
+    novo.mover_varios(itens, destinos)
+    return novo
+
+
+def completar(plano, coluna, estrito=True):
+    """
+    Traz itens de outros fornecedores até a coluna atingir o pedido mínimo, primeiro
+    os que custam menos a mais por real trazido; None se não der para atingir
+    Com estrito=False, também tira itens de quem fica abaixo do mínimo (reparar depois)
+    """
+    novo = plano.copia()
+    falta = novo.minimos[coluna] - novo.subtotais[coluna]
+    candidatos = np.flatnonzero((novo.atribuicao != coluna) & np.isfinite(novo.custos[:, coluna]))
+    if estrito:
+        candidatos = candidatos[novo.podem_sair(candidatos)]
+    trazido = novo.custos[candidatos, coluna]
+    acrescimo = trazido - novo.custos[candidatos, novo.atribuicao[candidatos]]
+    for item in candidatos[np.argsort(acrescimo / trazido, kind='stable')]:
+        if falta <= FOLGA:
+            break
+        if not estrito or novo.pode_sair(item):
+            falta -= novo.custos[item, coluna]
+            novo.mover(item, coluna)
+    return novo if falta <= FOLGA else None
+
+
+def abrir(plano, coluna):
+    """
+    Passa para a coluna os itens mais baratos nela e a completa até o mínimo; os
+    fornecedores que ficam abaixo do mínimo com isso são consertados (ou fechados)
+    None se a coluna não tem item mais barato ou não atinge o mínimo
+    """
+    atuais = plano.custos[np.arange(len(plano.atribuicao)), plano.atribuicao]
+    itens = np.flatnonzero(atuais - plano.custos[:, coluna] > FOLGA)
+    if not len(itens):
+        return None
+    novo = plano.copia()
+    novo.mover_varios(itens, np.full(len(itens), coluna))
+    if novo.subtotais[coluna] < novo.minimos[coluna] - FOLGA:
+        novo = completar(novo, coluna, estrito=False)
+        if novo is None:
+            return None
+    novo, _ = reparar(novo)
+    return novo
+
+
+def reparar(plano):
+    """
+    Conserta os fornecedores abaixo do mínimo; devolve o plano e os que não tiveram conserto
+    Fechar e completar não deixam outro fornecedor abaixo do mínimo: cada passo resolve um
+    Sem nenhum dos dois, fecha abrindo outros fornecedores ou completa tirando itens de
+    quem fica abaixo do mínimo, e estes entram no conserto. Cada fornecedor passa por isso
+    uma vez só, e os fechados assim não são abertos de novo
+    """
+    pendentes = set()
+    fechados = set()
+    forcados = set()
+    while True:
+        abaixo = [j for j in plano.abaixo_do_minimo().tolist() if j not in pendentes]
+        if not abaixo:
+            return plano, pendentes
+        # Primeiro o mais longe do mínimo
+        coluna = max(abaixo, key=lambda j: plano.minimos[j] - plano.subtotais[j])
+        opcoes = [p for p in (fechar(plano, coluna), completar(plano, coluna)) if p is not None]
+        if opcoes:
+            plano = min(opcoes, key=Plano.total)
+            continue
+        if coluna not in forcados:
+            forcados.add(coluna)
+            opcoes = [p for p in (fechar(plano, coluna, fechados),
+                                  completar(plano, coluna, estrito=False)) if p is not None]
+        if not opcoes:
+            pendentes.add(coluna)
+            continue
+        plano = min(opcoes, key=Plano.total)
+        if not plano.itens[coluna]:
+            fechados.add(coluna)
+
+
+def mover_itens(plano):
+    """
+    Move cada item para o fornecedor já usado mais barato, quando o de origem
+    continua no mínimo (ou fica vazio e deixa de cobrar frete). Altera o plano
+    Destinos e ganhos saem de uma conta só sobre a matriz; a conferência de cada
+    movimento, na ordem do ganho, acompanha as folgas sobre o mínimo em listas
+    """
+    linhas = np.arange(len(plano.atribuicao))
+    custos = np.where(plano.itens > 0, plano.custos, np.inf)
+    destinos = custos.argmin(axis=1)
+    saidas = custos[linhas, plano.atribuicao]
+    entradas = custos[linhas, destinos]
+    ganhos = saidas - entradas
+    ganhos += np.where(plano.itens[plano.atribuicao] == 1, plano.fretes[plano.atribuicao], 0)
+    candidatos = np.flatnonzero(ganhos > FOLGA)
+    candidatos = candidatos[np.argsort(-ganhos[candidatos], kind='stable')]
+
+    folgas = np.where(plano.minimos > FOLGA, plano.subtotais - plano.minimos, np.inf).tolist()
+    itens = plano.itens.tolist()
+    fretes = plano.fretes.tolist()
+    movidos = []
+    for item, origem, destino, saida, entrada in zip(
+            candidatos.tolist(), plano.atribuicao[candidatos].tolist(),
+            destinos[candidatos].tolist(), saidas[candidatos].tolist(),
+            entradas[candidatos].tolist()):
+        if itens[destino] == 0:
+            # O destino ficou vazio com os movimentos anteriores
+            continue
+        if itens[origem] == 1:
+            if saida - entrada + fretes[origem] <= FOLGA:
+                continue
+        elif saida - entrada <= FOLGA or saida > folgas[origem] + FOLGA:
+            continue
+        folgas[origem] -= saida
+        folgas[destino] += entrada
+        itens[origem] -= 1
+        itens[destino] += 1
+        movidos.append(item)
+
+    if not movidos:
+        return False
+    plano.mover_varios(np.array(movidos), destinos[movidos])
+    return True
+
+
+def trocar(plano):
+    """
+    Em cada fornecedor com pedido mínimo, troca um dos itens que mais custam a mais nele
+    por um item de fora que o mantém no mínimo e custa menos a mais. Altera o plano
+    """
+    melhorou = False
+    for coluna in np.flatnonzero((plano.itens > 0) & (plano.minimos > FOLGA)):
+        dentro = np.flatnonzero(plano.atribuicao == coluna)
+        alternativas = np.where(plano.itens > 0, plano.custos[dentro], np.inf)
+        alternativas[:, coluna] = np.inf
+        saidas = alternativas.argmin(axis=1)
+        ganhos = plano.custos[dentro, coluna] - alternativas[np.arange(len(dentro)), saidas]
+
+        fora = np.flatnonzero((plano.atribuicao != coluna) & np.isfinite(plano.custos[:, coluna]))
+        if not len(fora):
+            continue
+        origens = plano.atribuicao[fora]
+        trazido = plano.custos[fora, coluna]
+        acrescimos = trazido - plano.custos[fora, origens]
+        # Só entram itens cujo fornecedor continua no mínimo (ou fica vazio) sem eles
+        acrescimos[~plano.podem_sair(fora)] = np.inf
+        folga = plano.subtotais[coluna] - plano.minimos[coluna]
+
+        for indice in np.argsort(-ganhos, kind='stable')[:TROCAS_POR_FORNECEDOR]:
+            if ganhos[indice] <= FOLGA or not np.isfinite(ganhos[indice]):
+                break
+            saida = dentro[indice]
+            # O item que entra repõe o que o que sai tira do mínimo
+            opcoes = np.where(trazido >= plano.custos[saida, coluna] - folga - FOLGA,
+                              acrescimos, np.inf)
+            # Se o item que entra vem de onde vai o que sai, esse fornecedor troca um
+            # pelo outro e precisa continuar no mínimo (pode_sair contava que ficava vazio)
+            destino = saidas[indice]
+            mesmo = origens == destino
+            opcoes[mesmo & (plano.subtotais[destino] - plano.custos[fora, destino]
+                            + plano.custos[saida, destino] < plano.minimos[destino] - FOLGA)] = np.inf
+            escolhido = opcoes.argmin()
+            if ganhos[indice] - opcoes[escolhido] > FOLGA:
+                plano.mover(saida, destino)
+                plano.mover(fora[escolhido], coluna)
+                melhorou = True
+                break
+    return melhorou
+
+
+def melhorar(plano):
+    """
+    Busca local: mover e trocar itens, fechar cada fornecedor usado e abrir cada um sem itens
+    Cada fechamento ou abertura é seguido dos movimentos de itens que ele permite, e só
+    é aceito se não deixa abaixo do mínimo um fornecedor que estava em dia
+    """
+    abaixo = set(plano.abaixo_do_minimo().tolist())
+    for _ in range(RODADAS):
+        melhorou = mover_itens(plano)
+        melhorou = trocar(plano) or melhorou
+        for coluna in range(plano.custos.shape[1]):
+            operacao = fechar if plano.itens[coluna] > 0 else abrir
+            novo = operacao(plano, coluna)
+            if novo is None:
+                continue
+            mover_itens(novo)
+            if novo.total() >= plano.total() - FOLGA:
+                continue
+            # Abrir conserta os fornecedores afetados, mas o conserto pode não resolver todos
+            abaixo_novo = set(novo.abaixo_do_minimo().tolist())
+            if abaixo_novo <= abaixo:
+                plano, abaixo = novo, abaixo_novo
+                melhorou = True
+        if not melhorou:
+            break
+    return plano
+
+
+def otimizar(precos, quantidades, minimos, fretes):
+    """
+    precos: (itens x fornecedores) preço unitário, NaN sem preço; quantidades por item;
+    minimos e fretes por fornecedor. Todo item precisa de ao menos um preço
+    Retorna {'atribuicao', 'total', 'total_menor_preco', 'pendentes'}: a coluna de cada
+    item, o custo total (itens e fretes) do plano e do menor preço item a item, e as
+    colunas que ficaram abaixo do mínimo por não haver como completá-las nem fechá-las
+    """
+    custos = np.asarray(quantidades, dtype=np.float64)[:, None] * precos
+    custos[np.isnan(custos)] = np.inf
+    minimos = np.asarray(minimos, dtype=np.float64)
+    fretes = np.asarray(fretes, dtype=np.float64)
+
+    inicial = Plano(custos, minimos, fretes, custos.argmin(axis=1))
+    plano, _ = reparar(inicial)
+    plano = melhorar(plano)
+    return {
+        'atribuicao': plano.atribuicao,
+        'total': plano.total(),
+        'total_menor_preco': inicial.total(),
+        'pendentes': plano.abaixo_do_minimo().tolist(),
+    }
@@ -0,0 +1,277 @@
+# -*- coding: utf-8 -*-
+"""
+Acesso às páginas do PDF durante a extração, com memória e tempo limitados
+
+DocumentoPdf descarta o layout de cada página depois de usada e, com janela,
+lê o arquivo em blocos de páginas. Os executores rodam uma função sobre uma
+página: ExecutorLocal no próprio processo e ExecutorProcesso num processo
+supervisionado, com limite de tempo (MEGAFARMA_PDF_TEMPO_PAGINA, segundos) e
+de memória (MEGAFARMA_PDF_MEMORIA_PAGINA, MB) por página. Uma página que
+falha, estoura o tempo ou a memória vira PaginaIgnorada e a extração segue
+"""
+
+import gc
+import logging
+import multiprocessing
+import os
+from contextlib import contextmanager
+
+log = logging.getLogger(__name__)
+
+ISOLAMENTOS = ('processo', 'local')
+TEMPO_PAGINA = 30
+TEMPO_PARTIDA = 30
+MEMORIA_PAGINA = 512
+
+
+class PaginaIgnorada(Exception):
+    """
+    Página que não pôde ser processada (erro, tempo ou memória esgotados)
+    """
+
+
+class DocumentoPdf:
+    """
+    PDF aberto com o pdfplumber, com memória limitada durante a extração
+
+    Cada página tem o layout e os objetos descartados depois de processada
+    (page.close). Com janela (MEGAFARMA_PDF_JANELA), as páginas são lidas em
+    blocos de janela páginas, cada bloco com o arquivo aberto só para elas:
+    os fluxos de conteúdo decodificados que o pdfminer guarda no documento
+    também são descartados ao fim de cada bloco
+    """
+
+    def __init__(self, caminho, janela=None):
+        # pdfplumber (pdfminer e Pillow) só é carregado quando um PDF é importado
+        import pdfplumber
+
+        self.caminho = caminho
+        self.janela = janela
+        self.bloco = None
+        if janela:
+            # Só a primeira página (perfil de layout); as outras são abertas em cada bloco
+            from pdfminer.pdftypes import resolve1
+
+            self.pdf = pdfplumber.open(caminho, pages=[1])
+            self.total = int(resolve1(resolve1(self.pdf.doc.catalog['Pages'])['Count']))
+        else:
+            self.pdf = pdfplumber.open(caminho)
+            self.total = len(self.pdf.pages)
+
+    def obter(self, numero):
+        if not self.janela:
+            return self.pdf.pages[numero]
+
+        import pdfplumber
+
+        if self.bloco is None or numero not in self.bloco[0]:
+            self.fechar_bloco()
+            numeros = range(numero, min(numero + self.janela, self.total))
+            self.bloco = (numeros, pdfplumber.open(
+                self.caminho, pages=range(numeros.start + 1, numeros.stop + 1)))
+        numeros, pdf = self.bloco
+        return pdf.pages[numero - numeros.start]
+
+    @contextmanager
+    def pagina(self, numero):
+        """
+        Página `numero` (a partir de 0), liberada ao fim do bloco with
+        """
+        page = self.obter(numero)
+        try:
+            yield page
+        finally:
+            page.close()
+
+    def fechar_bloco(self):
+        if self.bloco is not None:
+            self.bloco[1].close()
+            self.bloco = None
+            gc.collect()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *erro):
+        self.fechar_bloco()
+        self.pdf.close()
+
+
+class ExecutorLocal:
+    """
+    Roda funcao(page, *argumentos) no próprio processo; só isola os erros
+    """
+
+    def __init__(self, documento):
+        self.documento = documento
+
+    def executar(self, numero, funcao, *argumentos):
+        try:
+            with self.documento.pagina(numero) as page:
+                return funcao(page, *argumentos)
+        except Exception as e:
+            raise PaginaIgnorada(f'{type(e).__name__}: {e}') from e
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *erro):
+        pass
+
+
+def limitar_memoria(megabytes):
+    """
+    Limita a memória virtual deste processo ao uso atual mais `megabytes` (só Unix)
+    """
+    try:
+        import resource
+    except ImportError:
+        return
+    try:
+        with open('/proc/self/statm') as arquivo:
+            atual = int(arquivo.read().split()[0]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        return
+    _, maximo = resource.getrlimit(resource.RLIMIT_AS)
+    limite = atual + megabytes * 1024 * 1024
+    if maximo != resource.RLIM_INFINITY:
+        limite = min(limite, maximo)
+    resource.setrlimit(resource.RLIMIT_AS, (limite, maximo))
+
+
+def trabalhador(conexao, caminho, memoria):
+    """
+    Processo das páginas: recebe (numero, funcao, argumentos) e responde (situacao, valor)
+    situacao: 'ok', 'erro' ou 'memoria' (e então o processo termina); 'pronto' ao abrir o PDF
+    """
+    with DocumentoPdf(caminho) as documento:
+        limitar_memoria(memoria)
+        conexao.send(('pronto', documento.total))
+        while True:
+            try:
+                pedido = conexao.recv()
+            except EOFError:
+                break
+            if pedido is None:
+                break
+
+            numero, funcao, argumentos = pedido
+            try:
+                with documento.pagina(numero) as page:
+                    resposta = ('ok', funcao(page, *argumentos))
+            except MemoryError:
+                # Depois de um MemoryError o processo não é mais confiável
+                conexao.send(('memoria', f'passou de {memoria} MB de memória'))
+                break
+            except Exception as e:
+                resposta = ('erro', f'{type(e).__name__}: {e}')
+            conexao.send(resposta)
+
+
+class ExecutorProcesso:
+    """
+    Roda funcao(page, *argumentos) num processo supervisionado
+
+    O processo é encerrado (e recriado na página seguinte) quando uma página
+    passa do tempo, da memória ou derruba o processo; com janela, também a
+    cada janela páginas. Se não for possível criar o processo, as páginas
+    rodam no próprio processo (ExecutorLocal)
+    """
+
+    def __init__(self, documento, tempo=None, memoria=None):
+        self.documento = documento
+        self.tempo = tempo or float(os.environ.get('MEGAFARMA_PDF_TEMPO_PAGINA') or TEMPO_PAGINA)
+        self.memoria = memoria or int(os.environ.get('MEGAFARMA_PDF_MEMORIA_PAGINA')
+                                      or MEMORIA_PAGINA)
+        self.processo = None
+        self.conexao = None
+        self.lidas = 0
+        self.local = None
+
+    def iniciar(self):
+        contexto = multiprocessing.get_context('spawn')
+        self.conexao, filho = contexto.Pipe()
+        self.processo = contexto.Process(target=trabalhador, daemon=True,
+                                         args=(filho, self.documento.caminho, self.memoria))
+        self.processo.start()
+        filho.close()
+        self.lidas = 0
+        # A partida do processo (importar o pdfplumber, abrir o PDF) não conta no tempo da página
+        try:
+            pronto = (self.conexao.poll(self.tempo + TEMPO_PARTIDA)
+                      and self.conexao.recv()[0] == 'pronto')
+        except (EOFError, OSError):
+            pronto = False
+        if not pronto:
+            # Como as falhas de criação: executar() passa para o ExecutorLocal,
+            # em vez de tentar de novo (e esperar a partida) a cada página
+            self.processo.kill()
+            self.encerrar()
+            raise RuntimeError('o processo das páginas não iniciou')
+
+    def encerrar(self):
+        if self.processo is None:
+            return
+        if self.processo.is_alive():
+            try:
+                self.conexao.send(None)
+            except OSError:
+                pass
+            self.processo.join(1)
+            if self.processo.is_alive():
+                self.processo.kill()
+                self.processo.join()
+        self.conexao.close()
+        self.processo = None
+
+    def executar(self, numero, funcao, *argumentos):
+        if self.local is not None:
+            return self.local.executar(numero, funcao, *argumentos)
+        if self.processo is None:
+            try:
+                self.iniciar()
+            except (OSError, RuntimeError, AssertionError) as e:
+                # RuntimeError: script sem "if __name__ == '__main__'" ou processo
+                # que não ficou pronto;
+                # AssertionError: processos daemon não podem criar processos
+                log.warning("Sem processo para as páginas do PDF (%s): extraindo no próprio "
+                            "processo", e)
+                self.local = ExecutorLocal(self.documento)
+                return self.local.executar(numero, funcao, *argumentos)
+
+        try:
+            self.conexao.send((numero, funcao, argumentos))
+            if not self.conexao.poll(self.tempo):
+                self.processo.kill()
+                self.encerrar()
+                raise PaginaIgnorada(f'passou de {self.tempo:g} s')
+            situacao, valor = self.conexao.recv()
+        except (EOFError, OSError):
+            self.processo.join(1)
+            codigo = self.processo.exitcode
+            self.encerrar()
+            raise PaginaIgnorada(f'processo da página encerrado (código {codigo})')
+
+        self.lidas += 1
+        if situacao == 'memoria' or (self.documento.janela
+                                     and self.lidas >= self.documento.janela):
+            self.encerrar()
+        if situacao != 'ok':
+            raise PaginaIgnorada(valor)
+        return valor
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *erro):
+        self.encerrar()
+
+
+def criar_executor(documento, isolamento=None):
+    """
+    Executor das páginas conforme MEGAFARMA_PDF_ISOLAMENTO (processo, o padrão, ou local)
+    """
+    isolamento = isolamento or os.environ.get('MEGAFARMA_PDF_ISOLAMENTO') or 'processo'
+    if isolamento == 'local':
+        return ExecutorLocal(documento)
+    return ExecutorProcesso(documento)
@@ -0,0 +1,376 @@
+# -*- coding: utf-8 -*-
+"""
+Pasta monitorada: importa sozinho cada PDF TOUREIRO salvo numa pasta
+
+As listas chegam por e-mail e são salvas numa pasta compartilhada. Em vez de
+enviar cada uma pelo /upload_pdf, o monitor acompanha a pasta (inotify no
+Linux, varredura periódica nos outros sistemas) e importa os PDFs novos:
+
+- um arquivo só é lido depois de MEGAFARMA_PASTA_ESPERA segundos (padrão 2)
+  sem mudar de tamanho nem de data, para não pegar uma cópia pela metade
+- o SHA-256 de cada PDF importado fica na tabela pdfs_importados: o mesmo
+  conteúdo (mesmo com outro nome) não é importado de novo
+- no máximo MEGAFARMA_PASTA_IMPORTACOES PDFs (padrão 1) são extraídos ao mesmo tempo
+
+Uso: python -m api.pasta_monitorada [PASTA] [--espera S] [--intervalo S] [--importacoes N]
+A pasta padrão é MEGAFARMA_PASTA_MONITORADA ou uploads/entrada. O servidor
+(python -m api.servidor --pasta-monitorada PASTA) também pode rodar o monitor
+"""
+
+import argparse
+import ctypes
+import ctypes.util
+import hashlib
+import logging
+import multiprocessing
+import os
+import select
+import struct
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+log = logging.getLogger(__name__)
+
+ESPERA = 2.0
+INTERVALO = 1.0
+IMPORTACOES = 1
+TAMANHO_BLOCO = 1024 * 1024
+
+# Eventos do inotify (linux/inotify.h)
+IN_MODIFY = 0x2
+IN_ATTRIB = 0x4
+IN_CLOSE_WRITE = 0x8
+IN_MOVED_TO = 0x80
+IN_CREATE = 0x100
+IN_DELETE_SELF = 0x400
+IN_MOVE_SELF = 0x800
+IN_Q_OVERFLOW = 0x4000
+IN_IGNORED = 0x8000
+EVENTOS_ARQUIVO = IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+EVENTOS_PASTA = IN_DELETE_SELF | IN_MOVE_SELF | IN_IGNORED
+# struct inotify_event: wd, mask, cookie, len (seguido do nome com len bytes)
+EVENTO = struct.Struct('iIII')
+
+
+def criar_tabela_pdfs_importados(conn):
+    """
+    Cria a tabela com o SHA-256 dos PDFs já importados pela pasta monitorada
+    """
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS pdfs_importados (
+            sha256 TEXT PRIMARY KEY,
+            nome TEXT NOT NULL,
+            produtos INTEGER NOT NULL,
+            importado_em BIGINT NOT NULL
+        )
+    ''')
+
+
+def pasta_padrao():
+    from api.banco import get_base_path
+
+    return (os.environ.get('MEGAFARMA_PASTA_MONITORADA')
+            or os.path.join(get_base_path(), 'uploads', 'entrada'))
+
+
+def eh_pdf(nome):
+    # Ocultos e temporários de cópia (~$arquivo.pdf) ficam de fora
+    return nome.lower().endswith('.pdf') and not nome.startswith(('.', '~'))
+
+
+def assinatura(caminho):
+    """
+    (tamanho, data de modificação) do arquivo, ou None se ele não existe mais
+    """
+    try:
+        estado = os.stat(caminho)
+    except OSError:
+        return None
+    return estado.st_size, estado.st_mtime_ns
+
+
+def sha256_do_arquivo(caminho):
+    resumo = hashlib.sha256()
+    with open(caminho, 'rb') as arquivo:
+        for bloco in iter(lambda: arquivo.read(TAMANHO_BLOCO), b''):
+            resumo.update(bloco)
+    return resumo.hexdigest()
+
+
+def pdf_ja_importado(sha256):
+    from api.banco import conectar
+
+    conn = conectar()
+    try:
+        cursor = conn.cursor()
+        cursor.execute('SELECT 1 FROM pdfs_importados WHERE sha256 = ?', (sha256,))
+        return cursor.fetchone() is not None
+    finally:
+        conn.close()
+
+
+def registrar_pdf_importado(sha256, nome, produtos):
+    from api.banco import conectar
+
+    conn = conectar()
+    try:
+        conn.execute('''
+            INSERT OR IGNORE INTO pdfs_importados (sha256, nome, produtos, importado_em)
+            VALUES (?, ?, ?, ?)
+        ''', (sha256, nome, produtos, int(time.time())))
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def importar_pdf(caminho):
+    """
+    Importa o PDF TOUREIRO como o /upload_pdf; devolve a quantidade de produtos
+    """
+    from api.rotas.importacao import importar_toureiro
+
+    quantidade, ignoradas = importar_toureiro(caminho)
+    if ignoradas:
+        log.warning("%s: %d página(s) não puderam ser lidas", os.path.basename(caminho),
+                    len(ignoradas), extra={'dados': {'paginas_ignoradas': ignoradas}})
+    return quantidade
+
+
+class ObservadorInotify:
+    """
+    Nomes dos arquivos criados, gravados ou movidos para a pasta (só Linux)
+    """
+
+    def __init__(self, pasta):
+        nome_libc = ctypes.util.find_library('c')
+        if not sys.platform.startswith('linux') or not nome_libc:
+            raise OSError('inotify existe só no Linux')
+        libc = ctypes.CDLL(nome_libc, use_errno=True)
+        self.pasta = pasta
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            numero = ctypes.get_errno()
+            raise OSError(numero, os.strerror(numero))
+        if libc.inotify_add_watch(self.fd, os.fsencode(pasta), EVENTOS_ARQUIVO | EVENTOS_PASTA) < 0:
+            numero = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(numero, os.strerror(numero), pasta)
+
+    def esperar(self, tempo):
+        """
+        Nomes com eventos em até `tempo` segundos; None quando é preciso varrer a pasta
+        """
+        prontos, _, _ = select.select([self.fd], [], [], tempo)
+        if not prontos:
+            return set()
+        try:
+            dados = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return set()
+
+        nomes = set()
+        posicao = 0
+        while posicao < len(dados):
+            _, mascara, _, tamanho = EVENTO.unpack_from(dados, posicao)
+            posicao += EVENTO.size
+            nome = dados[posicao:posicao + tamanho].rstrip(b'\0')
+            posicao += tamanho
+            if mascara & IN_Q_OVERFLOW:
+                # Eventos perdidos: a pasta inteira é conferida de novo
+                return None
+            if mascara & EVENTOS_PASTA:
+                raise OSError(f'a pasta {self.pasta} foi removida ou movida')
+            if nome:
+                nomes.add(os.fsdecode(nome))
+        return nomes
+
+    def fechar(self):
+        os.close(self.fd)
+
+
+class ObservadorVarredura:
+    """
+    Sem inotify (Windows, macOS): a pasta inteira é conferida a cada `tempo` segundos
+    """
+
+    def __init__(self, pasta, parado):
+        self.pasta = pasta
+        self.parado = parado
+
+    def esperar(self, tempo):
+        self.parado.wait(tempo)
+        return None
+
+    def fechar(self):
+        pass
+
+
+class MonitorPasta:
+    """
+    Acompanha a pasta numa thread e importa os PDFs prontos num pool de threads
+
+    Cada nome com evento (ou, na varredura, cada PDF da pasta) cuja assinatura
+    mudou fica pendente até passar `espera` segundos sem mudar; só então o
+    arquivo é lido, o SHA-256 conferido e o PDF importado
+    """
+
+    def __init__(self, pasta=None, espera=None, intervalo=None, importacoes=None, importar=None):
+        self.pasta = os.path.abspath(pasta or pasta_padrao())
+        self.espera = espera or float(os.environ.get('MEGAFARMA_PASTA_ESPERA') or ESPERA)
+        self.intervalo = intervalo or INTERVALO
+        self.importacoes = importacoes or int(os.environ.get('MEGAFARMA_PASTA_IMPORTACOES')
+                                              or IMPORTACOES)
+        self.importar = importar or importar_pdf
+        self.parado = threading.Event()
+        # nome -> (assinatura, instante da última mudança)
+        self.pendentes = {}
+        # nome -> assinatura já enviada para importação
+        self.conhecidos = {}
+        # SHA-256 sendo importados (duas cópias do mesmo arquivo ao mesmo tempo)
+        self.em_andamento = set()
+        self.trava = threading.Lock()
+        self.thread = None
+        self.pool = None
+
+    def criar_observador(self):
+        try:
+            observador = ObservadorInotify(self.pasta)
+            log.info("Pasta monitorada (inotify): %s", self.pasta)
+        except (OSError, AttributeError) as e:
+            observador = ObservadorVarredura(self.pasta, self.parado)
+            log.info("Pasta monitorada (varredura a cada %g s, %s): %s", self.intervalo, e,
+                     self.pasta)
+        return observador
+
+    def listar(self):
+        try:
+            return os.listdir(self.pasta)
+        except OSError as e:
+            log.warning("Não foi possível ler a pasta monitorada %s: %s", self.pasta, e)
+            return []
+
+    def anotar(self, nome):
+        if not eh_pdf(nome):
+            return
+        atual = assinatura(os.path.join(self.pasta, nome))
+        if atual is None:
+            self.pendentes.pop(nome, None)
+        elif atual != self.conhecidos.get(nome):
+            anterior = self.pendentes.get(nome)
+            if anterior is None or anterior[0] != atual:
+                self.pendentes[nome] = (atual, time.monotonic())
+
+    def conferir_pendentes(self):
+        agora = time.monotonic()
+        for nome, (anterior, desde) in list(self.pendentes.items()):
+            atual = assinatura(os.path.join(self.pasta, nome))
+            if atual is None:
+                del self.pendentes[nome]
+            elif atual != anterior:
+                # Ainda sendo gravado: a espera recomeça
+                self.pendentes[nome] = (atual, agora)
+            elif agora - desde >= self.espera:
+                del self.pendentes[nome]
+                self.conhecidos[nome] = atual
+                self.pool.submit(self.processar, nome)
+
+    def executar(self):
+        observador = self.criar_observador()
+        try:
+            # A primeira volta confere a pasta inteira (PDFs salvos com o monitor parado)
+            nomes = None
+            while not self.parado.is_set():
+                for nome in (self.listar() if nomes is None else nomes):
+                    self.anotar(nome)
+                self.conferir_pendentes()
+                # Com arquivos pendentes, acorda a tempo de conferir a espera
+                tempo = min(self.intervalo, self.espera) if self.pendentes else self.intervalo
+                nomes = observador.esperar(tempo)
+        except OSError as e:
+            log.error("Pasta monitorada parada: %s", e)
+        finally:
+            observador.fechar()
+
+    def processar(self, nome):
+        caminho = os.path.join(self.pasta, nome)
+        try:
+            sha256 = sha256_do_arquivo(caminho)
+        except OSError as e:
+            log.warning("Não foi possível ler %s: %s", nome, e)
+            return
+
+        with self.trava:
+            if sha256 in self.em_andamento:
+                log.info("%s: mesmo conteúdo de um PDF sendo importado, ignorado", nome)
+                return
+            self.em_andamento.add(sha256)
+        try:
+            if pdf_ja_importado(sha256):
+                log.info("%s: PDF já importado, ignorado", nome, extra={'dados': {
+                    'sha256': sha256}})
+                return
+            inicio = time.perf_counter()
+            quantidade = self.importar(caminho)
+            if not quantidade:
+                log.warning("%s: não foi possível extrair dados do PDF", nome)
+                return
+            registrar_pdf_importado(sha256, nome, quantidade)
+            log.info("%s: %d produtos importados da pasta monitorada", nome, quantidade,
+                     extra={'dados': {'sha256': sha256,
+                                      'segundos': round(time.perf_counter() - inicio, 2)}})
+        except Exception:
+            log.exception("Erro ao importar %s da pasta monitorada", nome)
+        finally:
+            with self.trava:
+                self.em_andamento.discard(sha256)
+
+    def iniciar(self):
+        os.makedirs(self.pasta, exist_ok=True)
+        self.pool = ThreadPoolExecutor(max_workers=self.importacoes,
+                                       thread_name_prefix='importacao-pasta')
+        self.thread = threading.Thread(target=self.executar, name='pasta-monitorada', daemon=True)
+        self.thread.start()
+        return self
+
+    def parar(self):
+        """
+        Para de observar e espera as importações em andamento
+        """
+        self.parado.set()
+        if self.thread is not None:
+            self.thread.join()
+        if self.pool is not None:
+            self.pool.shutdown(wait=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('pasta', nargs='?', help='padrão: MEGAFARMA_PASTA_MONITORADA ou '
+                                                 'uploads/entrada')
+    parser.add_argument('--espera', type=float, help='segundos sem mudança antes de importar')
+    parser.add_argument('--intervalo', type=float, help='segundos entre varreduras (sem inotify)')
+    parser.add_argument('--importacoes', type=int, help='PDFs importados ao mesmo tempo')
+    opcoes = parser.parse_args(argv)
+
+    from api.registro import configurar_registro
+    configurar_registro()
+    from api.banco import init_db
+    init_db()
+
+    monitor = MonitorPasta(opcoes.pasta, opcoes.espera, opcoes.intervalo,
+                           opcoes.importacoes).iniciar()
+    try:
+        while monitor.thread.is_alive():
+            monitor.thread.join(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        monitor.parar()
+
+
+if __name__ == '__main__':
+    # Os processos das páginas do PDF (spawn) reentram por aqui
+    multiprocessing.freeze_support()
+    main()
@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+"""
+Registro (logging) da aplicação: níveis, formato texto ou JSON e amostragem
+
+Cada módulo usa log = logging.getLogger(__name__) e dados estruturados em
+extra={'dados': {...}}. O nível vem de MEGAFARMA_LOG_NIVEL (padrão INFO) e
+o formato de MEGAFARMA_LOG_FORMATO (texto ou json). Mensagens dentro de
+laços (uma por produto, por página) são DEBUG: desligadas por padrão e,
+quando ligadas, podem ser amostradas com MEGAFARMA_LOG_AMOSTRA=N (1 a cada N)
+"""
+
+import json
+import logging
+import os
+import sys
+import threading
+from datetime import datetime, timezone
+
+NIVEL_PADRAO = 'INFO'
+FORMATOS = ('texto', 'json', 'simples')
+
+trava_configuracao = threading.Lock()
+configurado = False
+
+
+def formatar_dados(dados):
+    return ' '.join(f'{chave}={valor}' for chave, valor in dados.items())
+
+
+class FormatoTexto(logging.Formatter):
+    """
+    "data nível módulo: mensagem chave=valor ..."
+    """
+
+    def __init__(self):
+        super().__init__('%(asctime)s %(levelname)s %(name)s: %(message)s')
+
+    def format(self, record):
+        texto = super().format(record)
+        dados = getattr(record, 'dados', None)
+        if dados:
+            texto += ' | ' + formatar_dados(dados)
+        return texto
+
+
+class FormatoSimples(logging.Formatter):
+    """
+    Só a mensagem (ferramentas de linha de comando, como debug_pdf.py)
+    """
+
+    def format(self, record):
+        texto = super().format(record)
+        dados = getattr(record, 'dados', None)
+        return f'{texto} | {formatar_dados(dados)}' if dados else texto
+
+
+class FormatoJSON(logging.Formatter):
+    """
+    Um objeto JSON por linha (agregadores de log, Vercel)
+    """
+
+    def format(self, record):
+        registro = {
+            'momento': datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            'nivel': record.levelname,
+            'modulo': record.name,
+            'mensagem': record.getMessage(),
+        }
+        registro.update(getattr(record, 'dados', None) or {})
+        if record.exc_info:
+            registro['excecao'] = self.formatException(record.exc_info)
+        return json.dumps(registro, ensure_ascii=False, default=str)
+
+
+class Amostragem:
+    """
+    Registra 1 de cada `a_cada` chamadas (mensagens de laços quentes)
+    """
+
+    def __init__(self, log, a_cada=None):
+        self.log = log
+        self.a_cada = max(1, a_cada or int(os.environ.get('MEGAFARMA_LOG_AMOSTRA', 1)))
+        self.chamadas = 0
+        # Conferido uma vez: com DEBUG desligado o laço não paga nada além do if
+        self.ativa = log.isEnabledFor(logging.DEBUG)
+
+    def debug(self, mensagem, *argumentos):
+        if not self.ativa:
+            return
+        if self.chamadas % self.a_cada == 0:
+            self.log.debug(mensagem, *argumentos)
+        self.chamadas += 1
+
+
+def configurar_registro(nivel=None, formato=None):
+    """
+    Configura o registro do processo uma única vez (chamadas seguintes são ignoradas)
+    Se o ambiente já tiver handlers (gunicorn, Vercel), só ajusta o nível do pacote api
+    """
+    global configurado
+    with trava_configuracao:
+        if configurado:
+            return
+        configurado = True
+
+        nivel = (nivel or os.environ.get('MEGAFARMA_LOG_NIVEL') or NIVEL_PADRAO).upper()
+        # Nome desconhecido: getLevelName devolve o texto "Level X", não um número
+        # (getLevelNamesMapping só existe a partir do Python 3.11)
+        nivel_invalido = not isinstance(logging.getLevelName(nivel), int)
+        if nivel_invalido:
+            nivel_invalido, nivel = nivel, NIVEL_PADRAO
+        formato = formato or os.environ.get('MEGAFARMA_LOG_FORMATO') or 'texto'
+        if formato not in FORMATOS:
+            formato = 'texto'
+
+        raiz = logging.getLogger()
+        if not raiz.handlers:
+            saida = logging.StreamHandler(sys.stderr)
+            saida.setFormatter({'texto': FormatoTexto, 'json': FormatoJSON,
+                                'simples': FormatoSimples}[formato]())
+            raiz.addHandler(saida)
+            # DEBUG só para a aplicação: pdfminer e afins registram cada objeto do PDF
+            raiz.setLevel(max(logging.INFO, logging.getLevelName(nivel)))
+        logging.getLogger('api').setLevel(nivel)
+        if nivel_invalido:
+            logging.getLogger(__name__).warning(
+                "Nível de registro desconhecido (%s): usando %s", nivel_invalido, NIVEL_PADRAO)
@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+"""
+Blueprints da aplicação (importação, preços, relatórios e manutenção)
+
+As regras de URL são registradas na criação do app, mas o módulo com as
+views de cada blueprint só é importado na primeira requisição a uma de suas
+rotas. Assim a partida (Vercel, executável) carrega só o Flask e o banco
+"""
+
+from threading import Lock
+
+from flask import Blueprint
+from werkzeug.utils import import_string
+
+# blueprint: [(regra, função, métodos)] — funções do módulo api.rotas.<blueprint>
+ROTAS = {
+    'precos': [
+        ('/', 'index', ['GET']),
+        ('/dados_tabela', 'dados_tabela', ['GET']),
+        ('/criar_fornecedor', 'criar_fornecedor', ['POST']),
+        ('/atualizar_preco', 'atualizar_preco', ['POST']),
+        ('/condicoes_fornecedor', 'condicoes_fornecedor', ['POST']),
+        ('/excluir_fornecedor', 'excluir_fornecedor', ['POST']),
+        ('/excluir_tabela', 'excluir_tabela', ['POST']),
+        ('/buscar', 'buscar', ['GET']),
+        ('/historico_precos/<int:produto_id>', 'historico_precos', ['GET']),
+        ('/variacoes_preco', 'variacoes_de_preco', ['GET']),
+        ('/analise', 'analise', ['GET']),
+        ('/cotacoes', 'cotacoes', ['GET']),
+        ('/cotacoes', 'registrar_cotacao_atual', ['POST']),
+        ('/cotacoes/comparar', 'alteracoes_entre_cotacoes', ['GET']),
+    ],
+    'importacao': [
+        ('/upload_pdf', 'upload_pdf', ['POST']),
+        ('/importar_precos_fornecedor', 'importar_precos_fornecedor', ['POST']),
+        ('/upload_partes', 'iniciar_upload_partes', ['POST']),
+        ('/upload_partes/<upload_id>', 'situacao_upload_partes', ['GET']),
+        ('/upload_partes/<upload_id>', 'enviar_parte', ['PUT']),
+        ('/upload_partes/<upload_id>/concluir', 'concluir_upload_partes', ['POST']),
+    ],
+    'relatorios': [
+        ('/gerar_relatorio', 'gerar_relatorio', ['POST']),
+        ('/exportar_tabela_pdf', 'exportar_tabela_pdf', ['POST']),
+        ('/relatorio_melhores_precos', 'relatorio_melhores_precos', ['POST']),
+        ('/gerar_pdf_pedido', 'gerar_pdf_pedido', ['POST']),
+        ('/otimizar_pedido', 'otimizar_pedido', ['POST']),
+        ('/exportar_tabela/<formato>', 'exportar_tabela', ['GET']),
+        ('/exportar_melhores_precos/<formato>', 'exportar_melhores_precos', ['GET']),
+    ],
+    'manutencao': [
+        ('/manutencao', 'relatorio_manutencao', ['GET']),
+        ('/manutencao', 'executar_manutencao_banco', ['POST']),
+    ],
+}
+
+trava_importacao = Lock()
+
+
+class ViewTardia:
+    """
+    View que importa a função real (módulo:função) só quando é chamada
+    """
+
+    def __init__(self, nome_importacao):
+        self.nome_importacao = nome_importacao
+        self.__module__, self.__name__ = nome_importacao.rsplit('.', 1)
+        self.funcao = None
+
+    def carregar(self):
+        if self.funcao is None:
+            with trava_importacao:
+                if self.funcao is None:
+                    self.funcao = import_string(self.nome_importacao)
+        return self.funcao
+
+    def __call__(self, *args, **kwargs):
+        return self.carregar()(*args, **kwargs)
+
+
+def criar_blueprint(nome):
+    blueprint = Blueprint(nome, __name__)
+    for regra, funcao, metodos in ROTAS[nome]:
+        blueprint.add_url_rule(regra, endpoint=funcao, methods=metodos,
+                               view_func=ViewTardia(f'{__name__}.{nome}.{funcao}'))
+    return blueprint
+
+
+def registrar_blueprints(app):
+    for nome in ROTAS:
+        app.register_blueprint(criar_blueprint(nome))
@@ -0,0 +1,215 @@
+# -*- coding: utf-8 -*-
+"""
+Rotas de importação: PDF TOUREIRO e listas de preços dos fornecedores
+"""
+
+import logging
+import os
+import threading
+
+from flask import current_app, jsonify, request
+from werkzeug.utils import secure_filename
+
+from api.armazenamento import inserir
+from api.banco import conectar
+from api.cotacoes import registrar_cotacao
+from api.extracao_pdf import extrair_dados_pdf
+from api.historico_precos import registrar_precos
+from api.importacao_fornecedor import (casar_linhas, gravar_precos, ler_lista_fornecedor,
+                                       EXTENSOES_SUPORTADAS)
+from api.upload_partes import (ErroUpload, concluir_upload, consultar_upload, gravar_parte,
+                               iniciar_upload)
+
+log = logging.getLogger(__name__)
+
+trava_gravacao = threading.Lock()
+
+
+def upload_pdf():
+    """
+    Processa upload do PDF TOUREIRO e extrai dados
+    """
+    if 'pdf_file' not in request.files:
+        return jsonify({'error': 'Nenhum arquivo selecionado'}), 400
+
+    file = request.files['pdf_file']
+    if file.filename == '':
+        return jsonify({'error': 'Nenhum arquivo selecionado'}), 400
+
+    if file and file.filename.lower().endswith('.pdf'):
+        filename = secure_filename(file.filename)
+        filepath = os.path.join(current_app.config['UPLOAD_FOLDER'], filename)
+        file.save(filepath)
+        return importar_pdf_toureiro(filepath)
+
+    return jsonify({'error': 'Arquivo deve ser um PDF'}), 400
+
+
+def importar_pdf_toureiro(filepath):
+    """
+    Extrai o PDF já gravado em uploads/ e substitui os produtos
+    O arquivo é removido também quando a extração falha
+    """
+    try:
+        quantidade, ignoradas = importar_toureiro(filepath)
+    finally:
+        # Remover arquivo temporário
+        os.remove(filepath)
+
+    if not quantidade:
+        return jsonify({'error': 'Não foi possível extrair dados do PDF',
+                        'paginas_ignoradas': ignoradas}), 400
+
+    mensagem = f'{quantidade} produtos importados com sucesso!'
+    if ignoradas:
+        mensagem += f' {len(ignoradas)} página(s) não puderam ser lidas.'
+    return jsonify({
+        'success': True,
+        'message': mensagem,
+        'paginas_ignoradas': ignoradas
+    })
+
+
+def importar_toureiro(filepath):
+    """
+    Extrai o PDF TOUREIRO e substitui os produtos (também usada pela pasta monitorada)
+    Retorna (quantidade de produtos, páginas ignoradas); sem produtos, o banco não muda
+    """
+    # Extrair dados do PDF (páginas com erro ou que passam do tempo são ignoradas)
+    relatorio = {}
+    produtos = extrair_dados_pdf(filepath, relatorio=relatorio)
+    ignoradas = relatorio.get('paginas_ignoradas', [])
+    if not produtos:
+        return 0, ignoradas
+
+    # As extrações podem rodar em paralelo; a troca dos produtos, uma por vez
+    with trava_gravacao:
+        conn = conectar()
+        cursor = conn.cursor()
+        # A tabela substituída continua consultável como cotação
+        registrar_cotacao(conn, 'toureiro')
+        # Limpar tabela de produtos existentes (preços primeiro, pela chave estrangeira)
+        cursor.execute('DELETE FROM precos_fornecedores')
+        cursor.execute('DELETE FROM produtos')
+
+        # Inserir novos produtos
+        precos_toureiro = {}
+        for produto in produtos:
+            produto_id = inserir(
+                cursor,
+                'INSERT INTO produtos (descricao, preco_toureiro, codigo) VALUES (?, ?, ?)',
+                (produto['descricao'], produto['preco'], produto['codigo'])
+            )
+            precos_toureiro[produto_id] = produto['preco']
+
+        registrar_precos(conn, None, precos_toureiro, 'toureiro')
+
+        conn.commit()
+        conn.close()
+    return len(produtos), ignoradas
+
+
+def iniciar_upload_partes():
+    """
+    Cria um upload em partes: {nome, tamanho, sha256 opcional} -> {id, recebido, tamanho_parte}
+    """
+    dados = request.get_json(silent=True) or {}
+    try:
+        return jsonify(iniciar_upload(current_app.config['UPLOAD_FOLDER'], dados.get('nome'),
+                                      dados.get('tamanho'), dados.get('sha256'))), 201
+    except ErroUpload as e:
+        return jsonify({'error': str(e)}), e.status
+
+
+def situacao_upload_partes(upload_id):
+    """
+    Quantos bytes do upload já chegaram (o cliente retoma a partir daí)
+    """
+    try:
+        return jsonify(consultar_upload(current_app.config['UPLOAD_FOLDER'], upload_id))
+    except ErroUpload as e:
+        return jsonify({'error': str(e)}), e.status
+
+
+def enviar_parte(upload_id):
+    """
+    Grava uma parte: corpo com os bytes, cabeçalhos Upload-Offset e X-Parte-SHA256 (opcional)
+    """
+    try:
+        return jsonify(gravar_parte(current_app.config['UPLOAD_FOLDER'], upload_id,
+                                    request.headers.get('Upload-Offset', type=int), request.stream,
+                                    request.content_length, request.headers.get('X-Parte-SHA256')))
+    except ErroUpload as e:
+        return jsonify({'error': str(e)}), e.status
+
+
+def concluir_upload_partes(upload_id):
+    """
+    Confere o arquivo montado e importa o PDF, como o /upload_pdf
+    """
+    try:
+        filepath = concluir_upload(current_app.config['UPLOAD_FOLDER'], upload_id)
+    except ErroUpload as e:
+        return jsonify({'error': str(e)}), e.status
+    return importar_pdf_toureiro(filepath)
+
+
+def importar_precos_fornecedor():
+    """
+    Importa em lote a lista de preços de um fornecedor (CSV, XLSX ou PDF)
+    Casa as linhas com os produtos por código, descrição ou similaridade e grava
+    tudo em uma única transação. Com simular=1 apenas devolve o relatório de
+    casamento; com aproximado=0 desliga o casamento por similaridade
+    """
+    if 'arquivo' not in request.files or request.files['arquivo'].filename == '':
+        return jsonify({'error': 'Nenhum arquivo selecionado'}), 400
+
+    fornecedor_id = request.form.get('fornecedor_id', type=int)
+    if not fornecedor_id:
+        return jsonify({'error': 'ID do fornecedor é obrigatório'}), 400
+
+    file = request.files['arquivo']
+    if not file.filename.lower().endswith(EXTENSOES_SUPORTADAS):
+        return jsonify({'error': 'Arquivo deve ser CSV, XLSX ou PDF'}), 400
+
+    simular = request.form.get('simular') in ('1', 'true')
+    aproximado = request.form.get('aproximado', '1') in ('1', 'true')
+
+    conn = conectar()
+    filepath = os.path.join(current_app.config['UPLOAD_FOLDER'], secure_filename(file.filename))
+    file.save(filepath)
+
+    try:
+        cursor = conn.cursor()
+        cursor.execute('SELECT nome FROM fornecedores WHERE id = ?', (fornecedor_id,))
+        fornecedor = cursor.fetchone()
+        if not fornecedor:
+            return jsonify({'error': 'Fornecedor não encontrado'}), 404
+
+        precos, relatorio = casar_linhas(conn, ler_lista_fornecedor(filepath), aproximado)
+
+        if not simular and precos:
+            gravar_precos(conn, fornecedor_id, precos)
+
+        log.info("Importação %s: %d de %d linhas casadas", fornecedor[0], relatorio['casados'],
+                 relatorio['total_linhas'], extra={'dados': {
+                     'fornecedor_id': fornecedor_id, 'simulacao': simular,
+                     'produtos_atualizados': relatorio['produtos_atualizados']}})
+
+        return jsonify({
+            'success': True,
+            'simulacao': simular,
+            'message': f"{relatorio['produtos_atualizados']} preços importados para {fornecedor[0]}",
+            'relatorio': relatorio
+        })
+
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    except Exception as e:
+        log.exception("Erro ao importar lista do fornecedor")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+    finally:
+        conn.close()
+        os.remove(filepath)
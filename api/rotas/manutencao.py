@@ -0,0 +1,37 @@
+# -*- coding: utf-8 -*-
+"""
+Rotas de manutenção do banco SQLite: tamanho, fragmentação, cópia de segurança e vacuum
+"""
+
+import logging
+
+from flask import jsonify, request
+
+from api.manutencao import ErroManutencao, executar_manutencao, relatorio_atual
+
+log = logging.getLogger(__name__)
+
+
+def relatorio_manutencao():
+    """
+    Tamanho do banco e páginas livres; ?detalhes=1 inclui o espaço de cada tabela e índice
+    """
+    try:
+        return jsonify(relatorio_atual(request.args.get('detalhes') in ('1', 'true')))
+    except ErroManutencao as e:
+        return jsonify({'error': str(e)}), e.status
+
+
+def executar_manutencao_banco():
+    """
+    Roda a manutenção agora: cópia de segurança ({backup: false} para pular),
+    ANALYZE, PRAGMA optimize e vacuum incremental
+    """
+    dados = request.get_json(silent=True) or {}
+    try:
+        return jsonify(executar_manutencao(backup=dados.get('backup', True) is not False))
+    except ErroManutencao as e:
+        return jsonify({'error': str(e)}), e.status
+    except Exception as e:
+        log.exception("Erro na manutenção do banco")
+        return jsonify({'error': f'Erro na manutenção do banco: {str(e)}'}), 500
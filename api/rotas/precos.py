@@ -0,0 +1,447 @@
+# -*- coding: utf-8 -*-
+"""
+Rotas de preços: página principal, tabela, fornecedores, busca, histórico, análise e cotações
+As leituras da tabela aceitam ?cotacao=<id> para consultar uma cotação registrada
+"""
+
+import logging
+import math
+from datetime import datetime
+
+from flask import jsonify, render_template, request
+
+from api.armazenamento import IntegrityError, inserir, reiniciar_sequencias
+from api.banco import conectar
+from api.busca import buscar_produtos, LIMITE_PADRAO
+from api.cotacoes import (cotacao_pedida, comparar_cotacoes, listar_cotacoes, registrar_cotacao,
+                          sql_da_cotacao)
+from api.exportacao import formatos_disponiveis
+from api.historico_precos import (registrar_precos, produto_do_historico, historico_produto,
+                                  tendencia_produto, variacoes_preco, para_timestamp)
+from api.matriz_precos import analise_atual, resumo_analise, LIMITE_ITENS, ORDENACOES
+
+log = logging.getLogger(__name__)
+
+
+def index():
+    """
+    Página principal do sistema
+    """
+    return render_template('index.html', formatos_exportacao=formatos_disponiveis())
+
+
+def dados_tabela():
+    """
+    Retorna todos os dados para popular a tabela principal (ou os de uma cotação)
+    """
+    conn = conectar()
+    try:
+        cotacao = cotacao_pedida(conn, request.args.get('cotacao'))
+    except ValueError as e:
+        conn.close()
+        return jsonify({'error': str(e)}), 404
+    cursor = conn.cursor()
+
+    # Buscar produtos
+    cursor.execute(sql_da_cotacao(
+        'SELECT id, descricao, preco_toureiro FROM produtos ORDER BY descricao', cotacao))
+    produtos = cursor.fetchall()
+
+    # Buscar fornecedores
+    cursor.execute(sql_da_cotacao(
+        'SELECT id, nome, pedido_minimo, frete FROM fornecedores ORDER BY nome', cotacao))
+    fornecedores = cursor.fetchall()
+
+    # Buscar preços dos fornecedores
+    cursor.execute(sql_da_cotacao('''
+        SELECT produto_id, fornecedor_id, preco 
+        FROM precos_fornecedores
+    ''', cotacao))
+    precos = cursor.fetchall()
+
+    conn.close()
+
+    # Organizar dados
+    dados = {
+        'cotacao': cotacao,
+        'produtos': [{
+            'id': p[0],
+            'descricao': p[1],
+            'preco_toureiro': p[2]
+        } for p in produtos],
+        'fornecedores': [{
+            'id': f[0],
+            'nome': f[1],
+            'pedido_minimo': f[2] or 0,
+            'frete': f[3] or 0
+        } for f in fornecedores],
+        'precos': {}
+    }
+
+    # Organizar preços por produto e fornecedor
+    for produto_id, fornecedor_id, preco in precos:
+        if produto_id not in dados['precos']:
+            dados['precos'][produto_id] = {}
+        dados['precos'][produto_id][fornecedor_id] = preco
+
+    return jsonify(dados)
+
+
+def criar_fornecedor():
+    """
+    Cria um novo fornecedor
+    """
+    data = request.get_json()
+    nome_fornecedor = data.get('nome', '').strip()
+
+    if not nome_fornecedor:
+        return jsonify({'error': 'Nome do fornecedor é obrigatório'}), 400
+
+    conn = conectar()
+    cursor = conn.cursor()
+
+    try:
+        # Conferir antes de inserir: no PostgreSQL um INSERT recusado consome um ID
+        cursor.execute('SELECT 1 FROM fornecedores WHERE nome = ?', (nome_fornecedor,))
+        if cursor.fetchone():
+            raise IntegrityError('Fornecedor já existe')
+
+        fornecedor_id = inserir(
+            cursor, 'INSERT INTO fornecedores (nome) VALUES (?)', (nome_fornecedor,))
+        conn.commit()
+        conn.close()
+
+        return jsonify({
+            'success': True,
+            'fornecedor_id': fornecedor_id,
+            'nome': nome_fornecedor
+        })
+    except IntegrityError:
+        conn.close()
+        return jsonify({'error': 'Fornecedor já existe'}), 400
+
+
+def atualizar_preco():
+    """
+    Atualiza o preço de um produto para um fornecedor específico
+    """
+    data = request.get_json()
+    produto_id = data.get('produto_id')
+    fornecedor_id = data.get('fornecedor_id')
+    preco = data.get('preco')
+
+    if not all([produto_id, fornecedor_id, preco is not None]):
+        return jsonify({'error': 'Dados incompletos'}), 400
+
+    try:
+        preco = float(preco)
+    except (TypeError, ValueError):
+        return jsonify({'error': 'Preço inválido'}), 400
+
+    # float() aceita 'inf' e 'nan', que o histórico não converte em centavos
+    if not math.isfinite(preco):
+        return jsonify({'error': 'Preço inválido'}), 400
+
+    conn = conectar()
+    try:
+        cursor = conn.cursor()
+
+        # Inserir ou atualizar preço
+        cursor.execute('''
+            INSERT OR REPLACE INTO precos_fornecedores (produto_id, fornecedor_id, preco)
+            VALUES (?, ?, ?)
+        ''', (produto_id, fornecedor_id, preco))
+        registrar_precos(conn, fornecedor_id, {produto_id: preco}, 'manual')
+        conn.commit()
+    except Exception:
+        # Sem o rollback, a gravação pela metade segura o banco para as próximas
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+    return jsonify({'success': True})
+
+
+def condicoes_fornecedor():
+    """
+    Atualiza o pedido mínimo e o frete de um fornecedor (usados na otimização do pedido)
+    """
+    data = request.get_json()
+    fornecedor_id = data.get('fornecedor_id')
+
+    if not fornecedor_id:
+        return jsonify({'error': 'ID do fornecedor é obrigatório'}), 400
+
+    try:
+        pedido_minimo = float(data.get('pedido_minimo') or 0)
+        frete = float(data.get('frete') or 0)
+    except (TypeError, ValueError):
+        return jsonify({'error': 'Pedido mínimo ou frete inválido'}), 400
+
+    # float() aceita 'inf' e 'nan', que não são JSON válido na resposta
+    if not (math.isfinite(pedido_minimo) and math.isfinite(frete)):
+        return jsonify({'error': 'Pedido mínimo ou frete inválido'}), 400
+
+    if pedido_minimo < 0 or frete < 0:
+        return jsonify({'error': 'Pedido mínimo e frete não podem ser negativos'}), 400
+
+    conn = conectar()
+    cursor = conn.cursor()
+    cursor.execute('UPDATE fornecedores SET pedido_minimo = ?, frete = ? WHERE id = ?',
+                   (pedido_minimo, frete, fornecedor_id))
+    atualizados = cursor.rowcount
+    conn.commit()
+    conn.close()
+
+    if not atualizados:
+        return jsonify({'error': 'Fornecedor não encontrado'}), 404
+
+    return jsonify({'success': True, 'pedido_minimo': pedido_minimo, 'frete': frete})
+
+
+def excluir_fornecedor():
+    """
+    Exclui um fornecedor específico e todos os seus preços
+    """
+    data = request.get_json()
+    fornecedor_id = data.get('fornecedor_id')
+
+    if not fornecedor_id:
+        return jsonify({'error': 'ID do fornecedor é obrigatório'}), 400
+
+    try:
+        conn = conectar()
+        cursor = conn.cursor()
+
+        # Verificar se o fornecedor existe e obter seu nome
+        cursor.execute(
+            'SELECT id, nome FROM fornecedores WHERE id = ?', (fornecedor_id,))
+        fornecedor = cursor.fetchone()
+
+        if not fornecedor:
+            conn.close()
+            return jsonify({'error': 'Fornecedor não encontrado'}), 404
+
+        # Excluir preços do fornecedor primeiro (chave estrangeira)
+        cursor.execute(
+            'DELETE FROM precos_fornecedores WHERE fornecedor_id = ?', (fornecedor_id,))
+
+        # Excluir o fornecedor
+        cursor.execute('DELETE FROM fornecedores WHERE id = ?',
+                       (fornecedor_id,))
+
+        conn.commit()
+        conn.close()
+
+        log.info("Fornecedor %s excluído", fornecedor[1])
+        return jsonify({'success': True, 'message': f'Fornecedor {fornecedor[1]} excluído com sucesso'})
+
+    except Exception as e:
+        if 'conn' in locals():
+            conn.rollback()
+            conn.close()
+        log.exception("Erro ao excluir fornecedor")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+def excluir_tabela():
+    """
+    Exclui todos os dados da tabela atual
+    """
+    try:
+        conn = conectar()
+        cursor = conn.cursor()
+
+        # A tabela excluída continua consultável como cotação
+        registrar_cotacao(conn, 'exclusao')
+
+        # Excluir dados em ordem para respeitar as chaves estrangeiras
+        cursor.execute('DELETE FROM precos_fornecedores')
+        cursor.execute('DELETE FROM produtos')
+        cursor.execute('DELETE FROM fornecedores')
+
+        # Resetar os auto-increment IDs
+        reiniciar_sequencias(conn, ['produtos', 'fornecedores', 'precos_fornecedores'])
+
+        conn.commit()
+        conn.close()
+
+        log.info("Tabela excluída")
+        return jsonify({'success': True, 'message': 'Tabela excluída com sucesso'})
+
+    except Exception as e:
+        if 'conn' in locals():
+            conn.rollback()
+            conn.close()
+        log.exception("Erro ao excluir tabela")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+def buscar():
+    """
+    Busca produtos por descrição ou código (sem acentos, palavras como prefixo)
+    e retorna os mais relevantes com os preços dos fornecedores
+    """
+    texto = request.args.get('q', '').strip()
+    if not texto:
+        return jsonify({'error': 'Informe o texto da busca'}), 400
+
+    limite = request.args.get('limite', LIMITE_PADRAO, type=int)
+
+    conn = conectar()
+    try:
+        cotacao = cotacao_pedida(conn, request.args.get('cotacao'))
+        produtos = buscar_produtos(conn, texto, limite, cotacao)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 404
+    finally:
+        conn.close()
+
+    return jsonify({'produtos': produtos, 'total': len(produtos)})
+
+
+def periodo_da_requisicao():
+    """
+    Lê os parâmetros inicio/fim (datas ISO) da requisição como segundos Unix
+    """
+    inicio = request.args.get('inicio')
+    fim = request.args.get('fim')
+    return (para_timestamp(inicio) if inicio else None,
+            para_timestamp(fim, fim_do_dia=True) if fim else None)
+
+
+def historico_precos(produto_id):
+    """
+    Histórico de preços de um produto (TOUREIRO e fornecedores), para gráficos
+    Com intervalo=dia|semana|mes devolve os preços agregados por período
+    """
+    intervalo = request.args.get('intervalo')
+
+    conn = conectar()
+    try:
+        inicio, fim = periodo_da_requisicao()
+
+        produto = produto_do_historico(conn, produto_id)
+        if not produto:
+            return jsonify({'produto_id': produto_id, 'series': []})
+
+        if intervalo:
+            series = tendencia_produto(conn, produto[0], intervalo, inicio, fim)
+        else:
+            series = historico_produto(conn, produto[0], inicio, fim)
+
+        return jsonify({'produto_id': produto_id, 'descricao': produto[1], 'series': series})
+
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    finally:
+        conn.close()
+
+
+def variacoes_de_preco():
+    """
+    Lista as alterações de preço acima de um percentual (padrão 10%) no período
+    (padrão: últimos 30 dias), opcionalmente de um único fornecedor
+    """
+    fornecedor_id = request.args.get('fornecedor_id', type=int)
+    percentual = request.args.get('percentual', 10.0, type=float)
+
+    conn = conectar()
+    try:
+        inicio, fim = periodo_da_requisicao()
+        if inicio is None:
+            inicio = int(datetime.now().timestamp()) - 30 * 24 * 3600
+
+        variacoes = variacoes_preco(conn, inicio, fim, fornecedor_id, percentual)
+        return jsonify({'variacoes': variacoes, 'total': len(variacoes)})
+
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    finally:
+        conn.close()
+
+
+def analise():
+    """
+    Melhor preço, segundo colocado, amplitude e economia sobre o TOUREIRO de cada
+    produto, calculados sobre a matriz de preços em memória. Devolve os totais por
+    fornecedor e os `limite` itens (padrão 100, 0 para todos) ordenados por
+    ordenar=economia (padrão), amplitude ou descricao
+    """
+    limite = request.args.get('limite', LIMITE_ITENS, type=int)
+    ordenar = request.args.get('ordenar', 'economia')
+    if ordenar not in ORDENACOES:
+        return jsonify({'error': f"ordenar deve ser {', '.join(ORDENACOES)}"}), 400
+    if limite is None or limite < 0:
+        return jsonify({'error': 'limite deve ser um inteiro maior ou igual a zero'}), 400
+
+    conn = conectar()
+    try:
+        cotacao = cotacao_pedida(conn, request.args.get('cotacao'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 404
+    finally:
+        conn.close()
+
+    matriz, resultado = analise_atual(cotacao)
+    return jsonify(resumo_analise(matriz, resultado, limite, ordenar))
+
+
+def cotacoes():
+    """
+    Lista as cotações registradas (versões da tabela), da mais recente para a mais antiga
+    """
+    conn = conectar()
+    try:
+        return jsonify({'cotacoes': listar_cotacoes(conn)})
+    finally:
+        conn.close()
+
+
+def registrar_cotacao_atual():
+    """
+    Registra a tabela atual como uma cotação ({nome} opcional); só os preços que
+    mudaram desde a última são gravados, e nada é criado se nada mudou
+    """
+    data = request.get_json(silent=True) or {}
+    nome = (data.get('nome') or '').strip() or None
+
+    conn = conectar()
+    try:
+        cursor = conn.cursor()
+        cursor.execute('SELECT COALESCE(MAX(id), 0) FROM cotacoes')
+        ultima = cursor.fetchone()[0]
+        cotacao_id = registrar_cotacao(conn, 'manual', nome)
+        if cotacao_id is None:
+            return jsonify({'error': 'A tabela está vazia'}), 400
+        conn.commit()
+    finally:
+        conn.close()
+
+    log.info("Cotação %s registrada", cotacao_id)
+    return jsonify({'success': True, 'cotacao_id': cotacao_id, 'nova': cotacao_id > ultima})
+
+
+def alteracoes_entre_cotacoes():
+    """
+    Preços que mudaram, entraram ou saíram entre duas cotações (?de=<id>&para=<id>;
+    sem para, compara com a mais recente)
+    """
+    conn = conectar()
+    try:
+        de = cotacao_pedida(conn, request.args.get('de'))
+        para = cotacao_pedida(conn, request.args.get('para'))
+        if de is None:
+            return jsonify({'error': 'Informe a cotação de origem (de)'}), 400
+        if para is None:
+            para = listar_cotacoes(conn)[0]['id']
+        alteracoes = comparar_cotacoes(conn, de, para)
+        return jsonify({'de': de, 'para': para, 'alteracoes': alteracoes,
+                        'total': len(alteracoes)})
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 404
+    finally:
+        conn.close()
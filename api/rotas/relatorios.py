@@ -0,0 +1,692 @@
+# -*- coding: utf-8 -*-
+"""
+Rotas de relatórios: PDFs (ReportLab) e exportações CSV/XLSX/Parquet
+Os relatórios e exportações da tabela aceitam ?cotacao=<id> (cotação registrada)
+"""
+
+import io
+import logging
+import math
+from datetime import datetime
+
+from flask import jsonify, request, send_file, Response, stream_with_context
+
+from api.banco import conectar
+from api.cotacoes import cotacao_pedida, sql_da_cotacao
+from api.exportacao import (formatos_disponiveis, gerar_exportacao, linhas_melhores_precos,
+                            linhas_tabela_completa, TIPOS_MIME)
+from api.matriz_precos import analise_atual
+from api.metricas import medir_relatorio
+
+log = logging.getLogger(__name__)
+
+
+def cotacao_da_requisicao():
+    """
+    Cotação pedida em ?cotacao=<id> (None para a tabela atual); ValueError se não existe
+    """
+    conn = conectar()
+    try:
+        return cotacao_pedida(conn, request.args.get('cotacao'))
+    finally:
+        conn.close()
+
+
+def gerar_relatorio():
+    """
+    Gera um relatório PDF com os menores preços de cada produto
+    """
+    # ReportLab só é carregado quando um PDF é gerado (reduz o tempo de partida)
+    from reportlab.lib.pagesizes import A4, landscape
+    from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
+    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+    from reportlab.lib import colors
+    from reportlab.lib.units import inch
+
+    try:
+        cotacao = cotacao_da_requisicao()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 404
+
+    try:
+        # Menor preço de cada produto com fornecedores para comparar (preços zerados
+        # ignorados, empates com o TOUREIRO), calculado sobre a matriz inteira
+        matriz, analise = analise_atual(cotacao)
+        if not len(matriz):
+            return jsonify({'error': 'Nenhum produto encontrado'}), 400
+
+        dados_relatorio = [{
+            'produto': matriz.descricoes[i],
+            'menor_preco': float(analise['menor'][i]),
+            'fornecedor': matriz.colunas[analise['melhor'][i]]
+        } for i in analise['comparaveis'].nonzero()[0].tolist()]
+
+        # Gerar PDF
+        buffer = io.BytesIO()
+        doc = SimpleDocTemplate(buffer, pagesize=landscape(
+            A4), rightMargin=72, leftMargin=72, topMargin=72, bottomMargin=18)
+
+        # Estilos
+        styles = getSampleStyleSheet()
+        title_style = ParagraphStyle(
+            'CustomTitle',
+            parent=styles['Heading1'],
+            fontSize=18,
+            spaceAfter=30,
+            alignment=1  # Centralizado
+        )
+
+        # Conteúdo do PDF
+        story = []
+
+        # Título
+        title = Paragraph("Relatório de Menores Preços", title_style)
+        story.append(title)
+
+        # Data de geração
+        data_geracao = datetime.now().strftime("%d/%m/%Y às %H:%M")
+        data_para = Paragraph(
+            f"<para align=center>Gerado em {data_geracao}</para>", styles['Normal'])
+        story.append(data_para)
+        story.append(Spacer(1, 20))
+
+        if dados_relatorio:
+            # Cabeçalho da tabela
+            data_tabela = [['Fornecedor', 'Produto', 'Menor Preço']]
+
+            # Dados da tabela
+            for item in dados_relatorio:
+                data_tabela.append([
+                    item['fornecedor'],
+                    item['produto'],
+                    f"R$ {item['menor_preco']:.2f}".replace('.', ',')
+                ])
+
+            # Criar tabela com larguras ajustadas para modo paisagem
+            tabela = Table(data_tabela, colWidths=[2.5*inch, 5*inch, 2*inch])
+            tabela.setStyle(TableStyle([
+                ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+                ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+                ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+                ('FONTSIZE', (0, 0), (-1, 0), 14),
+                ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+                ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+                ('GRID', (0, 0), (-1, -1), 1, colors.black),
+                ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
+                ('FONTSIZE', (0, 1), (-1, -1), 10),
+                ('ROWBACKGROUNDS', (0, 1), (-1, -1),
+                 [colors.white, colors.lightgrey])
+            ]))
+
+            story.append(tabela)
+
+            # Resumo
+            story.append(Spacer(1, 20))
+            resumo = Paragraph(
+                f"<para align=center><b>Total de produtos: {len(dados_relatorio)}</b></para>", styles['Normal'])
+            story.append(resumo)
+        else:
+            # Mensagem quando não há dados
+            mensagem = Paragraph(
+                "<para align=center>Nenhum produto com fornecedores para comparação.</para>", styles['Normal'])
+            story.append(mensagem)
+
+        # Construir PDF
+        with medir_relatorio('gerar_relatorio'):
+            doc.build(story)
+        buffer.seek(0)
+
+        return send_file(
+            buffer,
+            as_attachment=True,
+            download_name=f'relatorio_menores_precos_{datetime.now().strftime("%Y%m%d_%H%M%S")}.pdf',
+            mimetype='application/pdf'
+        )
+
+    except Exception as e:
+        log.exception("Erro ao gerar relatório")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+def exportar_tabela_pdf():
+    """
+    Exporta a tabela completa em PDF em modo paisagem
+    """
+    from reportlab.lib.pagesizes import A4, landscape
+    from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
+    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+    from reportlab.lib import colors
+    from reportlab.lib.units import inch
+
+    try:
+        cotacao = cotacao_da_requisicao()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 404
+
+    try:
+        conn = conectar()
+        cursor = conn.cursor()
+
+        # Buscar todos os dados necessários
+        cursor.execute(sql_da_cotacao(
+            'SELECT id, descricao, preco_toureiro FROM produtos ORDER BY descricao', cotacao))
+        produtos = cursor.fetchall()
+
+        cursor.execute(sql_da_cotacao('SELECT id, nome FROM fornecedores ORDER BY nome', cotacao))
+        fornecedores = cursor.fetchall()
+
+        cursor.execute(sql_da_cotacao(
+            'SELECT produto_id, fornecedor_id, preco FROM precos_fornecedores', cotacao))
+        precos_fornecedores = cursor.fetchall()
+
+        conn.close()
+
+        if not produtos:
+            return jsonify({'error': 'Nenhum produto encontrado'}), 400
+
+        # Organizar preços por produto e fornecedor
+        precos_dict = {}
+        for preco in precos_fornecedores:
+            produto_id, fornecedor_id, valor = preco
+            if produto_id not in precos_dict:
+                precos_dict[produto_id] = {}
+            precos_dict[produto_id][fornecedor_id] = valor
+
+        # Gerar PDF
+        buffer = io.BytesIO()
+        doc = SimpleDocTemplate(buffer, pagesize=landscape(
+            A4), rightMargin=36, leftMargin=36, topMargin=72, bottomMargin=36)
+
+        # Estilos
+        styles = getSampleStyleSheet()
+        title_style = ParagraphStyle(
+            'CustomTitle',
+            parent=styles['Heading1'],
+            fontSize=16,
+            spaceAfter=20,
+            alignment=1  # Centralizado
+        )
+
+        # Conteúdo do PDF
+        story = []
+
+        # Título
+        title = Paragraph("Tabela Completa de Preços", title_style)
+        story.append(title)
+
+        # Data de geração
+        data_geracao = datetime.now().strftime("%d/%m/%Y às %H:%M")
+        data_para = Paragraph(
+            f"<para align=center>Gerado em {data_geracao}</para>", styles['Normal'])
+        story.append(data_para)
+        story.append(Spacer(1, 20))
+
+        # Cabeçalho da tabela
+        cabecalho = ['Produto', 'TOUREIRO']
+        for fornecedor in fornecedores:
+            cabecalho.append(fornecedor[1])
+
+        data_tabela = [cabecalho]
+
+        # Dados da tabela
+        for produto in produtos:
+            produto_id, descricao, preco_toureiro = produto
+            linha = [descricao, f"R$ {preco_toureiro:.2f}".replace('.', ',')]
+            
+            # Adicionar preços dos fornecedores
+            for fornecedor in fornecedores:
+                fornecedor_id = fornecedor[0]
+                if produto_id in precos_dict and fornecedor_id in precos_dict[produto_id]:
+                    preco = precos_dict[produto_id][fornecedor_id]
+                    if preco > 0:
+                        linha.append(f"R$ {preco:.2f}".replace('.', ','))
+                    else:
+                        linha.append('-')
+                else:
+                    linha.append('-')
+            
+            data_tabela.append(linha)
+
+        # Calcular larguras das colunas dinamicamente
+        num_colunas = len(cabecalho)
+        largura_produto = 3.5 * inch
+        largura_restante = (landscape(A4)[0] - 72 - largura_produto) / (num_colunas - 1)
+        larguras = [largura_produto] + [largura_restante] * (num_colunas - 1)
+
+        # Criar tabela
+        tabela = Table(data_tabela, colWidths=larguras)
+        tabela.setStyle(TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, 0), 10),
+            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+            ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+            ('GRID', (0, 0), (-1, -1), 1, colors.black),
+            ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
+            ('FONTSIZE', (0, 1), (-1, -1), 8),
+            ('ROWBACKGROUNDS', (0, 1), (-1, -1),
+             [colors.white, colors.lightgrey]),
+            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE')
+        ]))
+
+        story.append(tabela)
+
+        # Resumo
+        story.append(Spacer(1, 20))
+        resumo = Paragraph(
+            f"<para align=center><b>Total de produtos: {len(produtos)} | Total de fornecedores: {len(fornecedores)}</b></para>", styles['Normal'])
+        story.append(resumo)
+
+        # Construir PDF
+        with medir_relatorio('exportar_tabela_pdf'):
+            doc.build(story)
+        buffer.seek(0)
+
+        return send_file(
+            buffer,
+            as_attachment=True,
+            download_name=f'tabela_completa_{datetime.now().strftime("%Y%m%d_%H%M%S")}.pdf',
+            mimetype='application/pdf'
+        )
+
+    except Exception as e:
+        log.exception("Erro ao exportar tabela")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+def relatorio_melhores_precos():
+    """
+    Gera relatório PDF apenas dos itens da tabela de melhores preços
+    """
+    from reportlab.lib.pagesizes import A4
+    from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
+    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+    from reportlab.lib import colors
+    from reportlab.lib.units import inch
+
+    try:
+        # Receber dados dos melhores preços do frontend
+        dados_melhores = request.get_json()
+        
+        if not dados_melhores or 'itens' not in dados_melhores:
+            return jsonify({'success': False, 'error': 'Dados dos melhores preços não fornecidos'}), 400
+
+        itens = dados_melhores['itens']
+        total_geral = dados_melhores.get('total', 0)
+        
+        if not itens:
+            return jsonify({'success': False, 'error': 'Nenhum item encontrado na tabela de melhores preços'}), 400
+
+        # Criar buffer para o PDF
+        buffer = io.BytesIO()
+        
+        # Configurar documento em modo retrato
+        doc = SimpleDocTemplate(
+            buffer,
+            pagesize=A4,
+            rightMargin=36,
+            leftMargin=36,
+            topMargin=36,
+            bottomMargin=36
+        )
+
+        # Estilos
+        styles = getSampleStyleSheet()
+        title_style = ParagraphStyle(
+            'CustomTitle',
+            parent=styles['Heading1'],
+            fontSize=18,
+            spaceAfter=20,
+            alignment=1  # Centralizado
+        )
+
+        # Conteúdo do PDF
+        story = []
+
+        # Título
+        title = Paragraph("Relatório de Melhores Preços", title_style)
+        story.append(title)
+
+        # Data de geração
+        data_geracao = datetime.now().strftime("%d/%m/%Y às %H:%M")
+        data_para = Paragraph(
+            f"<para align=center>Gerado em {data_geracao}</para>", styles['Normal'])
+        story.append(data_para)
+        story.append(Spacer(1, 20))
+
+        # Cabeçalho da tabela
+        cabecalho = ['Produto', 'Melhor Preço', 'Fornecedor', 'Quantidade', 'Subtotal']
+        data_tabela = [cabecalho]
+
+        # Dados da tabela
+        for item in itens:
+            linha = [
+                item['produto'],
+                f"R$ {item['preco']:.2f}".replace('.', ','),
+                item['fornecedor'],
+                str(item['quantidade']),
+                f"R$ {item['subtotal']:.2f}".replace('.', ',')
+            ]
+            data_tabela.append(linha)
+
+        # Adicionar linha do total
+        linha_total = [
+            'TOTAL GERAL',
+            '',
+            '',
+            '',
+            f"R$ {total_geral:.2f}".replace('.', ',')
+        ]
+        data_tabela.append(linha_total)
+
+        # Calcular larguras das colunas
+        larguras = [3.5 * inch, 1.2 * inch, 1.5 * inch, 1 * inch, 1.2 * inch]
+
+        # Criar tabela
+        tabela = Table(data_tabela, colWidths=larguras)
+        tabela.setStyle(TableStyle([
+            # Cabeçalho
+            ('BACKGROUND', (0, 0), (-1, 0), colors.green),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, 0), 10),
+            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+            
+            # Dados
+            ('BACKGROUND', (0, 1), (-1, -2), colors.beige),
+            ('GRID', (0, 0), (-1, -2), 1, colors.black),
+            ('FONTNAME', (0, 1), (-1, -2), 'Helvetica'),
+            ('FONTSIZE', (0, 1), (-1, -2), 9),
+            ('ROWBACKGROUNDS', (0, 1), (-1, -2), [colors.white, colors.lightgrey]),
+            
+            # Linha do total
+            ('BACKGROUND', (0, -1), (-1, -1), colors.yellow),
+            ('FONTNAME', (0, -1), (-1, -1), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, -1), (-1, -1), 11),
+            ('GRID', (0, -1), (-1, -1), 2, colors.black),
+            
+            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE')
+        ]))
+
+        story.append(tabela)
+
+        # Resumo
+        story.append(Spacer(1, 20))
+        resumo = Paragraph(
+            f"<para align=center><b>Total de produtos selecionados: {len(itens)} | Valor total: R$ {total_geral:.2f}</b></para>".replace('.', ','), styles['Normal'])
+        story.append(resumo)
+
+        # Construir PDF
+        with medir_relatorio('relatorio_melhores_precos'):
+            doc.build(story)
+        buffer.seek(0)
+
+        return send_file(
+            buffer,
+            as_attachment=True,
+            download_name=f'relatorio_melhores_precos_{datetime.now().strftime("%Y%m%d_%H%M%S")}.pdf',
+            mimetype='application/pdf'
+        )
+
+    except Exception as e:
+        log.exception("Erro ao gerar relatório de melhores preços")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+def gerar_pdf_pedido():
+    """
+    Gera PDF do pedido com os produtos da tabela de melhores preços
+    """
+    from reportlab.lib.pagesizes import A4, landscape
+    from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
+    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+    from reportlab.lib import colors
+    from reportlab.lib.units import inch
+
+    try:
+        data = request.get_json()
+        itens = data.get('itens', [])
+        total = data.get('total', 0)
+        # Fretes dos fornecedores usados, quando o pedido foi otimizado
+        fretes = data.get('fretes', [])
+        
+        if not itens:
+            return jsonify({'error': 'Nenhum item fornecido'}), 400
+        
+        # Gerar PDF
+        buffer = io.BytesIO()
+        doc = SimpleDocTemplate(buffer, pagesize=landscape(A4), rightMargin=36, leftMargin=36, topMargin=72, bottomMargin=36)
+        
+        # Estilos
+        styles = getSampleStyleSheet()
+        title_style = ParagraphStyle(
+            'CustomTitle',
+            parent=styles['Heading1'],
+            fontSize=18,
+            spaceAfter=20,
+            alignment=1  # Centralizado
+        )
+        
+        # Conteúdo do PDF
+        story = []
+        
+        # Título
+        title = Paragraph("Pedido - Melhores Preços", title_style)
+        story.append(title)
+        
+        # Data de geração
+        data_geracao = datetime.now().strftime("%d/%m/%Y às %H:%M")
+        data_para = Paragraph(
+            f"<para align=center>Gerado em {data_geracao}</para>", styles['Normal'])
+        story.append(data_para)
+        story.append(Spacer(1, 20))
+        
+        # Cabeçalho da tabela
+        cabecalho = ['Produto', 'Melhor Preço', 'Fornecedor', 'Quantidade', 'Subtotal']
+        data_tabela = [cabecalho]
+        
+        # Dados da tabela
+        for item in itens:
+            linha = [
+                item['produto'],
+                f"R$ {item['preco']:.2f}".replace('.', ','),
+                item['fornecedor'],
+                str(int(item['quantidade'])),
+                f"R$ {item['subtotal']:.2f}".replace('.', ',')
+            ]
+            data_tabela.append(linha)
+
+        for frete in fretes:
+            data_tabela.append(['Frete', '', frete['fornecedor'], '',
+                                f"R$ {frete['frete']:.2f}".replace('.', ',')])
+        
+        # Linha de total
+        linha_total = ['', '', '', 'TOTAL GERAL:', f"R$ {total:.2f}".replace('.', ',')]
+        data_tabela.append(linha_total)
+        
+        # Criar tabela com larguras ajustadas para modo paisagem
+        tabela = Table(data_tabela, colWidths=[4*inch, 1.5*inch, 2*inch, 1.2*inch, 1.8*inch])
+        tabela.setStyle(TableStyle([
+            # Cabeçalho
+            ('BACKGROUND', (0, 0), (-1, 0), colors.green),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, 0), 12),
+            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+            
+            # Dados
+            ('BACKGROUND', (0, 1), (-1, -2), colors.beige),
+            ('GRID', (0, 0), (-1, -2), 1, colors.black),
+            ('FONTNAME', (0, 1), (-1, -2), 'Helvetica'),
+            ('FONTSIZE', (0, 1), (-1, -2), 10),
+            ('ROWBACKGROUNDS', (0, 1), (-1, -2), [colors.white, colors.lightgrey]),
+            
+            # Linha de total
+            ('BACKGROUND', (0, -1), (-1, -1), colors.yellow),
+            ('FONTNAME', (0, -1), (-1, -1), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, -1), (-1, -1), 12),
+            ('GRID', (0, -1), (-1, -1), 1, colors.black),
+            
+            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE')
+        ]))
+        
+        story.append(tabela)
+        
+        # Resumo
+        story.append(Spacer(1, 20))
+        resumo = Paragraph(
+            f"<para align=center><b>Total de itens: {len(itens)} | Valor total: R$ {total:.2f}</b></para>".replace('.', ','), 
+            styles['Normal']
+        )
+        story.append(resumo)
+        
+        # Construir PDF
+        with medir_relatorio('gerar_pdf_pedido'):
+            doc.build(story)
+        buffer.seek(0)
+        
+        return send_file(
+            buffer,
+            as_attachment=True,
+            download_name=f'pedido_melhores_precos_{datetime.now().strftime("%Y%m%d_%H%M%S")}.pdf',
+            mimetype='application/pdf'
+        )
+        
+    except Exception as e:
+        log.exception("Erro ao gerar PDF do pedido")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+def otimizar_pedido():
+    """
+    Distribui os itens do pedido entre os fornecedores pelo menor custo total,
+    respeitando o pedido mínimo e somando o frete de cada fornecedor usado
+    Recebe {itens: [{produto_id, quantidade}]}; numa cotação, os IDs são os dela
+    """
+    import numpy as np
+    from api.matriz_precos import obter_matriz, posicoes
+    from api.otimizacao_pedido import otimizar
+
+    data = request.get_json(silent=True) or {}
+    try:
+        pedidos = [(int(item['produto_id']), float(item['quantidade']))
+                   for item in data.get('itens', [])]
+    except (KeyError, TypeError, ValueError):
+        return jsonify({'error': 'Itens inválidos'}), 400
+    # float() aceita 'inf' e 'nan': o total viraria Infinity, que não é JSON válido
+    if not all(math.isfinite(quantidade) for _, quantidade in pedidos):
+        return jsonify({'error': 'Itens inválidos'}), 400
+
+    conn = conectar()
+    try:
+        cotacao = cotacao_pedida(conn, request.args.get('cotacao'))
+        matriz = obter_matriz(conn, cotacao)
+        cursor = conn.cursor()
+        cursor.execute(sql_da_cotacao('SELECT id, pedido_minimo, frete FROM fornecedores', cotacao))
+        condicoes = {f[0]: (f[1] or 0, f[2] or 0) for f in cursor.fetchall()}
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 404
+    finally:
+        conn.close()
+
+    pedidos = [(produto_id, quantidade) for produto_id, quantidade in pedidos if quantidade > 0]
+    linhas = posicoes(matriz.produto_ids, np.array([p[0] for p in pedidos], dtype=np.int64))
+    # Só entram os produtos que existem e têm algum preço
+    validos = [i for i, linha in enumerate(linhas.tolist())
+               if linha >= 0 and not np.isnan(matriz.precos[linha]).all()]
+    if not validos:
+        return jsonify({'error': 'Nenhum item com preço para otimizar'}), 400
+    linhas = linhas[validos]
+    quantidades = np.array([pedidos[i][1] for i in validos])
+
+    # O TOUREIRO (coluna 0) não tem pedido mínimo nem frete
+    minimos = np.array([0.0] + [condicoes.get(f, (0, 0))[0] for f, _ in matriz.fornecedores])
+    fretes = np.array([0.0] + [condicoes.get(f, (0, 0))[1] for f, _ in matriz.fornecedores])
+    precos = matriz.precos[linhas]
+    resultado = otimizar(precos, quantidades, minimos, fretes)
+
+    itens = []
+    subtotais = np.zeros(len(matriz.colunas))
+    contagem = np.zeros(len(matriz.colunas), dtype=np.int64)
+    for i, coluna in enumerate(resultado['atribuicao'].tolist()):
+        subtotal = float(quantidades[i] * precos[i, coluna])
+        subtotais[coluna] += subtotal
+        contagem[coluna] += 1
+        itens.append({
+            'produto_id': int(matriz.produto_ids[linhas[i]]),
+            'produto': matriz.descricoes[linhas[i]],
+            'fornecedor': matriz.colunas[coluna],
+            'preco': round(float(precos[i, coluna]), 4),
+            'quantidade': float(quantidades[i]),
+            'subtotal': round(subtotal, 2),
+        })
+
+    fornecedores = [{
+        'id': None if coluna == 0 else matriz.fornecedores[coluna - 1][0],
+        'nome': matriz.colunas[coluna],
+        'itens': int(contagem[coluna]),
+        'subtotal': round(float(subtotais[coluna]), 2),
+        'frete': round(float(fretes[coluna]), 2),
+        'pedido_minimo': round(float(minimos[coluna]), 2),
+        'atende_minimo': bool(subtotais[coluna] >= minimos[coluna] - 0.005),
+    } for coluna in np.flatnonzero(contagem).tolist()]
+
+    log.info("Pedido otimizado: %d itens em %d fornecedores", len(itens), len(fornecedores),
+             extra={'dados': {'total': round(resultado['total'], 2),
+                              'total_menor_preco': round(resultado['total_menor_preco'], 2)}})
+    return jsonify({
+        'itens': itens,
+        'fornecedores': fornecedores,
+        'ignorados': len(pedidos) - len(validos),
+        'total': round(resultado['total'], 2),
+        # Referência: menor preço item a item com fretes, sem respeitar os mínimos
+        'total_menor_preco': round(resultado['total_menor_preco'], 2),
+        'pendentes': [matriz.colunas[coluna] for coluna in resultado['pendentes']],
+    })
+
+
+def resposta_exportacao(gerador_linhas, nome_base, formato, colunas_texto=1):
+    """
+    Monta a resposta em streaming de uma exportação tabular (tabela atual ou ?cotacao=<id>)
+    A conexão com o banco fica aberta apenas enquanto o arquivo é enviado
+    """
+    if formato not in formatos_disponiveis():
+        return jsonify({'error': f'Formato não suportado: {formato}'}), 400
+    try:
+        cotacao = cotacao_da_requisicao()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 404
+
+    def gerar():
+        conn = conectar()
+        try:
+            yield from gerar_exportacao(formato, gerador_linhas(conn, cotacao), nome_base,
+                                        colunas_texto)
+        finally:
+            conn.close()
+
+    nome_arquivo = f'{nome_base}_{datetime.now().strftime("%Y%m%d_%H%M%S")}.{formato}'
+    return Response(
+        stream_with_context(gerar()),
+        mimetype=TIPOS_MIME[formato],
+        headers={'Content-Disposition': f'attachment; filename={nome_arquivo}'}
+    )
+
+
+def exportar_tabela(formato):
+    """
+    Exporta a tabela completa de preços em CSV, XLSX ou Parquet
+    """
+    return resposta_exportacao(linhas_tabela_completa, 'tabela_completa', formato)
+
+
+def exportar_melhores_precos(formato):
+    """
+    Exporta a lista de melhores preços por produto em CSV, XLSX ou Parquet
+    """
+    return resposta_exportacao(linhas_melhores_precos, 'melhores_precos', formato, colunas_texto=2)
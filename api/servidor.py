@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+"""
+Servidor de produção do MegaFarma (executável e instalações locais)
+
+- waitress (padrão, funciona no Windows e no executável): um processo com várias threads
+- gunicorn (Linux/macOS): vários processos (workers), cada um com várias threads
+- desenvolvimento: servidor do Flask com debug, como "python api/app.py"
+
+Uso: python -m api.servidor [--servidor waitress|gunicorn|desenvolvimento]
+     [--host H] [--porta P] [--workers N] [--threads N] [--keep-alive S] [--timeout S]
+     [--pasta-monitorada PASTA] [--manutencao-horas H]
+Cada opção também pode vir do ambiente (MEGAFARMA_SERVIDOR, MEGAFARMA_PORTA, ...)
+"""
+
+import argparse
+import importlib.util
+import logging
+import multiprocessing
+import os
+import sys
+
+# Garantir que o pacote "api" seja importável também ao executar "python api/servidor.py"
+raiz_projeto = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if raiz_projeto not in sys.path:
+    sys.path.insert(0, raiz_projeto)
+
+log = logging.getLogger(__name__)
+
+SERVIDORES = ('waitress', 'gunicorn', 'desenvolvimento')
+
+PADROES = {
+    'host': '0.0.0.0',
+    'porta': 5000,
+    'workers': 1,
+    'threads': 8,
+    # Segundos que uma conexão ociosa (keep-alive) continua aberta
+    'keep_alive': 5,
+    # Segundos máximos por requisição (só no gunicorn: o waitress não interrompe threads)
+    'timeout': 120,
+    # Horas entre as manutenções do banco SQLite (cópia de segurança, estatísticas e vacuum)
+    'manutencao_horas': 24.0,
+}
+
+
+def servidor_padrao():
+    if importlib.util.find_spec('waitress'):
+        return 'waitress'
+    return 'desenvolvimento'
+
+
+def ler_opcoes(argv=None):
+    """
+    Opções da linha de comando, com padrão vindo das variáveis MEGAFARMA_*
+    """
+    def ambiente(nome, tipo=str):
+        valor = os.environ.get(f'MEGAFARMA_{nome.upper()}')
+        return tipo(valor) if valor else PADROES.get(nome)
+
+    parser = argparse.ArgumentParser(description='Servidor de produção do MegaFarma')
+    parser.add_argument('--servidor', choices=SERVIDORES,
+                        default=os.environ.get('MEGAFARMA_SERVIDOR') or servidor_padrao())
+    parser.add_argument('--host', default=ambiente('host'))
+    parser.add_argument('--porta', type=int, default=ambiente('porta', int))
+    parser.add_argument('--workers', type=int, default=ambiente('workers', int),
+                        help='processos (apenas gunicorn)')
+    parser.add_argument('--threads', type=int, default=ambiente('threads', int),
+                        help='threads por processo')
+    parser.add_argument('--keep-alive', type=int, default=ambiente('keep_alive', int),
+                        help='segundos de conexão ociosa mantida aberta')
+    parser.add_argument('--timeout', type=int, default=ambiente('timeout', int),
+                        help='segundos máximos por requisição (apenas gunicorn)')
+    parser.add_argument('--pasta-monitorada', default=ambiente('pasta_monitorada'),
+                        help='importa os PDFs TOUREIRO salvos nesta pasta (apenas waitress)')
+    parser.add_argument('--manutencao-horas', type=float,
+                        default=ambiente('manutencao_horas', float),
+                        help='horas entre as manutenções do banco SQLite, 0 desliga (apenas waitress)')
+    return parser.parse_args(argv)
+
+
+def servir_waitress(app, opcoes):
+    from waitress import serve
+
+    if opcoes.workers > 1:
+        log.warning("waitress usa um único processo: --workers ignorado (use --threads)")
+    serve(app, host=opcoes.host, port=opcoes.porta, threads=opcoes.threads,
+          channel_timeout=opcoes.keep_alive, ident='MegaFarma')
+
+
+def servir_gunicorn(opcoes):
+    from gunicorn.app.base import BaseApplication
+
+    class AplicacaoGunicorn(BaseApplication):
+        def load_config(self):
+            configuracao = {
+                'bind': f'{opcoes.host}:{opcoes.porta}',
+                'workers': opcoes.workers,
+                'threads': opcoes.threads,
+                'worker_class': 'gthread' if opcoes.threads > 1 else 'sync',
+                'keepalive': opcoes.keep_alive,
+                'timeout': opcoes.timeout,
+                'graceful_timeout': min(opcoes.timeout, 30),
+            }
+            for chave, valor in configuracao.items():
+                self.cfg.set(chave, valor)
+
+        def load(self):
+            # Cada worker importa o app depois do fork (conexões e pools não são compartilhados)
+            from api.app import app
+            return app
+
+    AplicacaoGunicorn().run()
+
+
+def main(argv=None):
+    opcoes = ler_opcoes(argv)
+    from api.registro import configurar_registro
+    configurar_registro()
+
+    if opcoes.servidor == 'gunicorn' and sys.platform == 'win32':
+        log.warning("gunicorn não roda no Windows: usando waitress")
+        opcoes.servidor = 'waitress'
+
+    from api.banco import init_db
+    init_db()
+
+    log.info("MegaFarma em http://localhost:%d (%s, %d worker(s), %d thread(s))",
+             opcoes.porta, opcoes.servidor, opcoes.workers, opcoes.threads)
+
+    if opcoes.pasta_monitorada and opcoes.servidor != 'waitress':
+        # No gunicorn cada worker teria o seu monitor; no desenvolvimento, o recarregador também
+        log.warning("--pasta-monitorada só roda com o waitress: use python -m api.pasta_monitorada")
+    if opcoes.manutencao_horas and opcoes.servidor == 'gunicorn':
+        log.warning("A manutenção agendada do banco só roda com o waitress: "
+                    "agende python -m api.manutencao (cron) ou use POST /manutencao")
+
+    if opcoes.servidor == 'gunicorn':
+        servir_gunicorn(opcoes)
+        return
+
+    from api.app import app
+    if opcoes.servidor == 'waitress':
+        if opcoes.pasta_monitorada:
+            from api.pasta_monitorada import MonitorPasta
+            MonitorPasta(opcoes.pasta_monitorada).iniciar()
+        from api.banco import obter_backend
+        if opcoes.manutencao_horas and obter_backend().dialeto == 'sqlite':
+            from api.manutencao import AgendadorManutencao
+            AgendadorManutencao(opcoes.manutencao_horas).iniciar()
+        servir_waitress(app, opcoes)
+    else:
+        app.run(debug=True, host=opcoes.host, port=opcoes.porta)
+
+
+if __name__ == '__main__':
+    # No executável, os processos das páginas do PDF (spawn) reentram por aqui
+    multiprocessing.freeze_support()
+    main()
@@ -0,0 +1,200 @@
+# -*- coding: utf-8 -*-
+"""
+Upload retomável em partes, para PDFs maiores que o limite de uma requisição
+
+1. POST /upload_partes {nome, tamanho, sha256?} cria o upload e devolve o id
+2. PUT /upload_partes/<id> com os bytes de uma parte no corpo e os cabeçalhos
+   Upload-Offset (posição da parte no arquivo) e, opcional, X-Parte-SHA256
+3. GET /upload_partes/<id> diz quantos bytes já chegaram (para retomar)
+4. POST /upload_partes/<id>/concluir confere tamanho e SHA-256 e importa o PDF
+
+As partes são gravadas direto em uploads/<id>.parcial (metadados em
+uploads/<id>.json), lidas do corpo da requisição em blocos, sem carregar o
+arquivo inteiro na memória. Uploads parados há mais de MEGAFARMA_UPLOAD_VALIDADE
+horas (padrão 24) são apagados
+"""
+
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+import uuid
+
+from werkzeug.utils import secure_filename
+
+log = logging.getLogger(__name__)
+
+TAMANHO_PARTE = 4 * 1024 * 1024
+TAMANHO_BLOCO = 64 * 1024
+# Tamanho máximo do arquivo montado, em MB (MEGAFARMA_UPLOAD_MAXIMO)
+TAMANHO_MAXIMO = 512
+VALIDADE_HORAS = 24
+PADRAO_ID = re.compile(r'^[0-9a-f]{32}$')
+PADRAO_SHA256 = re.compile(r'^[0-9a-f]{64}$')
+
+# Uma parte por vez em cada upload (dentro do processo)
+travas = {}
+trava_travas = threading.Lock()
+
+
+class ErroUpload(ValueError):
+    """
+    Erro do protocolo de upload, com o status HTTP da resposta
+    """
+
+    def __init__(self, mensagem, status=400):
+        super().__init__(mensagem)
+        self.status = status
+
+
+def trava_do_upload(upload_id):
+    with trava_travas:
+        return travas.setdefault(upload_id, threading.Lock())
+
+
+def caminhos(pasta, upload_id):
+    if not PADRAO_ID.match(upload_id or ''):
+        raise ErroUpload('Upload não encontrado', 404)
+    base = os.path.join(pasta, upload_id)
+    return base + '.json', base + '.parcial'
+
+
+def ler_metadados(pasta, upload_id):
+    arquivo_json, parcial = caminhos(pasta, upload_id)
+    try:
+        with open(arquivo_json, encoding='utf-8') as arquivo:
+            metadados = json.load(arquivo)
+    except (OSError, ValueError):
+        raise ErroUpload('Upload não encontrado', 404)
+    metadados['recebido'] = os.path.getsize(parcial) if os.path.exists(parcial) else 0
+    return metadados
+
+
+def situacao(metadados):
+    return {'id': metadados['id'], 'nome': metadados['nome'], 'tamanho': metadados['tamanho'],
+            'recebido': metadados['recebido'], 'tamanho_parte': TAMANHO_PARTE}
+
+
+def limpar_expirados(pasta, horas=None):
+    horas = horas or float(os.environ.get('MEGAFARMA_UPLOAD_VALIDADE') or VALIDADE_HORAS)
+    limite = time.time() - horas * 3600
+    for nome in os.listdir(pasta):
+        base, extensao = os.path.splitext(nome)
+        if extensao not in ('.json', '.parcial') or not PADRAO_ID.match(base):
+            continue
+        caminho = os.path.join(pasta, nome)
+        try:
+            if os.path.getmtime(caminho) < limite:
+                os.remove(caminho)
+        except OSError:
+            pass
+
+
+def iniciar_upload(pasta, nome, tamanho, sha256=None):
+    """
+    Cria o upload e devolve a situação ({'id', 'nome', 'tamanho', 'recebido', 'tamanho_parte'})
+    """
+    maximo = int(os.environ.get('MEGAFARMA_UPLOAD_MAXIMO') or TAMANHO_MAXIMO) * 1024 * 1024
+    nome = secure_filename(nome or '')
+    if not nome.lower().endswith('.pdf'):
+        raise ErroUpload('Arquivo deve ser um PDF')
+    if not isinstance(tamanho, int) or tamanho <= 0:
+        raise ErroUpload('Tamanho do arquivo inválido')
+    if tamanho > maximo:
+        raise ErroUpload(f'Arquivo maior que {maximo // (1024 * 1024)} MB', 413)
+    if sha256 is not None:
+        sha256 = str(sha256).lower()
+        if not PADRAO_SHA256.match(sha256):
+            raise ErroUpload('SHA-256 inválido')
+
+    limpar_expirados(pasta)
+    metadados = {'id': uuid.uuid4().hex, 'nome': nome, 'tamanho': tamanho, 'sha256': sha256,
+                 'criado': time.time()}
+    arquivo_json, parcial = caminhos(pasta, metadados['id'])
+    with open(arquivo_json, 'w', encoding='utf-8') as arquivo:
+        json.dump(metadados, arquivo)
+    open(parcial, 'wb').close()
+
+    metadados['recebido'] = 0
+    log.info("Upload em partes iniciado: %s", nome, extra={'dados': {
+        'upload': metadados['id'], 'tamanho': tamanho}})
+    return situacao(metadados)
+
+
+def consultar_upload(pasta, upload_id):
+    return situacao(ler_metadados(pasta, upload_id))
+
+
+def gravar_parte(pasta, upload_id, offset, fluxo, tamanho_parte, sha256_parte=None):
+    """
+    Acrescenta a parte lida de `fluxo` (tamanho_parte bytes) na posição offset
+    A parte só é aceita se offset for o total já recebido e o SHA-256 conferir
+    """
+    if offset is None or tamanho_parte is None:
+        raise ErroUpload('Cabeçalhos Upload-Offset e Content-Length são obrigatórios')
+    if not 0 < tamanho_parte <= TAMANHO_PARTE:
+        raise ErroUpload(f'A parte deve ter de 1 a {TAMANHO_PARTE} bytes')
+
+    with trava_do_upload(upload_id):
+        metadados = ler_metadados(pasta, upload_id)
+        if offset != metadados['recebido']:
+            # O cliente retoma a partir do que já chegou
+            raise ErroUpload(f"Offset {offset} diferente do recebido ({metadados['recebido']})", 409)
+        if offset + tamanho_parte > metadados['tamanho']:
+            raise ErroUpload('A parte passa do tamanho do arquivo')
+
+        _, parcial = caminhos(pasta, upload_id)
+        resumo = hashlib.sha256()
+        gravados = 0
+        with open(parcial, 'r+b') as arquivo:
+            arquivo.seek(offset)
+            try:
+                while gravados < tamanho_parte:
+                    bloco = fluxo.read(min(TAMANHO_BLOCO, tamanho_parte - gravados))
+                    if not bloco:
+                        break
+                    arquivo.write(bloco)
+                    resumo.update(bloco)
+                    gravados += len(bloco)
+            finally:
+                # Parte incompleta ou corrompida não fica no arquivo
+                if gravados != tamanho_parte or (sha256_parte
+                                                 and resumo.hexdigest() != sha256_parte.lower()):
+                    arquivo.truncate(offset)
+                    gravados = None
+
+        if gravados is None:
+            raise ErroUpload('Parte incompleta ou com SHA-256 diferente; envie de novo', 422)
+        metadados['recebido'] = offset + tamanho_parte
+    return situacao(metadados)
+
+
+def concluir_upload(pasta, upload_id):
+    """
+    Confere o arquivo montado e o move para uploads/<id>_<nome>; devolve o caminho
+    """
+    with trava_do_upload(upload_id):
+        metadados = ler_metadados(pasta, upload_id)
+        if metadados['recebido'] != metadados['tamanho']:
+            raise ErroUpload(f"Faltam {metadados['tamanho'] - metadados['recebido']} bytes", 409)
+
+        arquivo_json, parcial = caminhos(pasta, upload_id)
+        if metadados.get('sha256'):
+            resumo = hashlib.sha256()
+            with open(parcial, 'rb') as arquivo:
+                for bloco in iter(lambda: arquivo.read(TAMANHO_BLOCO), b''):
+                    resumo.update(bloco)
+            if resumo.hexdigest() != metadados['sha256']:
+                # Não há como saber qual parte veio errada: recomeça do zero
+                open(parcial, 'wb').close()
+                raise ErroUpload('SHA-256 do arquivo não confere; envie o arquivo de novo', 422)
+
+        caminho = os.path.join(pasta, f"{upload_id}_{metadados['nome']}")
+        os.replace(parcial, caminho)
+        os.remove(arquivo_json)
+    with trava_travas:
+        travas.pop(upload_id, None)
+    return caminho
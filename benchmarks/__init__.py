@@ -0,0 +1,4 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmarks do MegaFarma (executar da raiz do projeto com python -m benchmarks.<nome>)
+"""
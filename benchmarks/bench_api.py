@@ -0,0 +1,377 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark de todas as rotas da API, sem acesso à rede externa
+
+Gera um catálogo sintético (N produtos, M fornecedores, densidade de preços),
+um PDF TOUREIRO com o ReportLab e uma lista CSV de fornecedor, e executa cada
+rota pelo cliente de teste do Flask (no mesmo processo) e por um servidor real
+(python -m api.servidor em outro processo, com clientes concorrentes).
+Mostra latências (p50/p95/p99), requisições por segundo, erros e pico de
+memória (RSS) depois de cada rota
+
+/excluir_fornecedor e /excluir_tabela ficam de fora: apagam os dados das demais
+
+Uso: python -m benchmarks.bench_api [--modo cliente|servidor|ambos]
+     [--produtos N] [--fornecedores M] [--densidade 0.6]
+     [--repeticoes R] [--repeticoes-pesadas R] [--clientes C]
+     [--servidor waitress|gunicorn] [--workers W] [--threads T]
+"""
+
+import argparse
+import csv
+import io
+import itertools
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+import uuid
+
+from benchmarks.carga_servidor import iniciar_servidor, percentil, porta_livre
+from benchmarks.dados_sinteticos import PRINCIPIOS, gerar_catalogo, popular_banco
+from benchmarks.pdf_toureiro import gerar_pdf_toureiro
+
+
+def lista_fornecedor_csv(catalogo, fornecedor_id):
+    """
+    Lista de preços de um fornecedor em CSV (código;descrição;preço)
+    """
+    descricoes = {p[0]: (p[1], p[2]) for p in catalogo['produtos']}
+    saida = io.StringIO()
+    escritor = csv.writer(saida, delimiter=';')
+    escritor.writerow(['Código', 'Descrição', 'Preço'])
+    for produto_id, fornecedor, preco in catalogo['precos']:
+        if fornecedor == fornecedor_id:
+            codigo, descricao = descricoes[produto_id]
+            escritor.writerow([codigo, descricao, f'{preco * 0.97:.2f}'.replace('.', ',')])
+    return saida.getvalue().encode('utf-8')
+
+
+def itens_melhores_precos(catalogo, quantidade=200):
+    """
+    Payload de /relatorio_melhores_precos e /gerar_pdf_pedido
+    """
+    melhores = {}
+    for produto_id, fornecedor_id, preco in catalogo['precos']:
+        if produto_id not in melhores or preco < melhores[produto_id][1]:
+            melhores[produto_id] = (fornecedor_id, preco)
+
+    descricoes = {p[0]: p[2] for p in catalogo['produtos']}
+    nomes = dict(catalogo['fornecedores'])
+    itens = []
+    for produto_id, (fornecedor_id, preco) in list(melhores.items())[:quantidade]:
+        quantidade_item = (produto_id % 5) + 1
+        itens.append({'produto': descricoes[produto_id], 'fornecedor': nomes[fornecedor_id],
+                      'preco': preco, 'quantidade': quantidade_item,
+                      'subtotal': round(preco * quantidade_item, 2)})
+    return {'itens': itens, 'total': round(sum(i['subtotal'] for i in itens), 2)}
+
+
+def montar_rotas(catalogo, formatos):
+    """
+    Lista de (nome, pesada, gerar) — gerar(aleatorio) devolve a requisição:
+    {'metodo', 'caminho', 'json', 'form', 'arquivos': {campo: (nome, bytes)}}
+    """
+    produtos = len(catalogo['produtos'])
+    fornecedores = len(catalogo['fornecedores'])
+    csv_fornecedor = lista_fornecedor_csv(catalogo, 1)
+    melhores = itens_melhores_precos(catalogo)
+    novos = itertools.count(1)
+    sufixo = uuid.uuid4().hex[:6]
+
+    def get(caminho):
+        return lambda aleatorio: {'metodo': 'GET', 'caminho': caminho}
+
+    def post_json(caminho, corpo):
+        return lambda aleatorio: {'metodo': 'POST', 'caminho': caminho, 'json': corpo}
+
+    rotas = [
+        ('GET /', False, get('/')),
+        ('GET /dados_tabela', False, get('/dados_tabela')),
+        ('GET /buscar', False, lambda aleatorio: {
+            'metodo': 'GET', 'caminho': f'/buscar?q={aleatorio.choice(PRINCIPIOS).split()[0]}'}),
+        ('POST /atualizar_preco', False, lambda aleatorio: {
+            'metodo': 'POST', 'caminho': '/atualizar_preco', 'json': {
+                'produto_id': aleatorio.randint(1, produtos),
+                'fornecedor_id': aleatorio.randint(1, fornecedores),
+                'preco': round(aleatorio.uniform(2, 200), 2)}}),
+        ('GET /historico_precos', False, lambda aleatorio: {
+            'metodo': 'GET', 'caminho': f'/historico_precos/{aleatorio.randint(1, produtos)}'}),
+        ('GET /variacoes_preco', False, get('/variacoes_preco?fornecedor_id=1&percentual=5')),
+        ('POST /importar_precos_fornecedor', True, lambda aleatorio: {
+            'metodo': 'POST', 'caminho': '/importar_precos_fornecedor',
+            'form': {'fornecedor_id': '1'},
+            'arquivos': {'arquivo': (f'lista_{aleatorio.getrandbits(32)}.csv', csv_fornecedor)}}),
+        ('POST /gerar_relatorio', True, post_json('/gerar_relatorio', {})),
+        ('POST /exportar_tabela_pdf', True, post_json('/exportar_tabela_pdf', {})),
+        ('POST /relatorio_melhores_precos', True, post_json('/relatorio_melhores_precos', melhores)),
+        ('POST /gerar_pdf_pedido', True, post_json('/gerar_pdf_pedido', melhores)),
+    ]
+    for formato in formatos:
+        rotas.append((f'GET /exportar_tabela/{formato}', True, get(f'/exportar_tabela/{formato}')))
+        rotas.append((f'GET /exportar_melhores_precos/{formato}', True,
+                      get(f'/exportar_melhores_precos/{formato}')))
+    # Por último: cada chamada acrescenta um fornecedor (uma coluna a mais na tabela)
+    rotas.append(('POST /criar_fornecedor', False, lambda aleatorio: {
+        'metodo': 'POST', 'caminho': '/criar_fornecedor',
+        'json': {'nome': f'CARGA {sufixo} {next(novos)}'}}))
+    return rotas
+
+
+def rota_upload(pdf):
+    return lambda aleatorio: {
+        'metodo': 'POST', 'caminho': '/upload_pdf',
+        'arquivos': {'pdf_file': (f'toureiro_{aleatorio.getrandbits(32)}.pdf', pdf)}}
+
+
+def recarregar_catalogo(catalogo):
+    """
+    Volta o banco ao catálogo sintético (o /upload_pdf troca todos os produtos)
+    """
+    from api.armazenamento import reiniciar_sequencias
+    from api.banco import conectar
+
+    conn = conectar()
+    for tabela in ('precos_fornecedores', 'produtos', 'fornecedores'):
+        conn.execute(f'DELETE FROM {tabela}')
+    reiniciar_sequencias(conn, ['produtos', 'fornecedores', 'precos_fornecedores'])
+    popular_banco(conn, catalogo)
+    conn.close()
+
+
+def pico_rss_mb(pid=None):
+    """
+    Pico de memória residente (MB) deste processo ou do processo `pid` e seus
+    filhos (workers do gunicorn); None quando o sistema não informa
+    """
+    if pid is None:
+        try:
+            import resource
+        except ImportError:
+            return None
+        pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux informa em KB e macOS em bytes
+        return pico / (1024 * 1024) if sys.platform == 'darwin' else pico / 1024
+
+    def vm_hwm(processo):
+        try:
+            with open(f'/proc/{processo}/status') as arquivo:
+                for linha in arquivo:
+                    if linha.startswith('VmHWM:'):
+                        return int(linha.split()[1]) / 1024
+        except OSError:
+            return None
+        return None
+
+    total = vm_hwm(pid)
+    if total is None:
+        return None
+    try:
+        with open(f'/proc/{pid}/task/{pid}/children') as arquivo:
+            filhos = arquivo.read().split()
+    except OSError:
+        filhos = []
+    return total + sum(vm_hwm(filho) or 0 for filho in filhos)
+
+
+def multipart(form, arquivos):
+    """
+    Corpo multipart/form-data (para o http.client)
+    """
+    fronteira = uuid.uuid4().hex
+    partes = []
+    for campo, valor in (form or {}).items():
+        partes.append(f'--{fronteira}\r\nContent-Disposition: form-data; name="{campo}"\r\n\r\n'
+                      f'{valor}\r\n'.encode('utf-8'))
+    for campo, (nome, conteudo) in arquivos.items():
+        partes.append(f'--{fronteira}\r\nContent-Disposition: form-data; name="{campo}"; '
+                      f'filename="{nome}"\r\nContent-Type: application/octet-stream\r\n\r\n'
+                      .encode('utf-8') + conteudo + b'\r\n')
+    partes.append(f'--{fronteira}--\r\n'.encode('utf-8'))
+    return b''.join(partes), f'multipart/form-data; boundary={fronteira}'
+
+
+class ClienteTeste:
+    """
+    Executa requisições pelo cliente de teste do Flask, no mesmo processo
+    """
+
+    def __init__(self, app):
+        self.cliente = app.test_client()
+
+    def enviar(self, requisicao):
+        if requisicao.get('arquivos'):
+            dados = dict(requisicao.get('form') or {})
+            for campo, (nome, conteudo) in requisicao['arquivos'].items():
+                dados[campo] = (io.BytesIO(conteudo), nome)
+            resposta = self.cliente.open(requisicao['caminho'], method=requisicao['metodo'],
+                                         data=dados, content_type='multipart/form-data')
+        else:
+            resposta = self.cliente.open(requisicao['caminho'], method=requisicao['metodo'],
+                                         json=requisicao.get('json'))
+        resposta.get_data()
+        resposta.close()
+        return resposta.status_code
+
+
+class ClienteHTTP:
+    """
+    Executa requisições contra o servidor real, com conexão keep-alive
+    """
+
+    def __init__(self, porta):
+        import http.client
+
+        self.http = http.client
+        self.porta = porta
+        self.conexao = None
+
+    def enviar(self, requisicao):
+        if self.conexao is None:
+            self.conexao = self.http.HTTPConnection('127.0.0.1', self.porta, timeout=300)
+
+        cabecalhos = {}
+        corpo = None
+        if requisicao.get('arquivos'):
+            corpo, cabecalhos['Content-Type'] = multipart(requisicao.get('form'),
+                                                          requisicao['arquivos'])
+        elif requisicao.get('json') is not None:
+            corpo = json.dumps(requisicao['json']).encode('utf-8')
+            cabecalhos['Content-Type'] = 'application/json'
+
+        try:
+            self.conexao.request(requisicao['metodo'], requisicao['caminho'],
+                                 body=corpo, headers=cabecalhos)
+            resposta = self.conexao.getresponse()
+            resposta.read()
+            return resposta.status
+        except (OSError, self.http.HTTPException):
+            self.fechar()
+            return None
+
+    def fechar(self):
+        if self.conexao is not None:
+            self.conexao.close()
+            self.conexao = None
+
+
+def medir(criar_cliente, gerar, repeticoes, clientes):
+    """
+    Divide as repetições entre `clientes` threads; devolve (latências ms, erros, duração s)
+    """
+    latencias = []
+    erros = [0]
+    trava = threading.Lock()
+
+    def executar(quantidade, semente):
+        aleatorio = random.Random(semente)
+        cliente = criar_cliente()
+        for _ in range(quantidade):
+            requisicao = gerar(aleatorio)
+            inicio = time.perf_counter()
+            status = cliente.enviar(requisicao)
+            decorrido = (time.perf_counter() - inicio) * 1000
+            with trava:
+                if status == 200:
+                    latencias.append(decorrido)
+                else:
+                    erros[0] += 1
+        if hasattr(cliente, 'fechar'):
+            cliente.fechar()
+
+    clientes = max(1, min(clientes, repeticoes))
+    partes = [repeticoes // clientes + (1 if i < repeticoes % clientes else 0) for i in range(clientes)]
+    threads = [threading.Thread(target=executar, args=(quantidade, i))
+               for i, quantidade in enumerate(partes)]
+    inicio = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return sorted(latencias), erros[0], time.perf_counter() - inicio
+
+
+def relatar(nome, latencias, erros, duracao, rss):
+    rss_texto = f'{rss:7.1f}' if rss is not None else '      -'
+    print(f"  {nome:<38} {len(latencias):>5} {percentil(latencias, 0.50):>9.1f} "
+          f"{percentil(latencias, 0.95):>9.1f} {percentil(latencias, 0.99):>9.1f} "
+          f"{len(latencias) / duracao if duracao else 0:>8.1f} {erros:>6} {rss_texto}")
+
+
+def executar_rotas(titulo, criar_cliente, catalogo, pdf, formatos, opcoes, clientes, pid=None):
+    print(f"\n{titulo}")
+    print(f"  {'rota':<38} {'n':>5} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} "
+          f"{'req/s':>8} {'erros':>6} {'RSS MB':>7}")
+
+    recarregar_catalogo(catalogo)
+    # O mesmo arquivo gravado por duas requisições ao mesmo tempo: upload sempre sequencial
+    relatar('POST /upload_pdf', *medir(criar_cliente, rota_upload(pdf), opcoes.repeticoes_pesadas, 1),
+            pico_rss_mb(pid))
+    recarregar_catalogo(catalogo)
+
+    for nome, pesada, gerar in montar_rotas(catalogo, formatos):
+        repeticoes = opcoes.repeticoes_pesadas if pesada else opcoes.repeticoes
+        relatar(nome, *medir(criar_cliente, gerar, repeticoes, clientes), pico_rss_mb(pid))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--modo', choices=('cliente', 'servidor', 'ambos'), default='ambos')
+    parser.add_argument('--produtos', type=int, default=1000)
+    parser.add_argument('--fornecedores', type=int, default=5)
+    parser.add_argument('--densidade', type=float, default=0.6,
+                        help='fração dos produtos com preço de cada fornecedor')
+    parser.add_argument('--repeticoes', type=int, default=50,
+                        help='requisições por rota leve')
+    parser.add_argument('--repeticoes-pesadas', type=int, default=5,
+                        help='requisições por rota de PDF, importação ou exportação')
+    parser.add_argument('--clientes', type=int, default=4,
+                        help='clientes concorrentes no modo servidor')
+    parser.add_argument('--servidor', default='waitress', choices=('waitress', 'gunicorn'))
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--threads', type=int, default=8)
+    opcoes = parser.parse_args()
+
+    pasta = tempfile.mkdtemp(prefix='megafarma_bench_')
+    url = 'sqlite:///' + os.path.join(pasta, 'megafarma.db')
+    os.environ['DATABASE_URL'] = url
+
+    from api.banco import init_db
+    from api.exportacao import formatos_disponiveis
+
+    init_db()
+    catalogo = gerar_catalogo(opcoes.produtos, opcoes.fornecedores, opcoes.densidade)
+    inicio = time.perf_counter()
+    pdf = gerar_pdf_toureiro(catalogo['produtos'])
+    print(f"Catálogo: {opcoes.produtos} produtos x {opcoes.fornecedores} fornecedores, "
+          f"{len(catalogo['precos'])} preços | PDF TOUREIRO de {len(pdf) / 1024:.0f} KB "
+          f"gerado em {time.perf_counter() - inicio:.1f} s | banco em {url}")
+    formatos = formatos_disponiveis()
+
+    if opcoes.modo in ('cliente', 'ambos'):
+        from api.app import create_app
+
+        app = create_app()
+        app.config['UPLOAD_FOLDER'] = pasta
+        executar_rotas('Cliente de teste do Flask (1 cliente, mesmo processo)',
+                       lambda: ClienteTeste(app), catalogo, pdf, formatos, opcoes, 1)
+
+    if opcoes.modo in ('servidor', 'ambos'):
+        porta = porta_livre()
+        ambiente = dict(os.environ, DATABASE_URL=url)
+        processo = iniciar_servidor(opcoes, porta, ambiente)
+        try:
+            executar_rotas(f'Servidor {opcoes.servidor} ({opcoes.workers} worker(s), '
+                           f'{opcoes.threads} thread(s), {opcoes.clientes} clientes)',
+                           lambda: ClienteHTTP(porta), catalogo, pdf, formatos, opcoes,
+                           opcoes.clientes, pid=processo.pid)
+        finally:
+            processo.terminate()
+            processo.wait(timeout=30)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark das cotações (versões da tabela com cópia na escrita)
+
+Popula um banco SQLite temporário com P produtos e F fornecedores, registra
+N cotações alterando uma fração dos preços entre elas e mede o registro, as
+linhas gravadas (contra N cópias inteiras) e a leitura da matriz de preços
+da cotação mais recente, da mais antiga e da tabela atual. Cada cotação
+lida é conferida contra os preços que a tabela tinha ao ser registrada, e a
+busca por um produto acentuado ("acido" em "ÁCIDO ACETILSALICÍLICO") na
+cotação contra a mesma busca na tabela atual
+
+Uso: python -m benchmarks.bench_cotacoes [--produtos 20000] [--cotacoes 20] [--alteracao 0.05]
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+import api.banco
+from api.banco import conectar, init_db
+from benchmarks.bench_matriz_precos import cronometrar, popular
+
+
+def alterar_precos(fracao, semente):
+    aleatorio = random.Random(semente)
+    conn = conectar()
+    linhas = conn.execute('SELECT id FROM precos_fornecedores').fetchall()
+    alteradas = aleatorio.sample(linhas, int(len(linhas) * fracao))
+    conn.executemany('UPDATE precos_fornecedores SET preco = ? WHERE id = ?',
+                     ((round(aleatorio.uniform(2, 200), 2), linha[0]) for linha in alteradas))
+    conn.commit()
+    conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--produtos', type=int, default=20000)
+    parser.add_argument('--fornecedores', type=int, default=30)
+    parser.add_argument('--cotacoes', type=int, default=20)
+    parser.add_argument('--alteracao', type=float, default=0.05,
+                        help='fração dos preços alterada entre duas cotações')
+    opcoes = parser.parse_args()
+
+    pasta = tempfile.mkdtemp(prefix='megafarma_cotacoes_')
+    os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(pasta, 'megafarma.db')
+    api.banco.backend_atual = None
+    init_db()
+    popular(opcoes.produtos, opcoes.fornecedores, 0.6)
+    conn = conectar()
+    conn.execute('INSERT INTO produtos (descricao, preco_toureiro, codigo) VALUES (?, ?, ?)',
+                 ('ÁCIDO ACETILSALICÍLICO 500MG', 9.9, 'ACENTO'))
+    conn.commit()
+    conn.close()
+
+    from api.busca import buscar_produtos
+    from api.cotacoes import registrar_cotacao
+    from api.matriz_precos import montar_matriz
+
+    print(f"{opcoes.produtos} produtos x {opcoes.fornecedores} fornecedores, "
+          f"{opcoes.cotacoes} cotações com {opcoes.alteracao:.0%} dos preços alterados entre elas")
+
+    tempos, esperadas = [], {}
+    for rodada in range(opcoes.cotacoes):
+        if rodada:
+            alterar_precos(opcoes.alteracao, rodada)
+        conn = conectar()
+        inicio = time.perf_counter()
+        cotacao = registrar_cotacao(conn, 'manual')
+        conn.commit()
+        tempos.append((time.perf_counter() - inicio) * 1000)
+        if rodada in (0, opcoes.cotacoes - 1):
+            esperadas[cotacao] = montar_matriz(conn)
+        conn.close()
+    print(f"  registro: primeira {tempos[0]:.0f} ms | demais em média "
+          f"{sum(tempos[1:]) / max(len(tempos) - 1, 1):.0f} ms")
+
+    conn = conectar()
+    gravadas = conn.execute('SELECT COUNT(*) FROM cotacao_precos').fetchone()[0]
+    por_cotacao = conn.execute('SELECT COUNT(*) FROM precos_fornecedores').fetchone()[0] \
+        + opcoes.produtos
+    print(f"  linhas gravadas: {gravadas} (cópias inteiras: {por_cotacao * opcoes.cotacoes}, "
+          f"{gravadas / (por_cotacao * opcoes.cotacoes):.1%})")
+
+    confere = True
+    primeira, ultima = min(esperadas), max(esperadas)
+    cronometrar('matriz da tabela atual', lambda: montar_matriz(conn), 3)
+    for nome, cotacao in (('mais recente', ultima), ('mais antiga', primeira)):
+        matriz = cronometrar(f'matriz da cotação {nome}',
+                             lambda: montar_matriz(conn, cotacao=cotacao), 3)
+        esperada = esperadas[cotacao]
+        confere = confere and (matriz.descricoes == esperada.descricoes
+                               and matriz.colunas == esperada.colunas
+                               and ((matriz.precos == esperada.precos)
+                                    | ((matriz.precos != matriz.precos)
+                                       & (esperada.precos != esperada.precos))).all())
+
+    atual = [p['descricao'] for p in buscar_produtos(conn, 'acido acetil')]
+    encontrados = cronometrar('busca "acido acetil" na cotação mais antiga (LIKE)',
+                              lambda: buscar_produtos(conn, 'acido acetil', cotacao=primeira), 3)
+    confere = confere and atual == [p['descricao'] for p in encontrados] == [
+        'ÁCIDO ACETILSALICÍLICO 500MG']
+    conn.close()
+    print(f"  cotações iguais à tabela registrada e busca sem acentos: "
+          f"{'sim' if confere else 'NÃO'}")
+
+    if not confere:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
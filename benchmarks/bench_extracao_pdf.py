@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark da extração do PDF TOUREIRO: páginas por segundo de cada modo
+
+Gera PDFs sintéticos (uma coluna, como o TOUREIRO, com os campos em
+colunas separadas, com o código em negrito uns décimos de ponto abaixo da
+linha e com cabeçalho, rodapé, capa e página final) e mede extrair_dados_pdf nos modos tabelas e palavras,
+conferindo se os produtos extraídos são os do catálogo; sai com erro se o
+modo palavras (o padrão) não confere em algum layout
+
+Uso: python -m benchmarks.bench_extracao_pdf [--paginas 10 50] [--repeticoes N]
+"""
+
+import argparse
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+from api.extracao_pdf import MODOS, extrair_dados_pdf
+from benchmarks.dados_sinteticos import gerar_catalogo
+from benchmarks.pdf_toureiro import LINHAS_POR_PAGINA, gerar_pdf_toureiro
+
+LAYOUTS = {'uma coluna': {}, 'colunas': {'colunas': True}, 'moldura': {'moldura': True},
+           'deslocado': {'colunas': True, 'deslocamento': 0.4}}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--paginas', type=int, nargs='+', default=[10, 50])
+    parser.add_argument('--repeticoes', type=int, default=3)
+    opcoes = parser.parse_args()
+
+    # Só o resumo final interessa aqui
+    logging.getLogger('api').setLevel(logging.WARNING)
+
+    pasta = tempfile.mkdtemp(prefix='megafarma_extracao_')
+    falhas = []
+    print(f"{'layout':<12} {'páginas':>7} {'modo':<9} {'produtos':>8} {'confere':>8} "
+          f"{'segundos':>9} {'pág/s':>7}")
+
+    for paginas in opcoes.paginas:
+        catalogo = gerar_catalogo(paginas * LINHAS_POR_PAGINA, 1)
+        esperado = [{'codigo': codigo, 'descricao': descricao, 'preco': preco}
+                    for _, codigo, descricao, preco in catalogo['produtos']]
+
+        for numero, (layout, opcoes_pdf) in enumerate(LAYOUTS.items()):
+            caminho = os.path.join(pasta, f'toureiro_{paginas}_{numero}.pdf')
+            with open(caminho, 'wb') as arquivo:
+                arquivo.write(gerar_pdf_toureiro(catalogo['produtos'], **opcoes_pdf))
+
+            for modo in MODOS:
+                tempos = []
+                for _ in range(opcoes.repeticoes):
+                    inicio = time.perf_counter()
+                    produtos = extrair_dados_pdf(caminho, modo)
+                    tempos.append(time.perf_counter() - inicio)
+                segundos = statistics.median(tempos)
+                if modo == 'palavras' and produtos != esperado:
+                    falhas.append(f'{layout} ({paginas} páginas)')
+                print(f"{layout:<12} {paginas:>7} {modo:<9} {len(produtos):>8} "
+                      f"{'sim' if produtos == esperado else 'não':>8} {segundos:>9.2f} "
+                      f"{paginas / segundos:>7.1f}")
+
+    if falhas:
+        print(f"Modo palavras não confere: {', '.join(falhas)}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
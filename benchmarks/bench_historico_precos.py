@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark do histórico de preços com milhões de linhas
+
+Gera um histórico sintético (produtos x fornecedores ao longo de dois anos)
+e mede tamanho em disco por linha, consultas de série por produto, tendência
+mensal, variações de um fornecedor no último mês e inclusão de uma lista nova
+
+Uso: python -m benchmarks.bench_historico_precos [--linhas N] [--produtos P] [--fornecedores F]
+"""
+
+import argparse
+import os
+import random
+import sqlite3
+import statistics
+import tempfile
+import time
+
+from api.historico_precos import (criar_tabelas_historico, historico_produto, registrar_precos,
+                                  tendencia_produto, variacoes_preco)
+
+DOIS_ANOS = 2 * 365 * 24 * 3600
+
+
+def cronometrar(nome, funcao, argumentos):
+    latencias = []
+    for argumento in argumentos:
+        inicio = time.perf_counter()
+        funcao(argumento)
+        latencias.append((time.perf_counter() - inicio) * 1000)
+    latencias.sort()
+    print(f"  {nome}: média {statistics.mean(latencias):.2f} ms | "
+          f"p95 {latencias[int(len(latencias) * 0.95)]:.2f} ms ({len(latencias)} consultas)")
+
+
+def popular(conn, linhas, produtos, fornecedores, agora):
+    conn.executemany('INSERT INTO produtos (id, descricao, preco_toureiro, codigo) VALUES (?, ?, ?, ?)',
+                     ((i, f'PRODUTO {i}', 10.0, str(i)) for i in range(1, produtos + 1)))
+    conn.executemany('INSERT INTO fornecedores (id, nome) VALUES (?, ?)',
+                     ((i, f'FORNECEDOR {i}') for i in range(1, fornecedores + 1)))
+    conn.executemany('INSERT INTO historico_produtos (id, chave, descricao) VALUES (?, ?, ?)',
+                     ((i, f'C:{i}', f'PRODUTO {i}') for i in range(1, produtos + 1)))
+    conn.executemany('INSERT INTO historico_fornecedores (id, nome) VALUES (?, ?)',
+                     ((i, f'FORNECEDOR {i}') for i in range(1, fornecedores + 1)))
+
+    aleatorio = random.Random(3)
+    inicio = agora - DOIS_ANOS
+
+    def gerar():
+        # Linhas em ordem cronológica, como chegam na aplicação
+        for n in range(linhas):
+            yield (aleatorio.randint(1, produtos), aleatorio.randint(0, fornecedores),
+                   aleatorio.randint(100, 50000), inicio + n * DOIS_ANOS // linhas,
+                   aleatorio.randint(1, 3))
+
+    conn.executemany('''
+        INSERT INTO historico_precos (produto, fornecedor, preco, registrado_em, origem)
+        VALUES (?, ?, ?, ?, ?)
+    ''', gerar())
+    conn.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--linhas', type=int, default=2000000)
+    parser.add_argument('--produtos', type=int, default=20000)
+    parser.add_argument('--fornecedores', type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as pasta:
+        caminho = os.path.join(pasta, 'historico.db')
+        conn = sqlite3.connect(caminho)
+        conn.executescript('''
+            CREATE TABLE produtos (id INTEGER PRIMARY KEY, descricao TEXT, preco_toureiro REAL, codigo TEXT);
+            CREATE TABLE fornecedores (id INTEGER PRIMARY KEY, nome TEXT UNIQUE);
+            CREATE TABLE precos_fornecedores (produto_id INTEGER, fornecedor_id INTEGER, preco REAL,
+                                              UNIQUE (produto_id, fornecedor_id));
+        ''')
+        criar_tabelas_historico(conn)
+        agora = int(time.time())
+
+        inicio = time.perf_counter()
+        popular(conn, args.linhas, args.produtos, args.fornecedores, agora)
+        duracao = time.perf_counter() - inicio
+        tamanho = os.path.getsize(caminho)
+        print(f"Histórico: {args.linhas} linhas gravadas em {duracao:.1f} s "
+              f"({args.linhas / duracao:.0f} linhas/s)")
+        print(f"  tamanho: {tamanho / 1024 / 1024:.1f} MB ({tamanho / args.linhas:.1f} bytes/linha, "
+              f"com índices)")
+
+        aleatorio = random.Random(5)
+        amostra = [aleatorio.randint(1, args.produtos) for _ in range(500)]
+        um_ano = agora - DOIS_ANOS // 2
+
+        print()
+        cronometrar('série completa do produto', lambda p: historico_produto(conn, p), amostra)
+        cronometrar('série do último ano', lambda p: historico_produto(conn, p, inicio=um_ano), amostra)
+        cronometrar('tendência mensal', lambda p: tendencia_produto(conn, p, 'mes'), amostra)
+        cronometrar('variações de um fornecedor (30 dias, >= 20%)',
+                    lambda f: variacoes_preco(conn, agora - 30 * 24 * 3600, None, f, 20.0),
+                    range(1, args.fornecedores + 1))
+
+        precos = {p: aleatorio.randint(100, 50000) / 100 for p in range(1, min(args.produtos, 10000) + 1)}
+        inicio = time.perf_counter()
+        with conn:
+            novas = registrar_precos(conn, 1, precos, 'importacao', momento=agora)
+        print(f"  inclusão de lista com {len(precos)} preços: "
+              f"{(time.perf_counter() - inicio) * 1000:.0f} ms ({novas} linhas novas)")
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark do tempo de importação (partida a frio) do aplicativo
+
+Executa "python -X importtime -c 'import api.app'" em processos novos, soma o
+tempo acumulado do módulo, lista os pacotes mais caros e verifica que as
+dependências pesadas (pdfplumber, pdfminer, Pillow, ReportLab) não são
+carregadas na partida, só nas rotas de importação e relatórios
+
+Uso: python -m benchmarks.bench_importacao [--repeticoes N] [--limite-ms MS]
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MODULO_APP = 'api.app'
+PESADOS = ('pdfplumber', 'pdfminer', 'PIL', 'reportlab')
+
+
+def importar(modulo):
+    """
+    Importa o módulo em um interpretador novo e devolve {módulo: (próprio, acumulado)} em µs
+    """
+    resultado = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {modulo}'],
+                               cwd=RAIZ, capture_output=True, text=True, check=True)
+    tempos = {}
+    for linha in resultado.stderr.splitlines():
+        if not linha.startswith('import time:') or 'self [us]' in linha:
+            continue
+        proprio, acumulado, nome = linha[len('import time:'):].split('|')
+        tempos[nome.strip()] = (int(proprio), int(acumulado))
+    return tempos
+
+
+def medir(modulo, repeticoes):
+    totais = []
+    for _ in range(repeticoes):
+        tempos = importar(modulo)
+        totais.append(tempos[modulo][1] / 1000)
+    return statistics.median(totais), tempos
+
+
+def pacotes_mais_caros(tempos, quantidade=10):
+    """
+    Soma o tempo próprio de cada pacote de primeiro nível
+    """
+    por_pacote = {}
+    for nome, (proprio, _) in tempos.items():
+        pacote = nome.split('.')[0]
+        por_pacote[pacote] = por_pacote.get(pacote, 0) + proprio
+    return sorted(por_pacote.items(), key=lambda item: item[1], reverse=True)[:quantidade]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--repeticoes', type=int, default=5)
+    parser.add_argument('--limite-ms', type=float,
+                        help='falha (código 1) se a importação do app passar deste tempo')
+    args = parser.parse_args()
+
+    banco = os.path.join(RAIZ, 'megafarma.db')
+    banco_existia = os.path.exists(banco)
+
+    try:
+        mediana, tempos = medir(MODULO_APP, args.repeticoes)
+        print(f"import {MODULO_APP}: mediana {mediana:.1f} ms em {args.repeticoes} processos "
+              f"({len(tempos)} módulos)")
+
+        print("\nPacotes mais caros (tempo próprio):")
+        for pacote, proprio in pacotes_mais_caros(tempos):
+            print(f"  {pacote:<24} {proprio / 1000:8.1f} ms")
+
+        carregados = [p for p in PESADOS if any(n == p or n.startswith(p + '.') for n in tempos)]
+        print("\nDependências pesadas carregadas na partida:",
+              ', '.join(carregados) if carregados else 'nenhuma')
+
+        print("\nCusto adiado para as rotas que usam cada dependência:")
+        for modulo in ('pdfplumber', 'reportlab.platypus'):
+            custo, _ = medir(modulo, args.repeticoes)
+            print(f"  import {modulo:<20} {custo:8.1f} ms")
+    finally:
+        if not banco_existia and os.path.exists(banco):
+            os.remove(banco)
+
+    if carregados or (args.limite_ms and mediana > args.limite_ms):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
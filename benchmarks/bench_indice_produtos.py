@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark do índice de casamento aproximado de produtos
+
+Casa 10 mil linhas reescritas "como fornecedor" contra 50 mil produtos e
+mede tempo de construção, latência por consulta e acerto top-1/top-5
+
+Uso: python -m benchmarks.bench_indice_produtos [--produtos N] [--linhas M] [--fts]
+"""
+
+import argparse
+import random
+import sqlite3
+import statistics
+import time
+
+from api.indice_produtos import IndiceFTS, IndiceProdutos
+from benchmarks.dados_sinteticos import gerar_descricoes, reescrever_como_fornecedor
+
+
+def percentil(valores, p):
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(len(ordenados) * p))]
+
+
+def medir(nome, buscar, consultas):
+    latencias = []
+    acertos_top1 = acertos_top5 = 0
+
+    for texto, esperado in consultas:
+        inicio = time.perf_counter()
+        candidatos = buscar(texto)
+        latencias.append((time.perf_counter() - inicio) * 1000)
+
+        ids = [produto_id for produto_id, _ in candidatos]
+        acertos_top1 += bool(ids) and ids[0] == esperado
+        acertos_top5 += esperado in ids
+
+    total = len(consultas)
+    print(f"\n[{nome}]")
+    print(f"  latência média: {statistics.mean(latencias):.3f} ms")
+    print(f"  p50: {percentil(latencias, 0.50):.3f} ms | p95: {percentil(latencias, 0.95):.3f} ms"
+          f" | p99: {percentil(latencias, 0.99):.3f} ms")
+    print(f"  vazão: {total / (sum(latencias) / 1000):.0f} consultas/s")
+    print(f"  acerto top-1: {acertos_top1 / total:.1%} | top-5: {acertos_top5 / total:.1%}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--produtos', type=int, default=50000)
+    parser.add_argument('--linhas', type=int, default=10000)
+    parser.add_argument('--fts', action='store_true', help='mede também o índice FTS5')
+    args = parser.parse_args()
+
+    descricoes = gerar_descricoes(args.produtos)
+    produtos = list(enumerate(descricoes, start=1))
+
+    aleatorio = random.Random(7)
+    amostra = aleatorio.sample(produtos, args.linhas)
+    consultas = [(reescrever_como_fornecedor(d, aleatorio), produto_id) for produto_id, d in amostra]
+
+    inicio = time.perf_counter()
+    indice = IndiceProdutos(produtos)
+    print(f"Índice em memória: {len(indice)} produtos construídos em "
+          f"{time.perf_counter() - inicio:.2f} s ({len(indice.produtos_por_palavra)} palavras)")
+
+    medir('índice em memória', lambda t: indice.buscar(t, k=5), consultas)
+
+    if args.fts:
+        conn = sqlite3.connect(':memory:')
+        conn.execute('CREATE TABLE produtos (id INTEGER PRIMARY KEY, descricao TEXT, codigo TEXT)')
+        conn.executemany('INSERT INTO produtos (id, descricao) VALUES (?, ?)', produtos)
+        inicio = time.perf_counter()
+        fts = IndiceFTS(conn)
+        print(f"\nÍndice FTS5 construído em {time.perf_counter() - inicio:.2f} s")
+        medir('FTS5 (bm25, prefixos)', lambda t: fts.buscar(t, k=5), consultas)
+
+
+if __name__ == '__main__':
+    main()
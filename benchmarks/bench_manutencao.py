@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark da manutenção do banco SQLite (api.manutencao)
+
+Popula um banco SQLite temporário com P produtos, apaga parte deles para
+deixar páginas livres e mede a manutenção com e sem cópia de segurança,
+conferindo que o vacuum devolve as páginas livres: num banco com auto_vacuum
+incremental elas precisam zerar, e num banco antigo (sem auto_vacuum) o
+VACUUM completo precisa convertê-lo e zerá-las
+
+Uso: python -m benchmarks.bench_manutencao [--produtos 50000]
+"""
+
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+
+import api.banco
+from api.banco import conectar, init_db
+from benchmarks.dados_sinteticos import gerar_descricoes
+
+
+def fragmentar(produtos, mantidos=2):
+    """
+    Insere os produtos e mantém 1 a cada `mantidos`, deixando páginas livres no meio do arquivo
+    """
+    conn = conectar()
+    conn.executemany('INSERT INTO produtos (descricao, preco_toureiro) VALUES (?, ?)',
+                     ((descricao, 10.0) for descricao in gerar_descricoes(produtos)))
+    conn.commit()
+    conn.execute('DELETE FROM produtos WHERE id % ? <> 0', (mantidos,))
+    conn.commit()
+    conn.close()
+
+
+def usar_banco(caminho):
+    os.environ['DATABASE_URL'] = 'sqlite:///' + caminho
+    api.banco.backend_atual = None
+    init_db()
+
+
+def rodar(nome, backup, pasta):
+    from api.manutencao import executar_manutencao
+
+    resultado = executar_manutencao(backup=backup, pasta=pasta)
+    antes, depois, etapas = resultado['antes'], resultado['depois'], resultado['etapas']
+    copia = etapas.get('backup')
+    print(f"  {nome}: {antes['paginas_livres']} -> {depois['paginas_livres']} páginas livres "
+          f"({antes['bytes'] / 1e6:.1f} -> {depois['bytes'] / 1e6:.1f} MB, vacuum {etapas['vacuum']}, "
+          f"{etapas['vacuum_segundos'] * 1000:.0f} ms)"
+          + (f" | cópia {copia['segundos'] * 1000:.0f} ms" if copia else ''))
+    return antes, depois
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--produtos', type=int, default=50000)
+    opcoes = parser.parse_args()
+
+    pasta = tempfile.mkdtemp(prefix='megafarma_manutencao_')
+    backups = os.path.join(pasta, 'backups')
+    confere = True
+
+    # Banco criado pelo init_db: auto_vacuum incremental
+    usar_banco(os.path.join(pasta, 'megafarma.db'))
+    fragmentar(opcoes.produtos)
+    antes, depois = rodar('incremental com cópia', True, backups)
+    confere = confere and antes['paginas_livres'] > 0 and depois['paginas_livres'] == 0
+    fragmentar(opcoes.produtos)
+    antes, depois = rodar('incremental sem cópia', False, backups)
+    confere = confere and antes['paginas_livres'] > 0 and depois['paginas_livres'] == 0
+
+    # Banco antigo, criado sem auto_vacuum
+    # (uma tabela criada antes do init_db fixa o modo no arquivo)
+    antigo = os.path.join(pasta, 'antigo.db')
+    conn = sqlite3.connect(antigo)
+    conn.execute('CREATE TABLE anterior (id INTEGER)')
+    conn.close()
+    usar_banco(antigo)
+    # Acima de LIMITE_FRAGMENTACAO, para o VACUUM completo rodar
+    fragmentar(opcoes.produtos, mantidos=10)
+    antes, depois = rodar('antigo sem auto_vacuum', False, backups)
+    confere = confere and (antes['auto_vacuum'] == 'nenhum' and depois['auto_vacuum'] == 'incremental'
+                           and depois['paginas_livres'] == 0)
+
+    print(f"  páginas livres devolvidas: {'sim' if confere else 'NÃO'}")
+    if not confere:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark da matriz de preços (NumPy) contra o cálculo linha a linha
+
+Popula um banco SQLite temporário com P produtos e F fornecedores (cada
+fornecedor cota uma fração dos produtos) e mede a montagem da matriz, a
+consulta com a matriz em cache, a análise vetorizada e o resumo do /analise.
+O resultado é conferido contra linhas_melhores_precos (exportação), que
+percorre os preços em Python; depois uma gravação por outra conexão deve
+invalidar o cache
+
+Uso: python -m benchmarks.bench_matriz_precos [--produtos 50000] [--fornecedores 30]
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+import api.banco
+from api.banco import conectar, init_db
+
+
+def cronometrar(nome, funcao, repeticoes=5):
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        resultado = funcao()
+        tempos.append((time.perf_counter() - inicio) * 1000)
+    print(f"  {nome}: melhor {min(tempos):.1f} ms | primeira {tempos[0]:.1f} ms")
+    return resultado
+
+
+def popular(produtos, fornecedores, cobertura):
+    aleatorio = random.Random(7)
+    conn = conectar()
+    conn.executemany('INSERT INTO produtos (id, descricao, preco_toureiro, codigo) VALUES (?, ?, ?, ?)',
+                     ((i, f'PRODUTO {i:06d}', round(aleatorio.uniform(2, 200), 2), str(i))
+                      for i in range(1, produtos + 1)))
+    conn.executemany('INSERT INTO fornecedores (id, nome) VALUES (?, ?)',
+                     ((i, f'FORNECEDOR {i:02d}') for i in range(1, fornecedores + 1)))
+
+    def precos():
+        for produto in range(1, produtos + 1):
+            for fornecedor in range(1, fornecedores + 1):
+                if aleatorio.random() < cobertura:
+                    # Alguns preços zerados (sem cotação), como na tabela da interface
+                    preco = 0 if aleatorio.random() < 0.02 else round(aleatorio.uniform(2, 200), 2)
+                    yield produto, fornecedor, preco
+
+    conn.executemany('INSERT INTO precos_fornecedores (produto_id, fornecedor_id, preco) '
+                     'VALUES (?, ?, ?)', precos())
+    conn.commit()
+    conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--produtos', type=int, default=50000)
+    parser.add_argument('--fornecedores', type=int, default=30)
+    parser.add_argument('--cobertura', type=float, default=0.6,
+                        help='fração dos produtos cotada por fornecedor')
+    opcoes = parser.parse_args()
+
+    pasta = tempfile.mkdtemp(prefix='megafarma_matriz_')
+    os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(pasta, 'megafarma.db')
+    api.banco.backend_atual = None
+    init_db()
+    popular(opcoes.produtos, opcoes.fornecedores, opcoes.cobertura)
+
+    import api.matriz_precos as matriz_precos
+    from api.exportacao import linhas_melhores_precos
+
+    print(f"{opcoes.produtos} produtos x {opcoes.fornecedores} fornecedores "
+          f"(cobertura {opcoes.cobertura:.0%})")
+
+    def montar():
+        matriz_precos.matriz_atual = None
+        return matriz_precos.obter_matriz()
+
+    cronometrar('montagem da matriz (banco -> NumPy)', montar, 3)
+    matriz = cronometrar('matriz em cache (PRAGMA data_version)', matriz_precos.obter_matriz)
+    analise = cronometrar('análise vetorizada', lambda: matriz_precos.analisar(matriz))
+    cronometrar('resumo do /analise (100 itens)',
+                lambda: matriz_precos.resumo_analise(matriz, analise))
+
+    def linha_a_linha():
+        conn = conectar()
+        try:
+            return list(linhas_melhores_precos(conn))[1:]
+        finally:
+            conn.close()
+
+    linhas = cronometrar('linhas_melhores_precos (Python)', linha_a_linha, 3)
+
+    indices = analise['comparaveis'].nonzero()[0].tolist()
+    vetorizado = [(matriz.descricoes[i], matriz.colunas[analise['melhor'][i]],
+                   round(float(analise['menor'][i]), 4)) for i in indices]
+    esperado = [(descricao, fornecedor, round(menor, 4))
+                for descricao, fornecedor, menor, _, _ in linhas]
+    confere = vetorizado == esperado
+    print(f"  resultados iguais: {'sim' if confere else 'NÃO'} ({len(indices)} produtos)")
+
+    conn = conectar()
+    conn.execute('UPDATE precos_fornecedores SET preco = preco + 1 WHERE id = 1')
+    conn.commit()
+    conn.close()
+    invalidada = matriz_precos.obter_matriz() is not matriz
+    print(f"  cache invalidado após gravação: {'sim' if invalidada else 'NÃO'}")
+
+    if not (confere and invalidada):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark da otimização do pedido (pedido mínimo e frete por fornecedor)
+
+Instâncias sintéticas: o TOUREIRO (sem condições) tem preço para todos os
+itens e cada fornecedor cota uma fração deles, com pedido mínimo na ordem
+do que lhe caberia pelo menor preço (parte dos fornecedores fica abaixo).
+As pequenas são conferidas contra a busca exaustiva (ótimo exato); nas
+grandes, mede o tempo e compara o custo com o menor preço item a item e
+com apenas o conserto dos mínimos, sem a busca local
+
+Também confere, em milhares de instâncias mínimas (até 5 itens x 4
+fornecedores, todos podendo ter pedido mínimo) contra a busca exaustiva,
+que a busca local nunca deixa abaixo do mínimo um plano consertado e que
+nenhum plano sai abaixo do ótimo; sai com erro se alguma falhar
+
+Uso: python -m benchmarks.bench_otimizacao_pedido [--itens 1000 5000] [--fornecedores 30]
+"""
+
+import argparse
+import itertools
+import statistics
+import sys
+import time
+
+import numpy as np
+
+from api.otimizacao_pedido import Plano, otimizar, reparar
+
+
+def gerar_instancia(itens, fornecedores, semente, cobertura=0.6):
+    aleatorio = np.random.default_rng(semente)
+    colunas = fornecedores + 1
+    precos = aleatorio.uniform(2, 200, (itens, colunas))
+    precos[aleatorio.random((itens, colunas)) > cobertura] = np.nan
+    precos[:, 0] = aleatorio.uniform(2, 220, itens)
+    quantidades = aleatorio.integers(1, 20, itens).astype(np.float64)
+    demanda = np.nanmin(quantidades[:, None] * precos, axis=1).sum()
+    minimos = aleatorio.uniform(0.3, 2.5, colunas) * demanda / colunas
+    fretes = aleatorio.uniform(0, 60, colunas)
+    minimos[0] = fretes[0] = 0
+    return precos, quantidades, minimos, fretes
+
+
+def gerar_minima(semente):
+    """Até 5 itens x 4 fornecedores; o primeiro nem sempre tem preço nem fica sem condições"""
+    aleatorio = np.random.default_rng(semente)
+    itens, colunas = aleatorio.integers(2, 6), aleatorio.integers(2, 5)
+    precos = np.round(aleatorio.uniform(2, 20, (itens, colunas)), 2)
+    precos[aleatorio.random((itens, colunas)) > 0.6] = np.nan
+    precos[np.isnan(precos).all(axis=1), 0] = 10
+    quantidades = aleatorio.integers(1, 6, itens).astype(np.float64)
+    minimos = np.round(aleatorio.uniform(0, 80, colunas) * (aleatorio.random(colunas) < 0.7))
+    fretes = np.round(aleatorio.uniform(0, 20, colunas))
+    if aleatorio.random() < 0.5:
+        minimos[0] = fretes[0] = 0
+    return precos, quantidades, minimos, fretes
+
+
+def conferir_viabilidade(instancias):
+    """
+    Busca exaustiva em instâncias mínimas; devolve (consertos desfeitos, abaixo do ótimo,
+    sem plano dentro dos mínimos havendo um)
+    """
+    desfeitos = abaixo_do_otimo = inviaveis = 0
+    for semente in range(instancias):
+        precos, quantidades, minimos, fretes = gerar_minima(semente)
+        exato = otimo_exato(precos, quantidades, minimos, fretes)
+        custos = quantidades[:, None] * precos
+        custos[np.isnan(custos)] = np.inf
+        consertado, _ = reparar(Plano(custos, minimos, fretes, custos.argmin(axis=1)))
+        resultado = otimizar(precos, quantidades, minimos, fretes)
+        if resultado['pendentes']:
+            desfeitos += not len(consertado.abaixo_do_minimo())
+            inviaveis += bool(np.isfinite(exato))
+        elif resultado['total'] < exato - 1e-6:
+            abaixo_do_otimo += 1
+    return desfeitos, abaixo_do_otimo, inviaveis
+
+
+def otimo_exato(precos, quantidades, minimos, fretes):
+    itens, colunas = precos.shape
+    custos = quantidades[:, None] * precos
+    custos[np.isnan(custos)] = np.inf
+    linhas = np.arange(itens)
+    melhor = np.inf
+    for atribuicao in itertools.product(range(colunas), repeat=itens):
+        atribuicao = np.array(atribuicao)
+        valores = custos[linhas, atribuicao]
+        if not np.isfinite(valores).all():
+            continue
+        subtotais = np.bincount(atribuicao, weights=valores, minlength=colunas)
+        usados = np.bincount(atribuicao, minlength=colunas) > 0
+        if (subtotais[usados] < minimos[usados] - 1e-9).any():
+            continue
+        melhor = min(melhor, subtotais.sum() + fretes[usados].sum())
+    return melhor
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--itens', type=int, nargs='+', default=[1000, 5000])
+    parser.add_argument('--fornecedores', type=int, default=30)
+    parser.add_argument('--pequenas', type=int, default=40, help='instâncias 8 itens x 3 fornecedores')
+    parser.add_argument('--minimas', type=int, default=3000,
+                        help='instâncias até 5 itens x 4 fornecedores (conferência dos mínimos)')
+    opcoes = parser.parse_args()
+
+    desfeitos, abaixo_do_otimo, inviaveis = conferir_viabilidade(opcoes.minimas)
+    print(f"Mínimas ({opcoes.minimas} instâncias): {desfeitos} consertos desfeitos pela busca "
+          f"local, {abaixo_do_otimo} abaixo do ótimo, {inviaveis} abaixo do pedido mínimo "
+          f"havendo plano dentro dos mínimos")
+    if desfeitos or abaixo_do_otimo:
+        sys.exit(1)
+
+    diferencas = []
+    for semente in range(opcoes.pequenas):
+        instancia = gerar_instancia(8, 3, semente)
+        exato = otimo_exato(*instancia)
+        diferencas.append((otimizar(*instancia)['total'] - exato) / exato * 100)
+    print(f"Pequenas (8 itens x 3 fornecedores + TOUREIRO, {opcoes.pequenas} instâncias): "
+          f"ótimo em {sum(d < 1e-6 for d in diferencas)}, acima do ótimo em média "
+          f"{statistics.mean(diferencas):.2f}% (máximo {max(diferencas):.2f}%)")
+
+    print(f"{'itens':>6} {'segundos':>9} {'menor preço':>12} {'abaixo mín.':>11} "
+          f"{'só conserto':>12} {'otimizado':>12} {'pendentes':>9}")
+    for itens in opcoes.itens:
+        precos, quantidades, minimos, fretes = gerar_instancia(itens, opcoes.fornecedores, 1)
+        custos = quantidades[:, None] * precos
+        custos[np.isnan(custos)] = np.inf
+        inicial = Plano(custos, minimos, fretes, custos.argmin(axis=1))
+        consertado, _ = reparar(inicial)
+
+        inicio = time.perf_counter()
+        resultado = otimizar(precos, quantidades, minimos, fretes)
+        segundos = time.perf_counter() - inicio
+        print(f"{itens:>6} {segundos:>9.2f} {inicial.total():>12.2f} "
+              f"{len(inicial.abaixo_do_minimo()):>11} {consertado.total():>12.2f} "
+              f"{resultado['total']:>12.2f} {len(resultado['pendentes']):>9}")
+
+
+if __name__ == '__main__':
+    main()
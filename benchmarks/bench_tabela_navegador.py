@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark da tabela de preços no navegador
+
+Cria um banco SQLite temporário com um catálogo sintético (P produtos x F
+fornecedores), sobe "python -m api.servidor" e abre a página com ?benchmark=N:
+a própria página (medirTabela em templates/index.html) mede N vezes o tempo
+até o primeiro lote de linhas e até a tabela inteira na tela, a atualização
+dos destaques de todas as linhas e o tratamento de um preço digitado
+
+Com o Playwright instalado (pip install playwright && playwright install
+chromium), o navegador roda sem janela e o resultado sai aqui; sem ele, abra
+o endereço mostrado e veja a tabela no console do navegador (Ctrl+C encerra)
+
+Uso: python -m benchmarks.bench_tabela_navegador [--produtos 20000] [--fornecedores 15]
+     [--rodadas 3] [--servidor waitress|desenvolvimento]
+"""
+
+import argparse
+import os
+import tempfile
+
+from benchmarks.carga_servidor import iniciar_servidor, porta_livre, preparar_banco
+
+
+def medir_com_playwright(endereco, tempo_limite):
+    """
+    Abre o endereço no Chromium sem janela e devolve window.resultadoBenchmark
+    None se o Playwright não está instalado
+    """
+    try:
+        from playwright.sync_api import sync_playwright
+    except ImportError:
+        return None
+
+    with sync_playwright() as playwright:
+        navegador = playwright.chromium.launch()
+        try:
+            pagina = navegador.new_page()
+            pagina.goto(endereco)
+            pagina.wait_for_function('window.resultadoBenchmark', timeout=tempo_limite * 1000)
+            return pagina.evaluate('window.resultadoBenchmark')
+        finally:
+            navegador.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--produtos', type=int, default=20000)
+    parser.add_argument('--fornecedores', type=int, default=15)
+    parser.add_argument('--rodadas', type=int, default=3)
+    parser.add_argument('--servidor', default='waitress', choices=('waitress', 'desenvolvimento'))
+    parser.add_argument('--tempo-limite', type=float, default=600,
+                        help='segundos máximos de espera pelo resultado (Playwright)')
+    parser.set_defaults(workers=1, threads=8)
+    opcoes = parser.parse_args()
+
+    pasta = tempfile.mkdtemp(prefix='megafarma_tabela_')
+    url = 'sqlite:///' + os.path.join(pasta, 'megafarma.db')
+    preparar_banco(url, opcoes.produtos, opcoes.fornecedores)
+
+    porta = porta_livre()
+    processo = iniciar_servidor(opcoes, porta, dict(os.environ, DATABASE_URL=url,
+                                                    PYTHONUNBUFFERED='1'))
+    endereco = f'http://127.0.0.1:{porta}/?benchmark={opcoes.rodadas}'
+    print(f"{opcoes.produtos} produtos x {opcoes.fornecedores} fornecedores "
+          f"({opcoes.produtos * opcoes.fornecedores} inputs), {opcoes.rodadas} rodada(s)")
+
+    try:
+        resultado = medir_com_playwright(endereco, opcoes.tempo_limite)
+        if resultado is None:
+            print(f"  Playwright não instalado: abra {endereco} e veja o console do navegador "
+                  f"(Ctrl+C encerra)")
+            processo.wait()
+            return
+    except KeyboardInterrupt:
+        return
+    finally:
+        processo.terminate()
+        processo.wait(timeout=30)
+
+    for rodada, medida in enumerate(resultado['rodadas'], start=1):
+        print(f"  rodada {rodada}: primeiro lote {medida['primeiro_lote_ms']} ms | "
+              f"tabela inteira {medida['tabela_ms']} ms | destaques {medida['destaques_ms']} ms | "
+              f"preço digitado {medida['digitacao_ms']:.3f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,170 @@
+# -*- coding: utf-8 -*-
+"""
+Teste de carga do servidor de produção (api.servidor)
+
+Cria um banco SQLite temporário com um catálogo sintético, sobe
+"python -m api.servidor" em um processo separado e dispara clientes
+concorrentes com conexões keep-alive contra GET /dados_tabela e
+POST /atualizar_preco. Mostra requisições por segundo, latências
+(p50/p95/p99) e erros de cada rota
+
+Uso: python -m benchmarks.carga_servidor [--servidor waitress|gunicorn|desenvolvimento]
+     [--workers N] [--threads N] [--clientes C] [--segundos S]
+     [--produtos P] [--fornecedores F] [--fracao-escrita 0.2]
+"""
+
+import argparse
+import http.client
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+ROTAS = ('GET /dados_tabela', 'POST /atualizar_preco')
+
+
+def preparar_banco(url, produtos, fornecedores):
+    """
+    Cria as tabelas e insere o catálogo sintético no banco de DATABASE_URL
+    """
+    os.environ['DATABASE_URL'] = url
+    from api.banco import conectar, init_db
+    from benchmarks.dados_sinteticos import gerar_catalogo, popular_banco
+
+    init_db()
+    conn = conectar()
+    popular_banco(conn, gerar_catalogo(produtos, fornecedores, semente=7))
+    conn.close()
+
+
+def porta_livre():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def iniciar_servidor(opcoes, porta, ambiente):
+    comando = [sys.executable, '-m', 'api.servidor', '--servidor', opcoes.servidor,
+               '--host', '127.0.0.1', '--porta', str(porta),
+               '--workers', str(opcoes.workers), '--threads', str(opcoes.threads)]
+    processo = subprocess.Popen(comando, cwd=RAIZ, env=ambiente,
+                                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    limite = time.monotonic() + 30
+    while time.monotonic() < limite:
+        if processo.poll() is not None:
+            raise RuntimeError(f'Servidor terminou ao iniciar (código {processo.returncode})')
+        try:
+            with socket.create_connection(('127.0.0.1', porta), timeout=0.5):
+                return processo
+        except OSError:
+            time.sleep(0.1)
+    processo.terminate()
+    raise RuntimeError('Servidor não respondeu em 30 s')
+
+
+def cliente(porta, fim, opcoes, resultados, semente):
+    """
+    Um cliente com conexão keep-alive: faz requisições até o fim do teste
+    """
+    aleatorio = random.Random(semente)
+    conexao = http.client.HTTPConnection('127.0.0.1', porta, timeout=30)
+    latencias = {rota: [] for rota in ROTAS}
+    erros = {rota: 0 for rota in ROTAS}
+
+    while time.monotonic() < fim:
+        if aleatorio.random() < opcoes.fracao_escrita:
+            rota = 'POST /atualizar_preco'
+            corpo = json.dumps({
+                'produto_id': aleatorio.randint(1, opcoes.produtos),
+                'fornecedor_id': aleatorio.randint(1, opcoes.fornecedores),
+                'preco': round(aleatorio.uniform(2, 200), 2),
+            })
+            cabecalhos = {'Content-Type': 'application/json'}
+        else:
+            rota, corpo, cabecalhos = 'GET /dados_tabela', None, {}
+
+        metodo, caminho = rota.split(' ')
+        inicio = time.perf_counter()
+        try:
+            conexao.request(metodo, caminho, body=corpo, headers=cabecalhos)
+            resposta = conexao.getresponse()
+            resposta.read()
+            if resposta.status != 200:
+                erros[rota] += 1
+                continue
+        except (OSError, http.client.HTTPException):
+            erros[rota] += 1
+            conexao.close()
+            conexao = http.client.HTTPConnection('127.0.0.1', porta, timeout=30)
+            continue
+        latencias[rota].append((time.perf_counter() - inicio) * 1000)
+
+    conexao.close()
+    resultados.append((latencias, erros))
+
+
+def percentil(valores, fracao):
+    return valores[min(len(valores) - 1, int(len(valores) * fracao))] if valores else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--servidor', default='waitress',
+                        choices=('waitress', 'gunicorn', 'desenvolvimento'))
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--clientes', type=int, default=8)
+    parser.add_argument('--segundos', type=float, default=10)
+    parser.add_argument('--produtos', type=int, default=2000)
+    parser.add_argument('--fornecedores', type=int, default=5)
+    parser.add_argument('--fracao-escrita', type=float, default=0.2,
+                        help='fração das requisições que são POST /atualizar_preco')
+    opcoes = parser.parse_args()
+
+    pasta = tempfile.mkdtemp(prefix='megafarma_carga_')
+    url = 'sqlite:///' + os.path.join(pasta, 'megafarma.db')
+    preparar_banco(url, opcoes.produtos, opcoes.fornecedores)
+
+    ambiente = dict(os.environ, DATABASE_URL=url, PYTHONUNBUFFERED='1')
+    porta = porta_livre()
+    processo = iniciar_servidor(opcoes, porta, ambiente)
+    print(f"Servidor {opcoes.servidor} ({opcoes.workers} worker(s), {opcoes.threads} thread(s)) "
+          f"| {opcoes.clientes} clientes por {opcoes.segundos:.0f} s "
+          f"| {opcoes.produtos} produtos x {opcoes.fornecedores} fornecedores")
+
+    try:
+        resultados = []
+        fim = time.monotonic() + opcoes.segundos
+        clientes = [threading.Thread(target=cliente, args=(porta, fim, opcoes, resultados, i))
+                    for i in range(opcoes.clientes)]
+        inicio = time.perf_counter()
+        for thread in clientes:
+            thread.start()
+        for thread in clientes:
+            thread.join()
+        duracao = time.perf_counter() - inicio
+    finally:
+        processo.terminate()
+        processo.wait(timeout=30)
+
+    total = 0
+    for rota in ROTAS:
+        latencias = sorted(v for lat, _ in resultados for v in lat[rota])
+        erros = sum(err[rota] for _, err in resultados)
+        total += len(latencias)
+        print(f"  {rota}: {len(latencias) / duracao:.1f} req/s | p50 {percentil(latencias, 0.50):.1f} ms"
+              f" | p95 {percentil(latencias, 0.95):.1f} ms | p99 {percentil(latencias, 0.99):.1f} ms"
+              f" | {erros} erro(s)")
+    print(f"  Total: {total / duracao:.1f} req/s")
+
+
+if __name__ == '__main__':
+    main()
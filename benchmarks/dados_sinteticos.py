@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+"""
+Geração de catálogos sintéticos no estilo das descrições TOUREIRO
+"""
+
+import random
+
+PRINCIPIOS = [
+    'DIPIRONA', 'PARACETAMOL', 'IBUPROFENO', 'AMOXICILINA', 'AZITROMICINA', 'LOSARTANA',
+    'ENALAPRIL', 'CAPTOPRIL', 'METFORMINA', 'GLIBENCLAMIDA', 'SINVASTATINA', 'ATORVASTATINA',
+    'OMEPRAZOL', 'PANTOPRAZOL', 'RANITIDINA', 'LORATADINA', 'DESLORATADINA', 'CETIRIZINA',
+    'PREDNISONA', 'DEXAMETASONA', 'NIMESULIDA', 'DICLOFENACO', 'CETOPROFENO', 'CEFALEXINA',
+    'CIPROFLOXACINO', 'FLUCONAZOL', 'METRONIDAZOL', 'ALBENDAZOL', 'IVERMECTINA', 'SERTRALINA',
+    'FLUOXETINA', 'CLONAZEPAM', 'DIAZEPAM', 'HIDROCLOROTIAZIDA', 'FUROSEMIDA', 'ANLODIPINO',
+    'ATENOLOL', 'PROPRANOLOL', 'LEVOTIROXINA', 'ACIDO ACETILSALICILICO', 'BROMOPRIDA',
+    'DOMPERIDONA', 'ONDANSETRONA', 'ESCOPOLAMINA', 'SIMETICONA', 'NISTATINA', 'CETOCONAZOL',
+    'ACICLOVIR', 'VITAMINA C', 'COMPLEXO B', 'SULFATO FERROSO', 'ACIDO FOLICO', 'CARBAMAZEPINA',
+]
+DOSAGENS = ['5MG', '10MG', '20MG', '25MG', '40MG', '50MG', '100MG', '200MG', '250MG',
+            '400MG', '500MG', '750MG', '850MG', '1G', '2MG/ML', '50MG/ML', '100MG/5ML']
+FORMAS = ['COMPRIMIDO', 'COMPRIMIDO REVESTIDO', 'CAPSULA', 'DRAGEA', 'SOLUCAO ORAL',
+          'SUSPENSAO', 'XAROPE', 'GOTAS', 'POMADA', 'CREME', 'AMPOLA', 'EFERVESCENTE']
+EMBALAGENS = ['CX 10', 'CX 20', 'CX 30', 'CX 60', 'FR 100ML', 'FR 120ML', 'FR 20ML',
+              'TB 30G', 'BL 10', 'CX 50 AMP', 'ENV 4']
+LABORATORIOS = ['EMS', 'MEDLEY', 'EUROFARMA', 'NEO QUIMICA', 'PRATI', 'CIMED', 'GERMED',
+                'TEUTO', 'SANDOZ', 'BIOLAB', 'ACHE', 'LEGRAND', 'UNILIFE', 'GEOLAB', 'NATULAB']
+
+# Abreviações usadas pelos fornecedores ao reescrever as descrições
+ABREVIAR = {
+    'COMPRIMIDO': ['COMP', 'CPR', 'CP'], 'CAPSULA': ['CAPS', 'CAP'], 'DRAGEA': ['DRG'],
+    'SOLUCAO': ['SOL'], 'SUSPENSAO': ['SUSP'], 'XAROPE': ['XPE'], 'GOTAS': ['GTS'],
+    'POMADA': ['POM'], 'AMPOLA': ['AMP'], 'REVESTIDO': ['REV'], 'ACIDO': ['ÁCIDO', 'AC'],
+    'SOLUCAO ORAL': ['SOL ORAL'], 'CX': ['CAIXA', 'C/'], 'FR': ['FRASCO'],
+}
+
+
+def gerar_descricoes(quantidade, semente=42):
+    """
+    Gera `quantidade` descrições distintas de produtos
+    """
+    aleatorio = random.Random(semente)
+    vistas = set()
+    descricoes = []
+
+    while len(descricoes) < quantidade:
+        descricao = ' '.join([
+            aleatorio.choice(PRINCIPIOS),
+            aleatorio.choice(DOSAGENS),
+            aleatorio.choice(FORMAS),
+            aleatorio.choice(EMBALAGENS),
+            aleatorio.choice(LABORATORIOS),
+        ])
+        if descricao not in vistas:
+            vistas.add(descricao)
+            descricoes.append(descricao)
+
+    return descricoes
+
+
+def reescrever_como_fornecedor(descricao, aleatorio):
+    """
+    Reescreve a descrição como um fornecedor faria: abreviações, acentos,
+    caixa baixa, palavras fora de ordem e pequenos erros de digitação
+    """
+    texto = descricao
+    for original, variantes in ABREVIAR.items():
+        if original in texto and aleatorio.random() < 0.6:
+            texto = texto.replace(original, aleatorio.choice(variantes), 1)
+
+    tokens = texto.split()
+    if aleatorio.random() < 0.4:
+        # Fornecedor coloca o laboratório no começo
+        tokens.insert(0, tokens.pop())
+    if aleatorio.random() < 0.2 and len(tokens) > 4:
+        # Palavra omitida
+        tokens.pop(aleatorio.randrange(1, len(tokens)))
+    if aleatorio.random() < 0.2:
+        # Erro de digitação em uma palavra longa
+        longas = [i for i, t in enumerate(tokens) if len(t) > 5]
+        if longas:
+            i = aleatorio.choice(longas)
+            j = aleatorio.randrange(1, len(tokens[i]) - 1)
+            tokens[i] = tokens[i][:j] + tokens[i][j + 1:]
+
+    texto = ' '.join(tokens)
+    if aleatorio.random() < 0.3:
+        texto = texto.lower()
+    return texto
+
+
+def gerar_catalogo(produtos, fornecedores, densidade=0.6, semente=42):
+    """
+    Catálogo sintético: `produtos` itens TOUREIRO e `fornecedores` fornecedores,
+    cada um com preço para uma fração `densidade` dos produtos
+    Retorna {'produtos': [(id, codigo, descricao, preco)], 'fornecedores': [(id, nome)],
+    'precos': [(produto_id, fornecedor_id, preco)]}
+    """
+    aleatorio = random.Random(semente)
+    catalogo = {
+        'produtos': [(i, str(10000 + i), descricao, round(aleatorio.uniform(2, 200), 2))
+                     for i, descricao in enumerate(gerar_descricoes(produtos, semente), start=1)],
+        'fornecedores': [(f, f'FORNECEDOR {f}') for f in range(1, fornecedores + 1)],
+        'precos': [],
+    }
+    for produto_id, _, _, preco in catalogo['produtos']:
+        for fornecedor_id in range(1, fornecedores + 1):
+            if aleatorio.random() < densidade:
+                catalogo['precos'].append(
+                    (produto_id, fornecedor_id, round(preco * aleatorio.uniform(0.8, 1.2), 2)))
+    return catalogo
+
+
+def popular_banco(conn, catalogo):
+    """
+    Insere o catálogo em um banco com as tabelas já criadas (init_db)
+    """
+    conn.executemany('INSERT INTO produtos (id, codigo, descricao, preco_toureiro) VALUES (?, ?, ?, ?)',
+                     catalogo['produtos'])
+    conn.executemany('INSERT INTO fornecedores (id, nome) VALUES (?, ?)', catalogo['fornecedores'])
+    conn.executemany('INSERT INTO precos_fornecedores (produto_id, fornecedor_id, preco) VALUES (?, ?, ?)',
+                     catalogo['precos'])
+    conn.commit()
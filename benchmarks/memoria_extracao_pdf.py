@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+"""
+Pico de memória da extração do PDF TOUREIRO conforme o número de páginas
+
+Cada PDF repete as mesmas 400 linhas (a lista de produtos extraída tem
+sempre o mesmo tamanho), então o pico de RSS só cresce com as páginas se a
+extração guardar algo por página. Cada extração roda num processo novo; o
+script termina com erro se o pico do maior PDF passar o do menor em mais de
+--tolerancia MB
+
+Uso: python -m benchmarks.memoria_extracao_pdf [--paginas 20 100 400]
+                                               [--modo palavras] [--janela N]
+"""
+
+import argparse
+import json
+import logging
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.bench_api import pico_rss_mb
+from benchmarks.dados_sinteticos import gerar_catalogo
+from benchmarks.pdf_toureiro import LINHAS_POR_PAGINA, gerar_pdf_toureiro
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PRODUTOS_DISTINTOS = 400
+
+
+def extrair_no_filho(caminho, modo, janela):
+    """
+    Roda a extração num processo novo e devolve {'produtos', 'segundos', 'pico_mb'}
+    """
+    comando = [sys.executable, '-m', 'benchmarks.memoria_extracao_pdf', '--filho', caminho,
+               '--modo', modo, '--janela', str(janela)]
+    # Páginas no próprio processo: o pico dos processos das páginas não entraria na conta
+    ambiente = dict(os.environ, MEGAFARMA_PDF_ISOLAMENTO='local')
+    resultado = subprocess.run(comando, cwd=RAIZ, env=ambiente, capture_output=True, text=True,
+                               check=True)
+    return json.loads(resultado.stdout.splitlines()[-1])
+
+
+def filho(caminho, modo, janela):
+    from api.extracao_pdf import extrair_dados_pdf
+
+    logging.getLogger('api').setLevel(logging.WARNING)
+    inicio = time.perf_counter()
+    produtos = extrair_dados_pdf(caminho, modo, janela=janela)
+    # VmHWM do /proc começa do zero no exec; o ru_maxrss herdaria o pico do processo pai
+    pico = pico_rss_mb(os.getpid()) or pico_rss_mb()
+    print(json.dumps({'produtos': len(produtos), 'segundos': time.perf_counter() - inicio,
+                      'pico_mb': pico}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--paginas', type=int, nargs='+', default=[20, 100, 400])
+    parser.add_argument('--modo', default='palavras', choices=['palavras', 'tabelas'])
+    parser.add_argument('--janela', type=int, default=0, help='MEGAFARMA_PDF_JANELA (0 desliga)')
+    parser.add_argument('--tolerancia', type=float, default=15.0, help='crescimento máximo em MB')
+    parser.add_argument('--filho', help=argparse.SUPPRESS)
+    opcoes = parser.parse_args()
+
+    if opcoes.filho:
+        filho(opcoes.filho, opcoes.modo, opcoes.janela)
+        return
+
+    catalogo = gerar_catalogo(PRODUTOS_DISTINTOS, 1)
+    pasta = tempfile.mkdtemp(prefix='megafarma_memoria_')
+    print(f"{'páginas':>7} {'produtos':>8} {'segundos':>9} {'pico MB':>8}")
+
+    picos = []
+    for paginas in sorted(opcoes.paginas):
+        linhas = paginas * LINHAS_POR_PAGINA
+        repetidos = (catalogo['produtos'] * (linhas // PRODUTOS_DISTINTOS + 1))[:linhas]
+        caminho = os.path.join(pasta, f'toureiro_{paginas}.pdf')
+        with open(caminho, 'wb') as arquivo:
+            arquivo.write(gerar_pdf_toureiro(repetidos))
+
+        resultado = extrair_no_filho(caminho, opcoes.modo, opcoes.janela)
+        picos.append(resultado['pico_mb'])
+        print(f"{paginas:>7} {resultado['produtos']:>8} {resultado['segundos']:>9.2f} "
+              f"{resultado['pico_mb']:>8.1f}")
+
+    crescimento = picos[-1] - picos[0]
+    print(f"Crescimento do pico: {crescimento:.1f} MB (tolerância {opcoes.tolerancia:.0f} MB)")
+    if crescimento > opcoes.tolerancia:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+"""
+PDFs sintéticos no formato da tabela TOUREIRO, gerados com o ReportLab
+
+Cada produto vira uma linha "CODIGO DESCRICAO UNIDADE PRECO QUANTIDADE"
+(ex.: "55885 ACUCAR DE COCO 150G UNILIFE CX 48 UN UN 17,9900 4,0000") em
+uma tabela de uma coluna, como no PDF real. Com colunas=True, cada campo
+fica na sua coluna, com os números alinhados à direita; deslocamento desce
+o código (em negrito) essa fração de ponto abaixo da linha dos demais
+campos, como nas tabelas com colunas em outra fonte. Com moldura=True,
+cada página ganha cabeçalho e rodapé (com valores de duas casas) e o
+documento ganha capa e uma página final de condições, sem produtos
+"""
+
+import io
+import random
+
+LINHAS_POR_PAGINA = 40
+
+
+def linha_toureiro(codigo, descricao, preco, quantidade):
+    return f"{codigo} {descricao} UN {preco:.4f} {quantidade:.4f}".replace('.', ',')
+
+
+def desenhar_moldura(canvas, doc):
+    largura, altura = canvas._pagesize
+    canvas.saveState()
+    canvas.setFont('Helvetica-Bold', 12)
+    canvas.drawString(36, altura - 24, 'TOUREIRO DISTRIBUIDORA DE ALIMENTOS')
+    canvas.setFont('Helvetica', 8)
+    canvas.drawRightString(largura - 36, altura - 24, 'TABELA DE PRECOS 04/08/2025')
+    canvas.drawString(36, 16, 'Pedido minimo R$ 300,00 - frete R$ 25,00 por entrega')
+    canvas.drawRightString(largura - 36, 16, f'Pagina {doc.page}')
+    canvas.restoreState()
+
+
+def gerar_pdf_toureiro(produtos, semente=42, colunas=False, moldura=False, deslocamento=0):
+    """
+    Gera o PDF (bytes) de uma lista de (id, codigo, descricao, preco)
+    """
+    from reportlab.lib import colors
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.styles import getSampleStyleSheet
+    from reportlab.platypus import PageBreak, Paragraph, SimpleDocTemplate, Table, TableStyle
+
+    aleatorio = random.Random(semente)
+    estilo = TableStyle([
+        ('GRID', (0, 0), (-1, -1), 0.5, colors.black),
+        ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
+        ('FONTSIZE', (0, 0), (-1, -1), 8),
+        ('ALIGN', (3, 0), (-1, -1), 'RIGHT'),
+    ])
+    if deslocamento:
+        # Alinhadas embaixo, as células descem com menos espaçamento inferior (padrão 3)
+        estilo.add('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold')
+        estilo.add('BOTTOMPADDING', (0, 0), (0, -1), 3 - deslocamento)
+
+    story = []
+    if moldura:
+        story.extend([Paragraph('Tabela de Preços TOUREIRO', getSampleStyleSheet()['Title']),
+                      PageBreak()])
+    for inicio in range(0, len(produtos), LINHAS_POR_PAGINA):
+        linhas = [linha_toureiro(codigo, descricao, preco, aleatorio.randint(1, 48))
+                  for _, codigo, descricao, preco in produtos[inicio:inicio + LINHAS_POR_PAGINA]]
+        if colunas:
+            # código | descrição | unidade | preço | quantidade
+            linhas = [[campos[0], ' '.join(campos[1:-3])] + campos[-3:]
+                      for campos in (linha.split() for linha in linhas)]
+            tabela = Table(linhas, colWidths=[40, 320, 30, 65, 65])
+        else:
+            tabela = Table([[linha] for linha in linhas], colWidths=[520])
+        tabela.setStyle(estilo)
+        story.extend([tabela, PageBreak()])
+
+    if moldura:
+        story.append(Paragraph('Condições de pagamento: boleto 28 dias. Pedido mínimo 300,00.',
+                               getSampleStyleSheet()['Normal']))
+    else:
+        story.pop()
+
+    buffer = io.BytesIO()
+    documento = SimpleDocTemplate(buffer, pagesize=A4, leftMargin=36, rightMargin=36,
+                                  topMargin=36, bottomMargin=36)
+    if moldura:
+        documento.build(story, onFirstPage=desenhar_moldura, onLaterPages=desenhar_moldura)
+    else:
+        documento.build(story)
+    return buffer.getvalue()
@@ -33,8 +33,8 @@ def create_spec_file():
 block_cipher = None
 
 a = Analysis(
-    ['api/app.py'],
-    pathex=[],
+    ['api/servidor.py'],
+    pathex=['.'],
     binaries=[],
     datas=[
         ('templates', 'templates'),
@@ -65,6 +65,33 @@ a = Analysis(
         'reportlab.lib.styles',
         'reportlab.lib.colors',
         'reportlab.lib.units',
+        'api',
+        'api.armazenamento',
+        'api.banco',
+        'api.extracao_pdf',
+        'api.rotas',
+        'api.rotas.precos',
+        'api.rotas.importacao',
+        'api.rotas.relatorios',
+        'api.rotas.manutencao',
+        'api.exportacao',
+        'api.importacao_fornecedor',
+        'api.indice_produtos',
+        'api.busca',
+        'api.historico_precos',
+        'api.metricas',
+        'api.registro',
+        'api.layout_pdf',
+        'api.paginas_pdf',
+        'api.upload_partes',
+        'api.pasta_monitorada',
+        'api.matriz_precos',
+        'api.otimizacao_pedido',
+        'api.manutencao',
+        'api.servidor',
+        'numpy',
+        'openpyxl',
+        'waitress',
     ],
     hookspath=[],
     hooksconfig={},
@@ -2,80 +2,132 @@
 # -*- coding: utf-8 -*-
 """
 Script para debug e análise do PDF
+
+Uso: python debug_pdf.py [caminho.pdf] [--nivel DEBUG|INFO] [--json]
+                         [--salvar NOME] [--pasta PASTA]
+Em INFO mostra o resumo de cada página; em DEBUG também as linhas e tabelas.
+Com --salvar, aprende o perfil de layout do PDF (colunas, padrão da linha,
+faixa de dados e páginas sem dados) em todas as páginas e grava em
+layouts/NOME.json; a importação reconhece PDFs com o mesmo layout e usa o perfil
 """
 
-import pdfplumber
+import argparse
+import logging
+import os
 import re
+import time
+
+from api.layout_pdf import (aprender_perfil, carregar_perfis, encontrar_perfil,
+                            palavras_da_pagina, pasta_layouts)
+from api.registro import configurar_registro
+
+log = logging.getLogger('debug_pdf')
+
+PDF_PADRAO = 'uploads/TABELA_DE_PRECO_ATUALIZADA_04-08.pdf'
+PADRAO_PRECO = re.compile(r'\d+[,.]\d{2}')
+
+
+def analisar_pagina(page, page_num, linhas_texto=10, linhas_preco=20):
+    """
+    Registra texto, linhas com preço e tabelas de uma página; devolve as contagens
+    """
+    text = page.extract_text() or ''
+    lines = text.split('\n') if text else []
+    com_preco = [(i, line) for i, line in enumerate(lines) if PADRAO_PRECO.search(line)]
+
+    log.debug("Primeiras %d linhas:", linhas_texto)
+    for i, line in enumerate(lines[:linhas_texto]):
+        log.debug("%2d: %r", i + 1, line)
+
+    log.debug("Linhas que podem conter preços:")
+    for i, line in com_preco[:linhas_preco]:
+        log.debug("%2d: %r", i + 1, line)
+
+    # Analisar tabelas
+    tables = page.extract_tables()
+    for table_num, table in enumerate(tables[:2]):
+        log.debug("Tabela %d: %d linhas, %d colunas", table_num + 1, len(table),
+                  len(table[0]) if table and table[0] else 0)
+        for i, row in enumerate(table[:5]):
+            log.debug("  %d: %s", i + 1, row)
+
+    contagens = {'pagina': page_num + 1, 'linhas': len(lines),
+                 'linhas_com_preco': len(com_preco), 'tabelas': len(tables)}
+    log.info("Página %d", page_num + 1, extra={'dados': contagens})
+    return contagens
+
 
 def analisar_pdf(caminho_pdf):
     """
     Analisa o conteúdo do PDF para entender sua estrutura
     """
+    import pdfplumber
+
+    inicio = time.perf_counter()
     try:
         with pdfplumber.open(caminho_pdf) as pdf:
-            print(f"PDF: {caminho_pdf}")
-            print(f"Total de páginas: {len(pdf.pages)}")
-            print("=" * 50)
-            
-            # Analisar primeiras páginas
-            for page_num in range(min(3, len(pdf.pages))):
-                page = pdf.pages[page_num]
-                print(f"\n--- PÁGINA {page_num + 1} ---")
-                
-                # Extrair texto
-                text = page.extract_text()
-                if text:
-                    lines = text.split('\n')
-                    print(f"Linhas de texto: {len(lines)}")
-                    print("Primeiras 10 linhas:")
-                    for i, line in enumerate(lines[:10]):
-                        print(f"{i+1:2d}: {repr(line)}")
-                    
-                    print("\nLinhas que podem conter preços:")
-                    for i, line in enumerate(lines[:20]):
-                        if re.search(r'\d+[,.]\d{2}', line):
-                            print(f"{i+1:2d}: {repr(line)}")
-                
-                # Analisar tabelas
-                tables = page.extract_tables()
-                print(f"\nTabelas encontradas: {len(tables)}")
-                
-                if tables:
-                    for table_num, table in enumerate(tables[:2]):
-                        print(f"\nTabela {table_num + 1}:")
-                        print(f"Linhas: {len(table)}")
-                        if table:
-                            print(f"Colunas: {len(table[0]) if table[0] else 0}")
-                            print("Primeiras 5 linhas:")
-                            for i, row in enumerate(table[:5]):
-                                print(f"  {i+1}: {row}")
-                
-                print("-" * 30)
-                
-                # Parar após algumas páginas para não sobrecarregar
-                if page_num >= 2:
-                    break
-            
-            # Analisar uma página do meio
-            if len(pdf.pages) > 10:
-                middle_page = len(pdf.pages) // 2
-                page = pdf.pages[middle_page]
-                print(f"\n--- PÁGINA DO MEIO ({middle_page + 1}) ---")
-                
-                text = page.extract_text()
-                if text:
-                    lines = text.split('\n')
-                    print("Linhas com possíveis preços:")
-                    count = 0
-                    for i, line in enumerate(lines):
-                        if re.search(r'\d+[,.]\d{2}', line) and count < 10:
-                            print(f"{i+1:2d}: {repr(line)}")
-                            count += 1
-    
-    except Exception as e:
-        print(f"Erro ao analisar PDF: {e}")
-        import traceback
-        traceback.print_exc()
+            total = len(pdf.pages)
+            log.info("PDF: %s (%d páginas)", caminho_pdf, total)
+
+            # Analisar as primeiras páginas e, em PDFs grandes, uma do meio
+            paginas = list(range(min(3, total)))
+            if total > 10:
+                paginas.append(total // 2)
+
+            analisadas = [analisar_pagina(pdf.pages[n], n) for n in paginas]
+
+            perfil = encontrar_perfil(pdf, carregar_perfis(pasta_layouts()),
+                                      palavras_da_pagina(pdf.pages[0])) if total else None
+            log.info("Perfil de layout: %s", perfil.nome if perfil else 'nenhum salvo confere')
+
+        log.info("Análise concluída", extra={'dados': {
+            'paginas': total, 'analisadas': len(analisadas),
+            'linhas_com_preco': sum(a['linhas_com_preco'] for a in analisadas),
+            'tabelas': sum(a['tabelas'] for a in analisadas),
+            'segundos': round(time.perf_counter() - inicio, 3)}})
+
+    except Exception:
+        log.exception("Erro ao analisar PDF")
+
+
+def salvar_perfil(caminho_pdf, nome, pasta):
+    """
+    Aprende o perfil de layout em todas as páginas e grava em pasta/nome.json
+    """
+    import pdfplumber
+
+    inicio = time.perf_counter()
+    with pdfplumber.open(caminho_pdf) as pdf:
+        perfil, estatisticas = aprender_perfil(pdf, nome)
+
+    estatisticas['segundos'] = round(time.perf_counter() - inicio, 3)
+    if perfil is None:
+        log.error("Nenhuma linha no formato esperado: perfil não salvo",
+                  extra={'dados': estatisticas})
+        return None
+
+    caminho = perfil.salvar(pasta)
+    log.info("Perfil %s salvo em %s", nome, caminho, extra={'dados': dict(
+        estatisticas, colunas=perfil.layout.descrever(), banda=perfil.banda,
+        ignorar_inicio=perfil.ignorar_inicio, ignorar_fim=perfil.ignorar_fim,
+        assinatura=perfil.assinatura)})
+    return perfil
+
 
 if __name__ == "__main__":
-    analisar_pdf('uploads/TABELA_DE_PRECO_ATUALIZADA_04-08.pdf')
\ No newline at end of file
+    parser = argparse.ArgumentParser(description='Análise da estrutura de um PDF de preços')
+    parser.add_argument('caminho', nargs='?', default=PDF_PADRAO)
+    parser.add_argument('--nivel', default='DEBUG', help='DEBUG mostra linhas e tabelas')
+    parser.add_argument('--json', action='store_true', help='um registro JSON por linha')
+    parser.add_argument('--salvar', metavar='NOME', help='aprende e grava o perfil de layout')
+    parser.add_argument('--pasta', help='pasta dos perfis (padrão: layouts/ ou MEGAFARMA_LAYOUTS)')
+    opcoes = parser.parse_args()
+
+    configurar_registro(opcoes.nivel, 'json' if opcoes.json else 'simples')
+    logging.getLogger('debug_pdf').setLevel(opcoes.nivel.upper())
+    if opcoes.pasta:
+        os.environ['MEGAFARMA_LAYOUTS'] = opcoes.pasta
+    if opcoes.salvar:
+        salvar_perfil(opcoes.caminho, opcoes.salvar, pasta_layouts())
+    else:
+        analisar_pdf(opcoes.caminho)